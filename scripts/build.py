@@ -84,6 +84,17 @@ a = Analysis(
     ],
     hiddenimports=[
         'file_handler', 
+        'handle_tool',
+        'lock_index',
+        'lock_providers',
+        'proc_locks',
+        'tree_walker',
+        'process_table',
+        'process_terminator',
+        'retry_scheduler',
+        'delete_engine',
+        'reclaimer',
+        'single_instance',
         'gui', 
         'settings', 
         'hotkey_manager', 
@@ -0,0 +1,317 @@
+import os
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Общее число потоков удаления
+MAX_DELETE_WORKERS = min(32, (os.cpu_count() or 4) * 4)
+
+# Сколько папок одного тома обрабатывается одновременно. Удаление упирается
+# в файловую систему, и слишком много параллельных запросов к одному диску
+# (особенно к сетевому) только мешают друг другу
+MAX_DELETE_WORKERS_PER_VOLUME = 8
+
+# Сколько ошибок сохранять в результате (остальные только считаются)
+MAX_REPORTED_DELETE_ERRORS = 100
+
+# Удаление относительно дескриптора папки (openat/unlinkat): каждая папка
+# открывается по имени относительно уже открытой родительской, и ядру не нужно
+# заново разбирать полный путь для каждого файла. O_NOFOLLOW не дает подменить
+# папку символической ссылкой во время удаления и увести удаление за пределы
+# дерева. В Windows dir_fd не поддерживается - там используются обычные пути
+DIR_FD_SUPPORTED = (os.unlink in os.supports_dir_fd and os.rmdir in os.supports_dir_fd
+                    and os.open in os.supports_dir_fd and os.scandir in os.supports_fd
+                    and hasattr(os, "O_DIRECTORY") and hasattr(os, "O_NOFOLLOW"))
+
+_DIR_OPEN_FLAGS = os.O_RDONLY | getattr(os, "O_DIRECTORY", 0) | getattr(os, "O_NOFOLLOW", 0)
+
+class _DeleteState:
+    """Общее состояние одной операции удаления дерева"""
+
+    def __init__(self, root, remove_root, remove_file, retry_file, volume_limits):
+        self.root = root
+        self.remove_root = remove_root
+        # Свою функцию удаления можно вызвать только с полным путем
+        self.use_dir_fd = DIR_FD_SUPPORTED and remove_file is None
+        self.remove_file = remove_file or os.remove
+        self.retry_file = retry_file
+        self.volume_limits = volume_limits or {}
+        self.lock = threading.Lock()
+        self.changed = threading.Condition(self.lock)
+        self.cancelled = threading.Event()
+        self.stack = []  # папки, ожидающие обработки (берутся с конца - обход в глубину)
+        self.pending = {}  # папка -> число незавершенных дочерних папок (+1 пока папка читается)
+        self.parents = {}  # папка -> родительская папка
+        self.fds = {}  # папка -> дескриптор, открытый, пока не удалены ее дочерние папки
+        self.devices = {}  # папка -> том (st_dev), если dir_fd не используется
+        self.blocked = set()  # папки, в которых что-то не удалилось - их rmdir заведомо не сработает
+        self.semaphores = {}  # том -> семафор
+        self.tasks = 0  # число папок в очереди и в обработке
+        self.deleted_files = 0
+        self.deleted_dirs = 0
+        self.error_count = 0
+        self.errors = []
+        self.root_removed = False
+
+    def add_error(self, path, error, directory=None):
+        logging.warning(f"Не удалось удалить {path}: {str(error)}")
+        with self.lock:
+            if directory is not None:
+                self.blocked.add(directory)
+            self.error_count += 1
+            if len(self.errors) < MAX_REPORTED_DELETE_ERRORS:
+                self.errors.append((path, str(error)))
+
+    def semaphore_for(self, volume):
+        """Возвращает семафор тома"""
+        with self.lock:
+            semaphore = self.semaphores.get(volume)
+            if semaphore is None:
+                limit = self.volume_limits.get(volume, MAX_DELETE_WORKERS_PER_VOLUME)
+                semaphore = threading.BoundedSemaphore(max(1, limit))
+                self.semaphores[volume] = semaphore
+            return semaphore
+
+def _remove_directory(state, directory):
+    """Удаляет папку, у которой не осталось дочерних папок, и поднимается к родителям"""
+    while directory is not None:
+        with state.lock:
+            if state.pending.get(directory, 0) > 0:
+                return
+            state.pending.pop(directory, None)
+            parent = state.parents.pop(directory, None)
+            state.devices.pop(directory, None)
+            fd = state.fds.pop(directory, None)
+            # Дескриптор родителя остается открытым, пока у него есть незавершенные папки
+            parent_fd = state.fds.get(parent)
+            blocked = directory in state.blocked
+            state.blocked.discard(directory)
+            if blocked and parent is not None:
+                state.blocked.add(parent)
+        if fd is not None:
+            os.close(fd)
+
+        # Если внутри остались неудаленные элементы, папку не трогаем - ошибка уже учтена
+        if not blocked and (directory != state.root or state.remove_root):
+            try:
+                if parent_fd is not None:
+                    os.rmdir(os.path.basename(directory), dir_fd=parent_fd)
+                else:
+                    os.rmdir(directory)
+                with state.lock:
+                    state.deleted_dirs += 1
+                    if directory == state.root:
+                        state.root_removed = True
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                if not state.cancelled.is_set():
+                    state.add_error(directory, e, parent)
+
+        if parent is None:
+            return
+        with state.lock:
+            state.pending[parent] -= 1
+        directory = parent
+
+def _scan_and_remove(state, directory, iterator, unlink):
+    """Удаляет файлы из открытой папки; возвращает список вложенных папок"""
+    subdirs = []
+    for entry in iterator:
+        if state.cancelled.is_set():
+            break
+        try:
+            is_dir = entry.is_dir(follow_symlinks=False)
+        except OSError:
+            is_dir = False
+
+        if is_dir:
+            subdirs.append(os.path.join(directory, entry.name))
+            continue
+        file_path = os.path.join(directory, entry.name)
+        try:
+            try:
+                unlink(entry)
+            except FileNotFoundError:
+                continue
+            except OSError:
+                # Файл не удалился обычным способом (занят, только для чтения) -
+                # повтор по полному пути, если вызывающий код умеет его разблокировать
+                if state.retry_file is None:
+                    raise
+                state.retry_file(file_path)
+            with state.lock:
+                state.deleted_files += 1
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            state.add_error(file_path, e, directory)
+    return subdirs
+
+def _open_directory(state, directory):
+    """Открывает папку относительно дескриптора родителя, не переходя по ссылкам"""
+    with state.lock:
+        parent_fd = state.fds.get(state.parents.get(directory))
+    if parent_fd is None:
+        # Корень, как и раньше, может быть ссылкой на папку - ее содержимое и удаляется
+        return os.open(directory, _DIR_OPEN_FLAGS & ~getattr(os, "O_NOFOLLOW", 0))
+    return os.open(os.path.basename(directory), _DIR_OPEN_FLAGS, dir_fd=parent_fd)
+
+def _process_directory(state, directory):
+    """Удаляет файлы папки и ставит в очередь ее вложенные папки"""
+    subdirs = []
+    fd = None
+    if not state.cancelled.is_set():
+        try:
+            if state.use_dir_fd:
+                fd = _open_directory(state, directory)
+                # Том берем из уже открытого дескриптора, без повторного разбора пути
+                volume = os.fstat(fd).st_dev
+            else:
+                with state.lock:
+                    volume = state.devices.get(directory)
+                if volume is None:
+                    volume = os.stat(directory).st_dev
+
+            with state.semaphore_for(volume):
+                if fd is not None:
+                    # Файлы удаляются по имени относительно дескриптора папки
+                    with os.scandir(fd) as iterator:
+                        subdirs = _scan_and_remove(state, directory, iterator,
+                                                   lambda entry: os.unlink(entry.name, dir_fd=fd))
+                else:
+                    with os.scandir(directory) as iterator:
+                        subdirs = _scan_and_remove(state, directory, iterator,
+                                                   lambda entry: state.remove_file(entry.path))
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            state.add_error(directory, e, directory)
+
+    # Отмена: вложенные папки не обходим, но счетчики родителей остаются согласованными
+    if state.cancelled.is_set():
+        subdirs = []
+
+    with state.lock:
+        state.pending[directory] += len(subdirs) - 1
+        if fd is not None and subdirs:
+            # Дочерние папки откроются и удалятся относительно этого дескриптора
+            state.fds[directory] = fd
+            fd = None
+        for subdir in subdirs:
+            state.pending[subdir] = 1
+            state.parents[subdir] = directory
+            if not state.use_dir_fd:
+                # Без dir_fd том наследуется от родителя: в Windows os.scandir
+                # не заходит в точки соединения, и поддерево лежит на том же томе
+                state.devices[subdir] = volume
+        state.stack.extend(reversed(subdirs))
+        state.tasks += len(subdirs)
+        if subdirs:
+            state.changed.notify_all()
+    if fd is not None:
+        os.close(fd)
+
+    _remove_directory(state, directory)
+
+def _run_task(state, directory):
+    try:
+        _process_directory(state, directory)
+    except Exception as e:
+        logging.error(f"Ошибка при удалении папки {directory}: {str(e)}", exc_info=True)
+        state.add_error(directory, e)
+    finally:
+        with state.lock:
+            state.tasks -= 1
+            state.changed.notify_all()
+
+def _worker(state):
+    """
+    Поток удаления: берет папки из общего стека, пока работа не закончится
+
+    Стек дает обход в глубину: родительская папка держит дескриптор, пока не удалены
+    ее дочерние папки, и при обходе в глубину открытых дескрипторов не больше,
+    чем глубина дерева на каждый поток, а не все папки очередного уровня.
+    """
+    while True:
+        with state.lock:
+            while not state.stack and state.tasks:
+                state.changed.wait()
+            if not state.stack:
+                return
+            directory = state.stack.pop()
+        _run_task(state, directory)
+
+def delete_tree(root, progress_callback=None, total=0, remove_root=True, remove_file=None,
+                max_workers=None, volume_limits=None, initializer=None, retry_file=None):
+    """
+    Удаляет дерево папки параллельно, снизу вверх
+
+    Независимые поддеревья удаляются одновременно в пуле потоков, а каждая
+    папка удаляется сразу, как только удалено ее последнее содержимое.
+    Число одновременно обрабатываемых папок одного тома ограничено
+    MAX_DELETE_WORKERS_PER_VOLUME (или volume_limits[st_dev]).
+    Там, где поддерживается dir_fd (Linux), каждая папка открывается один раз
+    относительно родительской (без перехода по символическим ссылкам),
+    а ее файлы и вложенные папки удаляются по имени относительно дескриптора.
+
+    Args:
+        root: Корневая папка
+        progress_callback: Функция (удалено элементов, всего); возврат False отменяет удаление
+        total: Общее число элементов для прогресса (0 - неизвестно)
+        remove_root: Удалять ли саму корневую папку
+        remove_file: Функция удаления одного файла по полному пути (по умолчанию os.remove;
+                     при своей функции удаление относительно дескриптора папки отключается)
+        max_workers: Число потоков
+        volume_limits: Ограничения параллельности для отдельных томов {st_dev: число}
+        initializer: Функция, вызываемая в каждом потоке пула при его запуске
+        retry_file: Функция повторного удаления файла по полному пути, вызываемая только
+                    для файлов, которые не удалось удалить обычным способом (например,
+                    с разблокировкой); исключение из нее означает, что файл не удален
+
+    Returns:
+        dict: {"success": True, ...} или {"error": ...}; при отмене - {"error": ..., "cancelled": True}.
+              В обоих случаях есть счетчики "deleted_files", "deleted_dirs" и список "errors"
+    """
+    state = _DeleteState(root, remove_root, remove_file, retry_file, volume_limits)
+    state.pending[root] = 1
+    state.stack.append(root)
+    state.tasks = 1
+    workers = max(1, max_workers or MAX_DELETE_WORKERS)
+
+    with ThreadPoolExecutor(max_workers=workers, initializer=initializer) as executor:
+        for _ in range(workers):
+            executor.submit(_worker, state)
+
+        with state.lock:
+            while state.tasks:
+                state.changed.wait(0.1)
+                if progress_callback and not state.cancelled.is_set():
+                    deleted = state.deleted_files + state.deleted_dirs
+                    # Колбэк вызывается без блокировки, чтобы не задерживать потоки
+                    state.lock.release()
+                    try:
+                        if not progress_callback(deleted, total):
+                            logging.info(f"Удаление {root} отменено пользователем")
+                            state.cancelled.set()
+                    finally:
+                        state.lock.acquire()
+
+    result = {
+        "deleted_files": state.deleted_files,
+        "deleted_dirs": state.deleted_dirs,
+        "errors": state.errors,
+    }
+    logging.info(f"Удаление {root}: {state.deleted_files} файлов, {state.deleted_dirs} папок, "
+                 f"{state.error_count} ошибок")
+
+    if state.cancelled.is_set():
+        result.update({"error": "Операция отменена пользователем", "cancelled": True})
+    elif state.error_count or (remove_root and not state.root_removed):
+        result["error"] = (f"Не удалось удалить {state.error_count} элементов в '{root}'. "
+                           f"Возможно, некоторые файлы всё ещё заблокированы.")
+    else:
+        result["success"] = True
+        if progress_callback:
+            progress_callback(state.deleted_files + state.deleted_dirs, total)
+    return result
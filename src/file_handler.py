@@ -1,54 +1,124 @@
 import subprocess
 import os
-import re
-import sys
+import stat
 import logging
 import time
 import ctypes
 import shutil
-import locale
+import itertools
+import threading
+import functools
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from pathlib import Path
 
-def resource_path(relative_path):
-    """Получить абсолютный путь к ресурсу, работает для dev и для PyInstaller"""
-    try:
-        # PyInstaller создает временную папку и хранит путь в _MEIPASS
-        base_path = sys._MEIPASS
-    except Exception:
-        base_path = os.path.abspath(".")
-
-    return os.path.join(base_path, relative_path)
-
-def get_handle_exe_path():
-    """Находит путь к handle.exe, проверяя различные возможные местоположения"""
-    # Список мест для поиска в порядке приоритета
-    possible_handle_paths = [
-        # В директории resources в упакованном приложении
-        resource_path(os.path.join("resources", "handle64.exe")),
-        resource_path(os.path.join("resources", "handle.exe")),
-        resource_path(os.path.join("resources", "handle64a.exe")),
-        # Рядом с exe-файлом
-        os.path.join(os.path.dirname(sys.executable), "handle64.exe"),
-        os.path.join(os.path.dirname(sys.executable), "handle.exe"),
-        os.path.join(os.path.dirname(sys.executable), "handle64a.exe"),
-        # В корневой директории
-        "handle64.exe",
-        "handle.exe",
-        "handle64a.exe",
-    ]
-    
-    # Ищем первый существующий файл
-    for handle_path in possible_handle_paths:
-        if os.path.exists(handle_path):
-            logging.info(f"Найдена утилита handle: {handle_path}")
-            return handle_path
-            
-    logging.error("Не найдена утилита handle.exe")
-    return None
+from lock_index import canonical_path
+from tree_walker import scan_tree, iter_batches
+from process_table import get_process_table
+from process_terminator import terminate_processes, wait_for_exit, FAILED, GRACEFUL
+from retry_scheduler import RetryScheduler
+from delete_engine import delete_tree
+from lock_providers import detect_lock_provider
+from handle_tool import resource_path, get_handle_exe_path
+
+def check_directory_snapshot(directory_path, lock_index, progress_callback=None, result_callback=None):
+    """Находит блокировки внутри директории по готовому индексу снимка дескрипторов"""
+    if progress_callback and not progress_callback(0, 1):
+        return {"error": "Операция отменена пользователем"}
+
+    blocking_processes = lock_index.query_subtree(directory_path)
+    if blocking_processes and result_callback:
+        result_callback(blocking_processes)
+
+    if progress_callback:
+        progress_callback(1, 1)
+
+    logging.info(f"Найдено {len(blocking_processes)} блокировок в {directory_path} по снимку")
+    return blocking_processes
+
+# Кэш результатов анализа: канонический путь -> (время записи, список процессов)
+ANALYSIS_CACHE_TTL = 30.0  # Время жизни записи в секундах
+ANALYSIS_CACHE_MAX_ENTRIES = 64  # Максимум записей, старые вытесняются (LRU)
+_analysis_cache = OrderedDict()
+_analysis_cache_lock = threading.Lock()
+
+def _get_cached_analysis(path):
+    """Возвращает копию закэшированного результата анализа или None"""
+    key = canonical_path(path)
+    with _analysis_cache_lock:
+        entry = _analysis_cache.get(key)
+        if entry is None:
+            return None
+        stored_at, processes = entry
+        if time.monotonic() - stored_at > ANALYSIS_CACHE_TTL:
+            del _analysis_cache[key]
+            return None
+        _analysis_cache.move_to_end(key)
+        return [dict(process) for process in processes]
+
+def _store_cached_analysis(path, processes):
+    """Сохраняет результат анализа в кэш, вытесняя самые старые записи"""
+    key = canonical_path(path)
+    with _analysis_cache_lock:
+        _analysis_cache[key] = (time.monotonic(), [dict(process) for process in processes])
+        _analysis_cache.move_to_end(key)
+        while len(_analysis_cache) > ANALYSIS_CACHE_MAX_ENTRIES:
+            _analysis_cache.popitem(last=False)
 
-def get_blocking_processes(path, progress_callback=None):
+def clear_cache(path=None):
     """
-    Использует утилиту handle для определения процессов, блокирующих файл или папку
+    Очищает кэш результатов анализа
+
+    Args:
+        path: Если указан, удаляются только записи для этого пути,
+              его родительских папок и вложенных элементов
+    """
+    with _analysis_cache_lock:
+        if path is None:
+            _analysis_cache.clear()
+            return
+
+        key = canonical_path(os.path.abspath(path))
+        for cached_key in list(_analysis_cache):
+            if (cached_key == key
+                    or key.startswith(cached_key.rstrip(os.sep) + os.sep)
+                    or cached_key.startswith(key.rstrip(os.sep) + os.sep)):
+                del _analysis_cache[cached_key]
+
+def invalidates_analysis_cache(func):
+    """Декоратор: после операции над путем сбрасывает кэш анализа для этого пути"""
+    @functools.wraps(func)
+    def wrapper(path, *args, **kwargs):
+        try:
+            return func(path, *args, **kwargs)
+        finally:
+            if path:
+                clear_cache(path)
+    return wrapper
+
+def get_blocking_processes(path, progress_callback=None, use_snapshot=True, lock_index=None, use_cache=True,
+                           tree_scan=None, result_callback=None, on_tree_scan=None):
+    """
+    Определяет процессы, блокирующие файл или папку
+
+    Сведения о блокировках берутся из источника get_lock_provider(): handle.exe
+    в Windows, /proc в Linux (или заданного через set_lock_provider).
+    Для папок по умолчанию используется режим снимка: handle.exe запускается один раз
+    для всей системы, а каждый файл дерева проверяется по полученной карте путей.
+    Готовый индекс снимка (lock_index) можно передать, чтобы ответить на несколько
+    запросов без повторного запуска handle.exe. Готовый результат обхода папки
+    (tree_scan) используется вместо повторного обхода дерева.
+
+    Успешные результаты кэшируются на ANALYSIS_CACHE_TTL секунд; кэш сбрасывается
+    через clear_cache() и автоматически после разблокировки или удаления пути.
+
+    result_callback(records) вызывается с каждой порцией найденных блокировок
+    сразу по мере их обнаружения, до возврата полного списка.
+
+    Дерево папки обходится только там, где без него не обойтись (пофайловая
+    проверка без снимка); ответ из кэша, снимок и /proc обхода не требуют.
+    Выполненный обход передается в on_tree_scan(tree_scan), чтобы его
+    использовало и удаление.
     """
     if not path or not os.path.exists(path):
         logging.error(f"Путь не существует: {path}")
@@ -57,26 +127,163 @@ def get_blocking_processes(path, progress_callback=None):
     path = os.path.abspath(path)
     logging.info(f"Проверка блокировок для: {path}")
     
-    # Находим handle.exe
-    handle_exe = get_handle_exe_path()
-    if not handle_exe:
-        logging.error("Не найдена утилита handle.exe")
+    # Если передан готовый снимок, отвечаем по нему без запуска handle.exe
+    if lock_index is not None:
+        if os.path.isdir(path):
+            return check_directory_snapshot(path, lock_index, progress_callback, result_callback)
+        blocking_processes = lock_index.query_path(path)
+        if blocking_processes and result_callback:
+            result_callback(blocking_processes)
+        return blocking_processes
+    
+    if use_cache:
+        cached = _get_cached_analysis(path)
+        if cached is not None:
+            logging.info(f"Результат анализа взят из кэша: {path}")
+            if cached and result_callback:
+                result_callback(cached)
+            return cached
+    
+    blocking_processes = _find_blocking_processes(path, progress_callback, use_snapshot, tree_scan, result_callback,
+                                                  on_tree_scan)
+    
+    if use_cache and isinstance(blocking_processes, list):
+        _store_cached_analysis(path, blocking_processes)
+    
+    return blocking_processes
+
+def get_blocking_processes_batch(paths, progress_callback=None, result_callback=None):
+    """
+    Определяет процессы, блокирующие несколько файлов или папок сразу
+
+    Используется для пачки путей из контекстного меню (выделение нескольких
+    элементов). Все пути проверяются по одному снимку источника
+    (provider.query_batch): один запуск handle.exe или одно чтение /proc и
+    /proc/locks на всю пачку. Если снимок недоступен, пути проверяются по
+    отдельности, как в get_blocking_processes.
+
+    Args:
+        paths: Список путей
+        progress_callback: Функция (обработано путей, всего); возврат False отменяет анализ
+        result_callback: Функция, получающая порции найденных блокировок
+
+    Returns:
+        list: Общий список блокирующих процессов, либо dict с ключом "error"
+    """
+    paths = [os.path.abspath(path) for path in paths if path and os.path.exists(path)]
+    if not paths:
+        return {"error": "Ни один из переданных путей не существует"}
+
+    provider = get_lock_provider()
+    if provider is None:
+        return {"error": "Не найдена утилита handle.exe. Убедитесь, что она находится в директории программы или в папке resources."}
+
+    started = time.monotonic()
+    if progress_callback and not progress_callback(0, len(paths)):
+        return {"error": "Операция отменена пользователем"}
+    holders_by_path = provider.query_batch(paths)
+    if "error" in holders_by_path:
+        logging.warning(f"Не удалось получить снимок для пачки ({holders_by_path['error']}), "
+                        f"пути проверяются по отдельности")
+        holders_by_path = None
+
+    blocking_processes = []
+    seen = set()
+    errors = []
+    for done, path in enumerate(paths):
+        if progress_callback and not progress_callback(done, len(paths)):
+            return {"error": "Операция отменена пользователем"}
+        if holders_by_path is not None:
+            result = holders_by_path[path]
+            if result and result_callback:
+                result_callback(result)
+        else:
+            result = get_blocking_processes(path, result_callback=result_callback)
+        if isinstance(result, dict):
+            logging.warning(f"Не удалось проверить {path}: {result.get('error')}")
+            errors.append(result)
+            continue
+        for record in result:
+            key = (canonical_path(record["file_path"]), record["pid"], record["handle_type"])
+            if key not in seen:
+                seen.add(key)
+                blocking_processes.append(record)
+
+    # Ошибка отдельного пути не мешает показать блокировки остальных
+    if len(errors) == len(paths):
+        return errors[0]
+    if progress_callback:
+        progress_callback(len(paths), len(paths))
+    logging.info(f"Пачка из {len(paths)} путей: {len(blocking_processes)} блокировок "
+                 f"за {time.monotonic() - started:.2f} сек")
+    return blocking_processes
+
+# Источник блокировок, выбранный для программы (см. get_lock_provider)
+_lock_provider = None
+_lock_provider_lock = threading.Lock()
+
+def get_lock_provider():
+    """Возвращает источник блокировок: заданный через set_lock_provider или определенный для системы"""
+    global _lock_provider
+    with _lock_provider_lock:
+        if _lock_provider is None:
+            # Если handle.exe не найден, повторим поиск при следующем запросе
+            _lock_provider = detect_lock_provider()
+        return _lock_provider
+
+def set_lock_provider(provider):
+    """Заменяет источник блокировок (None - определить заново); сбрасывает кэш анализа"""
+    global _lock_provider
+    with _lock_provider_lock:
+        _lock_provider = provider
+    clear_cache()
+
+def _find_blocking_processes(path, progress_callback=None, use_snapshot=True, tree_scan=None, result_callback=None,
+                             on_tree_scan=None):
+    """Выполняет анализ блокировок без использования кэша"""
+    provider = get_lock_provider()
+    if provider is None:
         return {"error": "Не найдена утилита handle.exe. Убедитесь, что она находится в директории программы или в папке resources."}
     
+    # Источник видит всех владельцев (/proc) - его ответ окончательный
+    if provider.exact:
+        if progress_callback and not progress_callback(0, 1):
+            return {"error": "Операция отменена пользователем"}
+        if os.path.isdir(path):
+            blocking_processes = provider.query_subtree(path, tree_scan)
+        else:
+            blocking_processes = provider.query_path(path)
+        if isinstance(blocking_processes, dict):
+            return blocking_processes
+        if blocking_processes and result_callback:
+            result_callback(blocking_processes)
+        if progress_callback:
+            progress_callback(1, 1)
+        logging.info(f"Найдено {len(blocking_processes)} блокировок в {path} ({provider.name})")
+        return blocking_processes
+    
     # Если это папка, проверяем размер директории
     if os.path.isdir(path):
-        # Подсчитываем файлы для определения необходимости прогресса
-        file_count = 0
-        for root, _, files in os.walk(path):
-            file_count += len(files)
-            # Если более 100 файлов, предупреждаем о возможной длительности
-            if file_count > 100:
-                logging.info(f"Крупная директория: {path}, содержит более 100 файлов")
-                break
+        # Режим снимка: один запрос ко всей системе вместо запроса на каждый файл
+        if use_snapshot:
+            lock_index = provider.snapshot()
+            if lock_index is not None:
+                return check_directory_snapshot(path, lock_index, progress_callback, result_callback)
+            logging.warning("Не удалось получить снимок дескрипторов, используем пофайловую проверку")
+
+        # Обходим дерево один раз, результат используют все следующие этапы
+        if tree_scan is None:
+            tree_scan = scan_tree(path, progress_callback)
+            if isinstance(tree_scan, dict):
+                return tree_scan
+            if on_tree_scan:
+                on_tree_scan(tree_scan)
         
         # Для крупных директорий используем оптимизированный метод
-        if file_count > 100:
-            return check_large_directory(path, handle_exe, progress_callback)
+        if tree_scan.file_count > 100:
+            logging.info(f"Крупная директория: {path}, содержит {tree_scan.file_count} файлов")
+            return check_large_directory(path, provider, progress_callback, tree_scan,
+                                         result_callback=result_callback)
     
     # Сначала попробуем использовать встроенное API Windows для проверки
     if os.path.isfile(path):
@@ -84,142 +291,34 @@ def get_blocking_processes(path, progress_callback=None):
         if is_locked:
             logging.info(f"Файл заблокирован (проверка через Windows API): {path}")
     
-    # Запускаем утилиту handle и получаем вывод
+    # Запрашиваем источник блокировок
     try:
-        # Подготовка пути к файлу для использования в командной строке
-        # Обработка имен с пробелами и кириллицей
-        search_path = path
-        
-        # Определяем текущую кодировку системы
-        system_encoding = locale.getpreferredencoding()
-        
-        # Сначала попробуем запустить с auto-accept EULA
-        result = subprocess.run([handle_exe, "-accepteula", "-nobanner", search_path], 
-                            capture_output=True, 
-                            text=False,  # Получаем байты вместо текста для корректной обработки кодировки
-                            creationflags=subprocess.CREATE_NO_WINDOW)
-        
-        # Пробуем разные кодировки для декодирования вывода
-        for encoding in [system_encoding, 'utf-8', 'cp1251', 'cp866', 'latin-1']:
-            try:
-                output = result.stdout.decode(encoding)
-                error_output = result.stderr.decode(encoding)
-                break
-            except UnicodeDecodeError:
-                continue
-        else:
-            # Если ни одна кодировка не сработала, используем latin-1 (всегда работает, даже если с искажениями)
-            output = result.stdout.decode('latin-1')
-            error_output = result.stderr.decode('latin-1')
-        
-        # Логируем вывод для отладки
-        logging.debug(f"Вывод handle.exe: {output}")
-        if error_output:
-            logging.debug(f"Ошибки handle.exe: {error_output}")
-        
-        # Проверяем на ошибки
-        if result.returncode != 0 and "No matching handles found" not in output:
-            if "EULA" in error_output or "EULA" in output:
-                # Если проблема с EULA, пробуем еще раз с флагом -accepteula
-                logging.warning("Обнаружена проблема с EULA, повторный запуск с -accepteula")
-                result = subprocess.run([handle_exe, "-accepteula", "-nobanner", search_path], 
-                                    capture_output=True, 
-                                    text=False,
-                                    creationflags=subprocess.CREATE_NO_WINDOW)
-                
-                # Декодируем с учетом разных кодировок
-                for encoding in [system_encoding, 'utf-8', 'cp1251', 'cp866', 'latin-1']:
-                    try:
-                        output = result.stdout.decode(encoding)
-                        break
-                    except UnicodeDecodeError:
-                        continue
-                else:
-                    output = result.stdout.decode('latin-1')
-            else:
-                logging.error(f"Ошибка выполнения handle.exe: {error_output}")
-                return {"error": f"Ошибка выполнения handle.exe: {error_output}"}
+        blocking_processes = provider.query_path(path)
+        if isinstance(blocking_processes, dict):
+            return blocking_processes
         
         # Если нет результатов и это файл, пробуем использовать только имя файла
-        if "No matching handles found" in output and os.path.isfile(path):
+        if not blocking_processes and os.path.isfile(path):
             basename = os.path.basename(path)
             logging.info(f"Не найдены блокировки по полному пути, пробуем по имени файла: {basename}")
-            result = subprocess.run([handle_exe, "-accepteula", "-nobanner", basename], 
-                                   capture_output=True, 
-                                   text=False,
-                                   creationflags=subprocess.CREATE_NO_WINDOW)
-            
-            # Декодируем с учетом разных кодировок
-            for encoding in [system_encoding, 'utf-8', 'cp1251', 'cp866', 'latin-1']:
-                try:
-                    output = result.stdout.decode(encoding)
-                    break
-                except UnicodeDecodeError:
-                    continue
-            else:
-                output = result.stdout.decode('latin-1')
+            blocking_processes = provider.query_path(basename)
+            if isinstance(blocking_processes, dict):
+                return blocking_processes
         
         # Если это папка и не найдены блокировки, проверяем все файлы в ней
-        if os.path.isdir(path) and "No matching handles found" in output:
+        if os.path.isdir(path) and not blocking_processes:
             logging.info(f"Проверка всех файлов в папке: {path}")
-            return check_directory_files(path, handle_exe, progress_callback)
+            return check_directory_files(path, provider, progress_callback, tree_scan,
+                                         result_callback=result_callback)
             
     except Exception as e:
-        logging.error(f"Ошибка при выполнении handle.exe: {str(e)}")
+        logging.error(f"Ошибка при запросе к {provider.name}: {str(e)}")
         return {"error": f"Не удалось выполнить проверку: {str(e)}"}
     
-    # Парсим вывод handle
-    blocking_processes = []
-    
-    # Проходим по каждой строке вывода handle.exe
-    for line in output.splitlines():
-        # Ищем строку, которая содержит "pid:" и "type: File"
-        if "pid:" in line and "type:" in line and "File" in line:
-            try:
-                # Разделяем строку на части, чтобы извлечь имя процесса и pid
-                parts = line.split("pid:")
-                if len(parts) < 2:
-                    continue
-                
-                process_name = parts[0].strip()
-                
-                # Находим pid между "pid:" и "type:"
-                pid_parts = parts[1].split("type:")
-                if len(pid_parts) < 2:
-                    continue
-                
-                pid_str = pid_parts[0].strip()
-                try:
-                    pid = int(pid_str)
-                except ValueError:
-                    continue
-                
-                # Извлекаем тип (должен быть "File")
-                handle_type = "File"  # Мы уже проверили, что строка содержит "File"
-                
-                # Пытаемся найти путь к файлу
-                colon_index = parts[1].find(":", parts[1].find("type:"))
-                if colon_index != -1:
-                    file_path = parts[1][colon_index + 1:].strip()
-                else:
-                    # Если не удалось извлечь путь, используем исходный путь
-                    file_path = path
-                
-                # Добавляем найденный процесс в список
-                if pid > 0:  # Проверяем, что pid больше 0
-                    blocking_processes.append({
-                        "process_name": process_name,
-                        "pid": pid,
-                        "handle_type": handle_type,
-                        "file_path": file_path
-                    })
-            except Exception as e:
-                logging.error(f"Ошибка при парсинге строки handle: {line}, ошибка: {str(e)}")
-                # Продолжаем со следующей строкой, если произошла ошибка
-                continue
-    
     # Логируем результаты
     if blocking_processes:
+        if result_callback:
+            result_callback(blocking_processes)
         logging.info(f"Найдено {len(blocking_processes)} блокирующих процессов")
         for proc in blocking_processes:
             logging.debug(f"Блокирующий процесс: {proc['process_name']} (PID: {proc['pid']})")
@@ -230,323 +329,204 @@ def get_blocking_processes(path, progress_callback=None):
         if os.path.isfile(path) and check_file_locked_windows_api(path):
             logging.warning(f"Файл заблокирован, но handle.exe не определил блокирующие процессы: {path}")
             # Возвращаем универсальный процесс-заглушку для Explorer
-            return [{
+            blocking_processes = [{
                 "process_name": "explorer.exe (предположительно)",
                 "pid": 0,  # Фиктивный PID
                 "handle_type": "File",
                 "file_path": path
             }]
+            if result_callback:
+                result_callback(blocking_processes)
     
     return blocking_processes
 
-def check_large_directory(directory_path, handle_exe, progress_callback=None):
-    """Оптимизированная проверка большой директории - сначала ищем заблокированные файлы"""
+# Число потоков для параллельной проверки блокировок файлов (проверка
+# упирается в файловую систему, а не в процессор, поэтому потоков больше, чем ядер)
+MAX_PARALLEL_LOCK_PROBES = min(32, (os.cpu_count() or 4) * 4)
+
+# Когда прекращать проверку папки: None - проверить все файлы,
+# N - остановиться после N найденных заблокированных файлов (1 - до первого)
+LOCK_PROBE_STOP_AFTER = None
+
+def _probe_batch(file_paths):
+    """Проверяет порцию файлов и возвращает заблокированные"""
+    locked = []
+    for file_path in file_paths:
+        try:
+            if check_file_locked_windows_api(file_path):
+                locked.append(file_path)
+        except Exception as e:
+            logging.debug(f"Ошибка при проверке файла {file_path}: {str(e)}")
+    return locked
+
+def probe_locked_files(file_paths, stop_after=None, progress_callback=None, total=None, max_workers=None):
+    """
+    Проверяет все файлы на блокировку параллельно в пуле потоков
+
+    Пути читаются потоком порциями; в работе одновременно не больше
+    max_workers порций, поэтому память не зависит от размера дерева.
+
+    Args:
+        file_paths: Итерируемый набор путей к файлам
+        stop_after: Остановиться после стольких заблокированных файлов (None - проверить все)
+        progress_callback: Функция (проверено, всего); возврат False отменяет операцию
+        total: Общее число файлов для прогресса (если известно)
+        max_workers: Максимум одновременно работающих потоков
+
+    Returns:
+        list: Заблокированные файлы, либо dict с ключом "error" при отмене
+    """
+    max_workers = max(1, max_workers or MAX_PARALLEL_LOCK_PROBES)
+    locked_files = []
+    checked = 0
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        batches = iter_batches(file_paths)
+        pending = {}
+        for batch in itertools.islice(batches, max_workers):
+            pending[executor.submit(_probe_batch, batch)] = len(batch)
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                checked += pending.pop(future)
+                locked_files.extend(future.result())
+
+            if stop_after and len(locked_files) >= stop_after:
+                for future in pending:
+                    future.cancel()
+                logging.info(f"Проверка остановлена после {len(locked_files)} заблокированных файлов")
+                return locked_files[:stop_after]
+
+            if progress_callback and not progress_callback(checked, total or checked):
+                for future in pending:
+                    future.cancel()
+                return {"error": "Операция отменена пользователем"}
+
+            for batch in itertools.islice(batches, len(done)):
+                pending[executor.submit(_probe_batch, batch)] = len(batch)
+
+    logging.info(f"Проверено {checked} файлов, заблокировано {len(locked_files)}")
+    return locked_files
+
+def check_large_directory(directory_path, provider, progress_callback=None, tree_scan=None,
+                          stop_after=LOCK_PROBE_STOP_AFTER, result_callback=None):
+    """
+    Проверка большой директории - сначала ищем заблокированные файлы
+
+    Проверяются все файлы дерева параллельно (probe_locked_files);
+    stop_after позволяет остановиться после первых найденных блокировок.
+    """
     logging.info(f"Оптимизированная проверка большой директории: {directory_path}")
     
-    # Собираем все файлы
-    all_files = []
-    for root, _, files in os.walk(directory_path):
-        for file in files:
-            all_files.append(os.path.join(root, file))
+    if tree_scan is None:
+        tree_scan = scan_tree(directory_path)
     
-    total_files = len(all_files)
+    total_files = tree_scan.file_count
     logging.info(f"Общее количество файлов в директории: {total_files}")
     
-    # Определяем максимальное количество файлов для проверки
-    max_files_to_check = min(100, total_files)  # Не более 100 файлов для проверки
-    
-    # Выбираем случайные файлы для проверки
-    import random
-    files_to_check = random.sample(all_files, max_files_to_check) if total_files > max_files_to_check else all_files
-    
-    # Сначала пробуем определить, есть ли заблокированные файлы через Windows API
-    locked_files = []
-    for i, file_path in enumerate(files_to_check):
-        # Проверяем, не отменена ли операция
-        if progress_callback and not progress_callback(i, len(files_to_check)):
-            return {"error": "Операция отменена пользователем"}
-            
-        try:
-            if check_file_locked_windows_api(file_path):
-                locked_files.append(file_path)
-                # Если нашли блокировку, не проверяем все файлы
-                if len(locked_files) >= 5:  # Ограничиваем количество поиска для скорости
-                    break
-        except Exception as e:
-            logging.debug(f"Ошибка при проверке файла {file_path}: {str(e)}")
+    # Проверяем все файлы через Windows API параллельно
+    locked_files = probe_locked_files(tree_scan.file_paths(), stop_after, progress_callback, total_files)
+    if isinstance(locked_files, dict):
+        return locked_files
     
     # Если не нашли заблокированных файлов, пробуем проверить саму директорию
     if not locked_files:
         try:
-            # Определяем текущую кодировку системы
-            system_encoding = locale.getpreferredencoding()
-            
-            # Проверяем директорию с помощью handle.exe
-            result = subprocess.run([handle_exe, "-accepteula", "-nobanner", directory_path], 
-                                capture_output=True, 
-                                text=False,
-                                creationflags=subprocess.CREATE_NO_WINDOW)
+            # Проверяем саму директорию через источник блокировок
+            blocking_processes = provider.query_path(directory_path)
             
-            # Декодируем вывод
-            for encoding in [system_encoding, 'utf-8', 'cp1251', 'cp866', 'latin-1']:
-                try:
-                    output = result.stdout.decode(encoding)
-                    break
-                except UnicodeDecodeError:
-                    continue
-            else:
-                output = result.stdout.decode('latin-1')
-            
-            # Если нашли что-то, парсим и возвращаем результаты
-            if "No matching handles found" not in output:
-                # Проходим по каждой строке вывода handle.exe
-                blocking_processes = []
-                for line in output.splitlines():
-                    # Ищем строку, которая содержит "pid:" и "type: File"
-                    if "pid:" in line and "type:" in line and "File" in line:
-                        try:
-                            # Разделяем строку на части, чтобы извлечь имя процесса и pid
-                            parts = line.split("pid:")
-                            if len(parts) < 2:
-                                continue
-                            
-                            process_name = parts[0].strip()
-                            
-                            # Находим pid между "pid:" и "type:"
-                            pid_parts = parts[1].split("type:")
-                            if len(pid_parts) < 2:
-                                continue
-                            
-                            pid_str = pid_parts[0].strip()
-                            try:
-                                pid = int(pid_str)
-                            except ValueError:
-                                continue
-                            
-                            # Извлекаем тип (должен быть "File")
-                            handle_type = "File"  # Мы уже проверили, что строка содержит "File"
-                            
-                            # Пытаемся найти путь к файлу
-                            colon_index = parts[1].find(":", parts[1].find("type:"))
-                            if colon_index != -1:
-                                file_path = parts[1][colon_index + 1:].strip()
-                            else:
-                                # Если не удалось извлечь путь, используем исходный путь
-                                file_path = directory_path
-                            
-                            # Добавляем найденный процесс в список
-                            blocking_processes.append({
-                                "process_name": process_name,
-                                "pid": pid,
-                                "handle_type": handle_type,
-                                "file_path": file_path
-                            })
-                        except Exception as e:
-                            logging.error(f"Ошибка при парсинге строки handle: {line}, ошибка: {str(e)}")
-                            continue
-                
-                if blocking_processes:
-                    logging.info(f"Найдено {len(blocking_processes)} блокирующих процессов для директории")
-                    return blocking_processes
+            # Если нашли что-то, возвращаем результаты
+            if not isinstance(blocking_processes, dict) and blocking_processes:
+                logging.info(f"Найдено {len(blocking_processes)} блокирующих процессов для директории")
+                if result_callback:
+                    result_callback(blocking_processes)
+                return blocking_processes
         except Exception as e:
             logging.error(f"Ошибка при проверке директории {directory_path}: {str(e)}")
     
-    # Теперь проверяем найденные заблокированные файлы
-    blocking_processes = []
+    # Теперь проверяем найденные заблокированные файлы пакетами по общим папкам
+    holders_by_file = provider.query_paths(locked_files, progress_callback, root=directory_path,
+                                           result_callback=result_callback)
+    if "error" in holders_by_file:
+        return holders_by_file
     
-    for i, file_path in enumerate(locked_files):
-        # Проверяем, не отменена ли операция
-        if progress_callback and not progress_callback(i, len(locked_files)):
-            return {"error": "Операция отменена пользователем"}
-            
-        try:
-            # Определяем текущую кодировку системы
-            system_encoding = locale.getpreferredencoding()
-            
-            # Проверяем файл с помощью handle.exe
-            result = subprocess.run([handle_exe, "-accepteula", "-nobanner", file_path], 
-                                capture_output=True, 
-                                text=False,
-                                creationflags=subprocess.CREATE_NO_WINDOW)
-            
-            # Декодируем вывод
-            for encoding in [system_encoding, 'utf-8', 'cp1251', 'cp866', 'latin-1']:
-                try:
-                    output = result.stdout.decode(encoding)
-                    break
-                except UnicodeDecodeError:
-                    continue
-            else:
-                output = result.stdout.decode('latin-1')
-            
-            # Проходим по каждой строке вывода handle.exe
-            for line in output.splitlines():
-                # Ищем строку, которая содержит "pid:" и "type: File"
-                if "pid:" in line and "type:" in line and "File" in line:
-                    try:
-                        # Разделяем строку на части, чтобы извлечь имя процесса и pid
-                        parts = line.split("pid:")
-                        if len(parts) < 2:
-                            continue
-                        
-                        process_name = parts[0].strip()
-                        
-                        # Находим pid между "pid:" и "type:"
-                        pid_parts = parts[1].split("type:")
-                        if len(pid_parts) < 2:
-                            continue
-                        
-                        pid_str = pid_parts[0].strip()
-                        try:
-                            pid = int(pid_str)
-                        except ValueError:
-                            continue
-                        
-                        # Извлекаем тип (должен быть "File")
-                        handle_type = "File"  # Мы уже проверили, что строка содержит "File"
-                        
-                        # Пытаемся найти путь к файлу
-                        colon_index = parts[1].find(":", parts[1].find("type:"))
-                        if colon_index != -1:
-                            found_path = parts[1][colon_index + 1:].strip()
-                        else:
-                            # Если не удалось извлечь путь, используем текущий файл
-                            found_path = file_path
-                        
-                        # Добавляем найденный процесс в список, если такого процесса еще нет
-                        if not any(p["pid"] == pid and p["process_name"] == process_name for p in blocking_processes):
-                            blocking_processes.append({
-                                "process_name": process_name,
-                                "pid": pid,
-                                "handle_type": handle_type,
-                                "file_path": found_path
-                            })
-                    except Exception as e:
-                        logging.error(f"Ошибка при парсинге строки handle: {line}, ошибка: {str(e)}")
-                        continue
-        except Exception as e:
-            logging.error(f"Ошибка при проверке файла {file_path}: {str(e)}")
+    blocking_processes = []
+    for holders in holders_by_file.values():
+        for record in holders:
+            # Добавляем найденный процесс в список, если такого процесса еще нет
+            if not any(p["pid"] == record["pid"] and p["process_name"] == record["process_name"] for p in blocking_processes):
+                blocking_processes.append(record)
     
     # Если handle.exe не нашел процессы, но файлы заблокированы
     if locked_files and not blocking_processes:
         logging.warning(f"Найдены заблокированные файлы, но handle.exe не определил процессы")
         # Возвращаем универсальный процесс-заглушку для Explorer
-        return [{
+        blocking_processes = [{
             "process_name": "explorer.exe (предположительно)",
             "pid": 0,  # Фиктивный PID
             "handle_type": "File",
             "file_path": locked_files[0]  # Используем первый заблокированный файл
         }]
+        if result_callback:
+            result_callback(blocking_processes)
     
     return blocking_processes
 
-def check_directory_files(directory_path, handle_exe, progress_callback=None):
+def check_directory_files(directory_path, provider, progress_callback=None, tree_scan=None,
+                          stop_after=LOCK_PROBE_STOP_AFTER, result_callback=None):
     """Проверяет все файлы в директории на блокировки"""
     blocking_processes = []
     
     try:
-        # Собираем все файлы
-        files_to_check = []
-        for root, dirs, files in os.walk(directory_path):
-            for file in files:
-                files_to_check.append(os.path.join(root, file))
+        if tree_scan is None:
+            tree_scan = scan_tree(directory_path)
         
-        total_files = len(files_to_check)
-        processed = 0
+        # Проверяем каждый файл с помощью Windows API параллельно
+        locked_files = probe_locked_files(tree_scan.file_paths(), stop_after, progress_callback, tree_scan.file_count)
+        if isinstance(locked_files, dict):
+            return locked_files
         
-        for file_path in files_to_check:
-            # Обновляем прогресс
-            if progress_callback:
-                if not progress_callback(processed, total_files):
-                    return {"error": "Операция отменена пользователем"}
-            
-            processed += 1
+        # Заблокированные файлы проверяем с помощью handle.exe пакетами по общим папкам
+        for batch in iter_batches(locked_files):
+            holders_by_file = provider.query_paths(batch, progress_callback, root=directory_path,
+                                                   result_callback=result_callback)
+            if "error" in holders_by_file:
+                return holders_by_file
             
-            # Проверяем каждый файл с помощью Windows API
-            if check_file_locked_windows_api(file_path):
-                logging.info(f"Файл в директории заблокирован: {file_path}")
+            for file_path in batch:
+                blocking_processes.extend(holders_by_file[file_path])
                 
-                # Проверяем его с помощью handle.exe
-                try:
-                    # Определяем текущую кодировку системы
-                    system_encoding = locale.getpreferredencoding()
-                    
-                    result = subprocess.run([handle_exe, "-accepteula", "-nobanner", file_path], 
-                                        capture_output=True, 
-                                        text=False,
-                                        creationflags=subprocess.CREATE_NO_WINDOW)
-                    
-                    # Декодируем с учетом разных кодировок
-                    for encoding in [system_encoding, 'utf-8', 'cp1251', 'cp866', 'latin-1']:
-                        try:
-                            output = result.stdout.decode(encoding)
-                            break
-                        except UnicodeDecodeError:
-                            continue
-                    else:
-                        output = result.stdout.decode('latin-1')
-                    
-                    # Проходим по каждой строке вывода handle.exe
-                    for line in output.splitlines():
-                        # Ищем строку, которая содержит "pid:" и "type: File"
-                        if "pid:" in line and "type:" in line and "File" in line:
-                            try:
-                                # Разделяем строку на части, чтобы извлечь имя процесса и pid
-                                parts = line.split("pid:")
-                                if len(parts) < 2:
-                                    continue
-                                
-                                process_name = parts[0].strip()
-                                
-                                # Находим pid между "pid:" и "type:"
-                                pid_parts = parts[1].split("type:")
-                                if len(pid_parts) < 2:
-                                    continue
-                                
-                                pid_str = pid_parts[0].strip()
-                                try:
-                                    pid = int(pid_str)
-                                except ValueError:
-                                    continue
-                                
-                                # Извлекаем тип (должен быть "File")
-                                handle_type = "File"  # Мы уже проверили, что строка содержит "File"
-                                
-                                # Пытаемся найти путь к файлу
-                                colon_index = parts[1].find(":", parts[1].find("type:"))
-                                if colon_index != -1:
-                                    found_path = parts[1][colon_index + 1:].strip()
-                                else:
-                                    # Если не удалось извлечь путь, используем текущий файл
-                                    found_path = file_path
-                                
-                                # Добавляем найденный процесс в список
-                                blocking_processes.append({
-                                    "process_name": process_name,
-                                    "pid": pid,
-                                    "handle_type": handle_type,
-                                    "file_path": found_path
-                                })
-                            except Exception as e:
-                                logging.error(f"Ошибка при парсинге строки handle: {line}, ошибка: {str(e)}")
-                                continue
-                except Exception as e:
-                    logging.error(f"Ошибка при проверке файла {file_path}: {str(e)}")
-                    
                 # Если handle.exe не нашел процессы, но файл заблокирован
-                if check_file_locked_windows_api(file_path) and not any(p["file_path"].lower() == file_path.lower() for p in blocking_processes):
+                if not holders_by_file[file_path] and check_file_locked_windows_api(file_path):
                     logging.warning(f"Файл заблокирован, но handle.exe не определил процесс: {file_path}")
-                    blocking_processes.append({
+                    placeholder = {
                         "process_name": "explorer.exe (предположительно)",
                         "pid": 0,  # Фиктивный PID
                         "handle_type": "File",
                         "file_path": file_path
-                    })
+                    }
+                    blocking_processes.append(placeholder)
+                    if result_callback:
+                        result_callback([placeholder])
     except Exception as e:
         logging.error(f"Ошибка при сканировании файлов в директории: {str(e)}")
     
     return blocking_processes
 
+# Коды ошибок Windows, означающие, что файл открыт другим процессом
+LOCK_WINERRORS = {
+    32,  # ERROR_SHARING_VIOLATION
+    33,  # ERROR_LOCK_VIOLATION
+}
+
+def _is_read_only(file_path):
+    """Проверяет атрибут "только для чтения" (в Windows) или отсутствие права записи"""
+    try:
+        return not os.stat(file_path).st_mode & stat.S_IWRITE
+    except OSError:
+        return False
+
 def check_file_locked_windows_api(file_path):
     """Проверяет, заблокирован ли файл, с помощью Windows API"""
     try:
@@ -559,6 +539,12 @@ def check_file_locked_windows_api(file_path):
                 with open(file_path, "ab") as f:
                     pass
                 return False  # Если удалось открыть для чтения и записи, файл не заблокирован
+            except PermissionError as e:
+                # Файл только для чтения открыть на запись нельзя, но он не заблокирован.
+                # Нарушение совместного доступа (ERROR_SHARING_VIOLATION) - это блокировка
+                if getattr(e, "winerror", None) not in LOCK_WINERRORS and _is_read_only(file_path):
+                    return False
+                return True
             except IOError:
                 # Файл заблокирован для записи, но доступен для чтения
                 return True
@@ -583,13 +569,7 @@ def is_system_critical_process(process_name, pid):
         if process_name.lower() == "explorer.exe" or process_name.lower() == "svchost.exe":
             try:
                 # Получаем количество запущенных экземпляров этого процесса
-                import subprocess
-                result = subprocess.run(
-                    ["tasklist", "/fi", f"imagename eq {process_name}", "/fo", "csv"], 
-                    capture_output=True, text=True
-                )
-                # Подсчитываем количество экземпляров (строк минус заголовок)
-                count = len(result.stdout.strip().split('\n')) - 1
+                count = get_process_table().instance_count(process_name)
                 # Если больше одного экземпляра, можно завершить
                 return count <= 1
             except:
@@ -604,32 +584,119 @@ def is_system_critical_process(process_name, pid):
 def is_process_running(pid):
     """Проверяет, запущен ли процесс с указанным PID"""
     try:
-        process = subprocess.run(
-            ["tasklist", "/fi", f"pid eq {pid}", "/fo", "csv"], 
-            capture_output=True, 
-            text=True,
-            creationflags=subprocess.CREATE_NO_WINDOW
-        )
-        
-        # Если PID найден, в выводе будет строка с PID
-        return str(pid) in process.stdout
+        return get_process_table().is_running(pid)
     except Exception as e:
         logging.error(f"Ошибка при проверке процесса {pid}: {str(e)}")
         # В случае ошибки предполагаем, что процесс запущен
         return True
 
+# Максимальное время ожидания снятия блокировки после завершения процессов (секунды)
+LOCK_RELEASE_TIMEOUT = 6.0
+# Начальный и максимальный интервалы повторной проверки блокировки
+LOCK_RELEASE_POLL_INTERVAL = 0.01
+LOCK_RELEASE_POLL_MAX_INTERVAL = 0.5
+
+def _initial_locked_paths(path, tree_scan=None, locked_paths=None):
+    """Определяет набор файлов, освобождения которых нужно дождаться"""
+    if os.path.isfile(path):
+        return {path}
+    if locked_paths is not None:
+        # Известные по анализу файлы; дескрипторы самих папок проверить открытием нельзя
+        return {file_path for file_path in locked_paths if os.path.isfile(file_path)}
+    if tree_scan is None:
+        return set()
+    # Один полный проход, дальше проверяются только найденные файлы
+    locked = probe_locked_files(tree_scan.file_paths(), total=tree_scan.file_count)
+    return set(locked) if isinstance(locked, list) else set()
+
+def _still_locked(pending):
+    """Перепроверяет только еще заблокированные файлы и возвращает оставшиеся"""
+    return {file_path for file_path in pending
+            if os.path.exists(file_path) and check_file_locked_windows_api(file_path)}
+
+def wait_for_unlock(path, tree_scan=None, timeout=LOCK_RELEASE_TIMEOUT, locked_paths=None):
+    """
+    Ожидает снятия блокировки с файла или папки
+
+    Проверяются только заблокированные файлы (locked_paths из анализа, либо
+    найденные одним полным проходом по tree_scan), и набор сокращается по мере
+    их освобождения. Если после первой перепроверки что-то осталось, источник
+    блокировок опрашивается только по оставшимся путям, и ожидание
+    переходит на выход удерживающих их процессов. Первая проверка выполняется
+    сразу, затем интервал растет от LOCK_RELEASE_POLL_INTERVAL до
+    LOCK_RELEASE_POLL_MAX_INTERVAL.
+
+    Returns:
+        bool: True, если блокировка снята до истечения timeout
+    """
+    started = time.monotonic()
+    deadline = started + timeout
+    interval = LOCK_RELEASE_POLL_INTERVAL
+    attempt = 0
+    
+    pending = _initial_locked_paths(path, tree_scan, locked_paths)
+    logging.info(f"Ожидание освобождения {len(pending)} файлов: {path}")
+    
+    while True:
+        attempt += 1
+        pending = _still_locked(pending)
+        if not pending:
+            logging.info(f"Путь освобожден после {time.monotonic() - started:.3f} сек (проверка #{attempt})")
+            return True
+        
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            logging.warning(f"Путь не освободился за {timeout} сек, заблокировано файлов: {len(pending)}: {path}")
+            return False
+        
+        if attempt == 1:
+            # Дополнительная разблокировка - один раз, после первой неудачной проверки
+            try_alternative_unlock(path)
+            
+            # Узнаем, какие процессы еще держат оставшиеся файлы, и ждем их выхода
+            provider = get_lock_provider()
+            holders_by_file = provider.query_paths(pending) if provider is not None else None
+            if holders_by_file is not None and "error" not in holders_by_file:
+                pids = {holder["pid"] for holders in holders_by_file.values() for holder in holders if holder["pid"]}
+                if pids:
+                    logging.info(f"Оставшиеся файлы удерживают процессы: {', '.join(map(str, sorted(pids)))}")
+                    wait_for_exit(pids, max(0, deadline - time.monotonic()))
+                continue
+        
+        time.sleep(min(interval, remaining))
+        interval = min(interval * 2, LOCK_RELEASE_POLL_MAX_INTERVAL)
+
+@invalidates_analysis_cache
 def unlock_file(path, processes):
     """
     Разблокирует файл, закрывая указанные процессы
+
+    Все процессы, которые можно завершить, завершаются одним пакетом
+    (terminate_processes): сначала штатно, затем принудительно. В результате,
+    помимо общего сообщения, возвращается список "results" с итогом по каждому
+    процессу; для завершенных процессов в нем указаны способ ("method")
+    и время до выхода ("exit_time").
     """
     if not processes:
         logging.info(f"Нет процессов для завершения при разблокировке {path}")
-        return {"success": True, "message": "Нет процессов для завершения"}
+        return {"success": True, "message": "Нет процессов для завершения", "results": []}
     
     failed_processes = []
     successful_processes = []
     skipped_processes = []
+    results = []
     
+    def add_result(process, success, text, **details):
+        result = {"process_name": process.get("process_name", ""), "pid": process.get("pid", 0), "success": success}
+        result["message" if success else "error"] = text
+        result.update(details)
+        results.append(result)
+    
+    # Сначала отбираем процессы, которые действительно нужно завершить.
+    # Таблица процессов могла устареть и не знать процессы, запущенные после
+    # ее обновления, - перечитываем ее один раз на весь список
+    get_process_table().invalidate()
+    to_terminate = []
     for process in processes:
         pid = process["pid"]
         try:
@@ -638,47 +705,74 @@ def unlock_file(path, processes):
                 logging.info(f"Пропуск фиктивного процесса: {process['process_name']}")
                 # Пытаемся разблокировать файл альтернативным способом
                 try_alternative_unlock(process["file_path"])
+                add_result(process, True, "Фиктивный процесс пропущен")
                 continue
             
             # Проверяем, запущен ли процесс с указанным PID
             if not is_process_running(pid):
                 logging.info(f"Процесс {process['process_name']} (PID: {pid}) уже не запущен")
                 successful_processes.append(f"{process['process_name']} (PID: {pid}) [уже не запущен]")
+                add_result(process, True, "Процесс уже не запущен")
                 continue
                 
             # Проверка на критичный системный процесс
             if is_system_critical_process(process['process_name'], pid):
                 logging.warning(f"Пропуск критического системного процесса: {process['process_name']} (PID: {pid})")
                 skipped_processes.append(f"{process['process_name']} (PID: {pid}) - критический процесс")
+                add_result(process, True, "Критический процесс пропущен")
                 # Пытаемся разблокировать файл альтернативным способом
                 if try_alternative_unlock(process.get("file_path", "")):
                     logging.info(f"Файл успешно разблокирован альтернативным способом: {process['file_path']}")
                 continue
-                
-            logging.info(f"Попытка завершения процесса {process['process_name']} (PID: {pid})")
             
-            # Используем taskkill для завершения процесса
-            result = subprocess.run(["taskkill", "/F", "/PID", str(pid)], 
-                          capture_output=True, 
-                          text=True,
-                          creationflags=subprocess.CREATE_NO_WINDOW)
+            to_terminate.append(process)
+        except Exception as e:
+            logging.error(f"Исключение при проверке процесса {pid}: {str(e)}")
+            failed_processes.append(f"{process['process_name']} (PID: {pid})")
+            add_result(process, False, str(e))
+    
+    # Завершаем все отобранные процессы одним пакетом
+    if to_terminate:
+        logging.info(f"Попытка завершения {len(to_terminate)} процессов: "
+                     f"{', '.join(str(p['pid']) for p in to_terminate)}")
+        try:
+            outcomes = terminate_processes([process["pid"] for process in to_terminate])
+        except Exception as e:
+            logging.error(f"Исключение при завершении процессов: {str(e)}")
+            outcomes = {}
+        
+        reported = set()
+        for process in to_terminate:
+            pid = process["pid"]
+            # Один PID может удерживать несколько файлов - отчитываемся о нем один раз
+            if pid in reported:
+                continue
+            reported.add(pid)
             
-            if result.returncode != 0:
-                error_msg = result.stderr.strip() or "Неизвестная ошибка"
-                logging.error(f"Не удалось завершить процесс {pid}: {error_msg}")
-                failed_processes.append(f"{process['process_name']} (PID: {pid})")
-                
-                # Если не удалось завершить процесс, пробуем альтернативный метод разблокировки
-                if os.path.isfile(process.get("file_path", "")):
-                    if try_alternative_unlock(process["file_path"]):
-                        logging.info(f"Файл успешно разблокирован альтернативным способом: {process['file_path']}")
-                        successful_processes.append(f"{process['process_name']} (PID: {pid}) [альтернативный метод]")
-            else:
-                logging.info(f"Процесс {process['process_name']} (PID: {pid}) успешно завершен")
+            outcome = outcomes.get(pid, {"status": FAILED, "error": "Неизвестная ошибка"})
+            if outcome["status"] != FAILED:
+                details = {key: outcome[key] for key in ("method", "exit_time") if key in outcome}
+                if outcome.get("method") == GRACEFUL:
+                    text = f"Процесс закрыт штатно за {outcome['exit_time']:.2f} сек"
+                elif outcome.get("exit_time") is not None:
+                    text = f"Процесс завершен принудительно за {outcome['exit_time']:.2f} сек"
+                else:
+                    text = "Процесс завершен"
+                logging.info(f"Процесс {process['process_name']} (PID: {pid}): {text}")
                 successful_processes.append(f"{process['process_name']} (PID: {pid})")
-        except Exception as e:
-            logging.error(f"Исключение при завершении процесса {pid}: {str(e)}")
+                add_result(process, True, text, **details)
+                continue
+            
+            logging.error(f"Не удалось завершить процесс {pid}: {outcome['error']}")
             failed_processes.append(f"{process['process_name']} (PID: {pid})")
+            
+            # Если не удалось завершить процесс, пробуем альтернативный метод разблокировки
+            if os.path.isfile(process.get("file_path", "")) and try_alternative_unlock(process["file_path"]):
+                logging.info(f"Файл успешно разблокирован альтернативным способом: {process['file_path']}")
+                successful_processes.append(f"{process['process_name']} (PID: {pid}) [альтернативный метод]")
+                add_result(process, True, "Файл разблокирован альтернативным методом")
+            else:
+                add_result(process, False, outcome["error"])
     
     # Формируем сообщение о результатах
     if skipped_processes:
@@ -695,13 +789,17 @@ def unlock_file(path, processes):
         if skipped_processes:
             error_message += f"\n{skipped_message}"
             
-        return {"error": error_message}
+        return {"error": error_message, "results": results}
     
     success_message = f"Успешно завершено {len(successful_processes)} процессов"
     if skipped_processes:
         success_message += f"\n{skipped_message}"
     
-    return {"success": True, "message": success_message}
+    return {"success": True, "message": success_message, "results": results}
+
+# Файлы крупнее этого размера не копируются при альтернативной разблокировке
+# (копия многогигабайтного образа диска или базы данных займет минуты и место на диске)
+ALTERNATIVE_UNLOCK_MAX_COPY_SIZE = 256 * 1024 * 1024
 
 def try_alternative_unlock(file_path):
     """Пытается разблокировать файл альтернативными методами"""
@@ -709,14 +807,23 @@ def try_alternative_unlock(file_path):
         return False
         
     try:
+        # Методы с копированием применяем только к файлам разумного размера
+        try:
+            can_copy = os.path.getsize(file_path) <= ALTERNATIVE_UNLOCK_MAX_COPY_SIZE
+        except OSError:
+            can_copy = False
+        if not can_copy:
+            logging.info(f"Файл слишком велик для разблокировки копированием: {file_path}")
+        
         # Метод 1: Попытка копирования файла и замены оригинала
         temp_file = file_path + ".temp"
         
         try:
-            # Копируем файл с чтением и записью в двоичном режиме
-            with open(file_path, "rb") as src:
-                with open(temp_file, "wb") as dst:
-                    dst.write(src.read())
+            if not can_copy:
+                raise OSError("Копирование пропущено")
+            
+            # Копируем файл потоково (sendfile / блоками), не читая его целиком в память
+            shutil.copyfile(file_path, temp_file)
                     
             # Пытаемся удалить оригинальный файл
             os.remove(file_path)
@@ -747,8 +854,10 @@ def try_alternative_unlock(file_path):
                 pass
                 
             # Метод 3: Попытка использовать shutil вместо os функций
+            temp_file2 = file_path + ".temp2"
             try:
-                temp_file2 = file_path + ".temp2"
+                if not can_copy:
+                    raise OSError("Копирование пропущено")
                 shutil.copy2(file_path, temp_file2)
                 os.remove(file_path)
                 shutil.move(temp_file2, file_path)
@@ -779,10 +888,26 @@ def try_alternative_unlock(file_path):
         logging.error(f"Ошибка при альтернативной разблокировке {file_path}: {str(e)}")
         return False
 
-def delete_file(path):
+@invalidates_analysis_cache
+def delete_file(path, tree_scan=None):
     """
     Удаляет файл или папку с многократными попытками
+
+    Все повторы выполняются через RetryScheduler с общим бюджетом времени
+    на операцию; статистика доступна через retry_scheduler.get_retry_stats().
+
+    Args:
+        path: Путь к файлу или директории
+        tree_scan: Готовый результат обхода папки; не требуется - содержимое папок
+                   удаляет delete_engine.delete_tree, который обходит дерево сам
     """
+    with RetryScheduler("delete_file") as retry:
+        result = _delete_file(path, tree_scan, retry)
+        retry.succeeded = "success" in result
+    return result
+
+def _delete_file(path, tree_scan, retry):
+    """Удаление файла или папки (см. delete_file)"""
     if not path or not os.path.exists(path):
         logging.error(f"Путь не существует при попытке удаления: {path}")
         return {"error": f"Путь не существует: {path}"}
@@ -793,23 +918,10 @@ def delete_file(path):
         # Нормализуем путь для Windows
         normalized_path = os.path.normpath(path).replace('/', '\\')
         
-        # Увеличиваем паузу перед удалением
-        time.sleep(3.0)  # Увеличиваем паузу до 3 секунд
-        
-        # Функция для повторных попыток
-        def try_delete_with_retries(delete_func, max_attempts=5):
-            for attempt in range(1, max_attempts + 1):
-                try:
-                    delete_func()
-                    if not os.path.exists(path):
-                        return True
-                    logging.info(f"Попытка {attempt} не удалась, файл всё ещё существует")
-                    # Увеличиваем паузу с каждой попыткой
-                    time.sleep(attempt * 1.0)
-                except Exception as e:
-                    logging.warning(f"Ошибка при попытке {attempt}: {str(e)}")
-                    time.sleep(attempt * 1.0)
-            return False
+        # Ждем освобождения файла, но не дольше прежней паузы перед удалением.
+        # Папки не проверяем заранее: ниже каждый файл проверяется перед удалением
+        if os.path.isfile(path):
+            wait_for_unlock(path, timeout=3.0)
         
         # Специальное удаление для файлов с кириллицей
         def try_delete_all_methods():
@@ -869,14 +981,12 @@ def delete_file(path):
             logging.warning(f"Файл все еще заблокирован перед удалением: {path}")
             
             # Многократные попытки разблокировки
-            for attempt in range(1, 4):
-                logging.info(f"Попытка разблокировки #{attempt}")
+            def unlock_attempt():
                 try_alternative_unlock(path)
-                time.sleep(attempt * 1.0)
-                
-                if not check_file_locked_windows_api(path):
-                    logging.info(f"Файл успешно разблокирован после попытки #{attempt}")
-                    break
+                return not check_file_locked_windows_api(path)
+            
+            if retry.run(unlock_attempt, max_attempts=3, label="Разблокировка"):
+                logging.info(f"Файл успешно разблокирован: {path}")
             
             # Если файл всё ещё заблокирован, пробуем принудительные методы
             if check_file_locked_windows_api(path):
@@ -889,26 +999,30 @@ def delete_file(path):
         # Если это директория, используем специализированные методы
         if os.path.isdir(path):
             # Для папок иногда помогает сначала удалить все файлы внутри
+            # delete_tree вызывает эту функцию только для файлов, которые не удалились
+            # с первого раза, остальные удаляются быстрым путем (относительно дескриптора папки)
+            def retry_file(file_path):
+                try_alternative_unlock(file_path)
+                # Занятый файл удаляем с повторами. Планировщик общий для всех
+                # потоков delete_tree, поэтому ошибку этого файла храним отдельно
+                failure = []
+                
+                def attempt():
+                    try:
+                        os.remove(file_path)
+                    except OSError as e:
+                        failure[:] = [e]
+                        raise
+                    return True
+                
+                # Неудачу передаем delete_tree исключением: иначе файл был бы
+                # засчитан как удаленный; исчезнувший файл (FileNotFoundError) он пропустит
+                if not retry.run(attempt, max_attempts=3, label=f"Удаление {file_path}"):
+                    raise failure[0] if failure else OSError(f"Не удалось удалить {file_path}")
+            
             try:
-                # Удаляем все файлы внутри директории перед удалением самой директории
-                for root, dirs, files in os.walk(path, topdown=False):
-                    for file in files:
-                        file_path = os.path.join(root, file)
-                        try:
-                            if check_file_locked_windows_api(file_path):
-                                try_alternative_unlock(file_path)
-                                time.sleep(0.5)
-                            os.remove(file_path)
-                        except Exception as file_e:
-                            logging.warning(f"Не удалось удалить файл {file_path}: {str(file_e)}")
-                    
-                    # После удаления файлов пытаемся удалить поддиректории
-                    for dir_name in dirs:
-                        dir_path = os.path.join(root, dir_name)
-                        try:
-                            os.rmdir(dir_path)
-                        except Exception as dir_e:
-                            logging.warning(f"Не удалось удалить поддиректорию {dir_path}: {str(dir_e)}")
+                # Содержимое удаляется параллельно, папки - сразу после своего содержимого
+                delete_tree(path, remove_root=False, retry_file=retry_file)
             except Exception as walk_e:
                 logging.warning(f"Ошибка при обходе директории: {str(walk_e)}")
             
@@ -979,7 +1093,8 @@ def delete_file(path):
         logging.error(f"Непредвиденная ошибка при удалении {path}: {str(e)}")
         return {"error": f"Не удалось удалить '{path}': {str(e)}"}
 
-def unlock_and_delete_file(path, processes):
+@invalidates_analysis_cache
+def unlock_and_delete_file(path, processes, tree_scan=None):
     """
     Комплексно разблокирует и удаляет файл или директорию
     Объединяет логику разблокировки и удаления для более надежного результата
@@ -987,6 +1102,7 @@ def unlock_and_delete_file(path, processes):
     Args:
         path: Путь к файлу или директории
         processes: Список блокирующих процессов
+        tree_scan: Готовый результат обхода папки (если уже выполнялся анализ)
         
     Returns:
         dict: Результат операции
@@ -1003,42 +1119,15 @@ def unlock_and_delete_file(path, processes):
         # Продолжаем, даже если были проблемы
     
     # Шаг 2: Ожидание освобождения файла системой
-    max_wait_seconds = 6  # Максимальное время ожидания в секундах
-    wait_interval = 0.5    # Интервал проверки в секундах
-    
-    logging.info(f"Ожидание освобождения файла системой (макс. {max_wait_seconds} сек)...")
+    # Процессы уже завершены (unlock_file дожидается их выхода), поэтому
+    # обычно блокировка снята к первой же проверке. Проверяем только файлы,
+    # которые по результатам анализа были заблокированы
+    locked_paths = {process["file_path"] for process in processes if process.get("file_path")}
     
-    file_unlocked = False
-    wait_iterations = int(max_wait_seconds / wait_interval)
-    
-    # Ожидаем освобождения файла с периодическими проверками
-    for i in range(wait_iterations):
-        logging.info(f"Проверка блокировки #{i+1}")
-        
-        if os.path.isfile(path):
-            if not check_file_locked_windows_api(path):
-                file_unlocked = True
-                logging.info(f"Файл полностью освобожден после {(i+1)*wait_interval:.1f} секунд")
-                break
-        else:  # Для директорий проверяем основные файлы внутри
-            all_files_unlocked = True
-            for root, _, files in os.walk(path):
-                for file in files:
-                    file_path = os.path.join(root, file)
-                    if check_file_locked_windows_api(file_path):
-                        all_files_unlocked = False
-                        break
-                if not all_files_unlocked:
-                    break
-            
-            if all_files_unlocked:
-                file_unlocked = True
-                logging.info(f"Директория полностью освобождена после {(i+1)*wait_interval:.1f} секунд")
-                break
-        
-        # Пробуем дополнительную разблокировку на каждой итерации
-        try_alternative_unlock(path)
-        time.sleep(wait_interval)
+    # Обход всего дерева нужен, только если заблокированные файлы неизвестны
+    if not locked_paths and os.path.isdir(path) and tree_scan is None:
+        tree_scan = scan_tree(path)
+    wait_for_unlock(path, tree_scan, locked_paths=locked_paths or None)
     
     # Шаг 3: Удаление файла/директории с несколькими попытками
     logging.info("Начало процесса удаления файла...")
@@ -1107,21 +1196,18 @@ def unlock_and_delete_file(path, processes):
         
         # Пробуем каждый метод с несколькими попытками
         for method_name, method_func in deletion_methods:
-            for attempt in range(1, 4):
-                try:
-                    logging.info(f"Метод удаления: {method_name}, попытка {attempt}")
-                    method_func()
-                    
-                    # Проверяем, удалось ли удалить
-                    if not os.path.exists(path):
-                        logging.info(f"Успешное удаление с помощью метода {method_name}, попытка {attempt}")
-                        return True
-                    
-                    # Ждем немного перед следующей попыткой
-                    time.sleep(attempt * 0.5)
-                except Exception as e:
-                    logging.warning(f"Ошибка при методе {method_name}, попытка {attempt}: {str(e)}")
-                    time.sleep(attempt * 0.5)
+            def attempt(method_func=method_func):
+                method_func()
+                # Проверяем, удалось ли удалить
+                return not os.path.exists(path)
+            
+            if retry.run(attempt, max_attempts=3, label=f"Метод удаления: {method_name}"):
+                logging.info(f"Успешное удаление с помощью метода {method_name}")
+                return True
+            
+            # Путь исчез между попытками
+            if not os.path.exists(path):
+                return True
         
         return False
     
@@ -1130,30 +1216,22 @@ def unlock_and_delete_file(path, processes):
         if not os.path.isdir(path):
             return
         
+        # Разблокировка только для файлов, которые не удалились быстрым путем
+        def retry_file(file_path):
+            try_alternative_unlock(file_path)
+            os.remove(file_path)
+        
         try:
-            # Удаляем все файлы в директории
-            for root, dirs, files in os.walk(path, topdown=False):
-                for file in files:
-                    file_path = os.path.join(root, file)
-                    try:
-                        if check_file_locked_windows_api(file_path):
-                            try_alternative_unlock(file_path)
-                        os.remove(file_path)
-                    except Exception as e:
-                        logging.warning(f"Не удалось удалить файл {file_path}: {str(e)}")
-                
-                # Удаляем поддиректории
-                for dir_name in dirs:
-                    dir_path = os.path.join(root, dir_name)
-                    try:
-                        os.rmdir(dir_path)
-                    except Exception as e:
-                        logging.warning(f"Не удалось удалить директорию {dir_path}: {str(e)}")
+            # Содержимое удаляется параллельно, папки - сразу после своего содержимого
+            delete_tree(path, remove_root=False, retry_file=retry_file)
         except Exception as e:
             logging.warning(f"Ошибка при очистке директории: {str(e)}")
     
-    # Выполняем удаление
-    delete_successful = try_delete_with_methods()
+    # Выполняем удаление; все повторы укладываются в общий бюджет времени,
+    # а статистика записывается и при исключении
+    with RetryScheduler("unlock_and_delete_file") as retry:
+        delete_successful = try_delete_with_methods()
+        retry.succeeded = delete_successful
     
     if delete_successful:
         return {"success": True, "message": f"Файл/директория '{path}' успешно удален"}
@@ -1198,8 +1276,3 @@ def user_friendly_error(technical_error):
         return error_str.split(":", 1)[0] + "."
     
     return error_str
-
-def clear_cache():
-    """Очищает кэш результатов анализа"""
-    # В оригинальной версии этой функции нет, так как не было кэширования
-    pass
\ No newline at end of file
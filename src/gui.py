@@ -13,6 +13,8 @@ import time
 # Пробуем импортировать абсолютно (для работы в PyInstaller)
 try:
     import file_handler
+    import delete_engine
+    import reclaimer
     import settings
     import hotkey_manager
     import settings_dialog
@@ -27,7 +29,9 @@ except ImportError:
         sys.path.insert(0, current_dir)
     
     # Теперь пробуем импортировать
-    from file_handler import get_blocking_processes, unlock_file, delete_file, clear_cache, resource_path, user_friendly_error, unlock_and_delete_file
+    from file_handler import get_blocking_processes, get_blocking_processes_batch, unlock_file, delete_file, clear_cache, resource_path, user_friendly_error, unlock_and_delete_file
+    from delete_engine import delete_tree
+    from reclaimer import get_reclaimer
     from settings import Settings
     from hotkey_manager import HotkeyManager
     from settings_dialog import SettingsDialog
@@ -42,12 +46,15 @@ except ImportError:
 else:
     # Если абсолютный импорт сработал, создаем ссылки на нужные функции
     get_blocking_processes = file_handler.get_blocking_processes
+    get_blocking_processes_batch = file_handler.get_blocking_processes_batch
     unlock_file = file_handler.unlock_file
     delete_file = file_handler.delete_file
     clear_cache = file_handler.clear_cache
     resource_path = file_handler.resource_path
     user_friendly_error = file_handler.user_friendly_error
     unlock_and_delete_file = file_handler.unlock_and_delete_file
+    delete_tree = delete_engine.delete_tree
+    get_reclaimer = reclaimer.get_reclaimer
     Settings = settings.Settings
     HotkeyManager = hotkey_manager.HotkeyManager
     SettingsDialog = settings_dialog.SettingsDialog
@@ -65,35 +72,83 @@ class FileAnalysisWorker(QThread):
     finished = pyqtSignal(object)
     error = pyqtSignal(str)
     progress = pyqtSignal(int, int)  # Прогресс: текущий, всего
+    partial_results = pyqtSignal(list)  # Найденные процессы по мере анализа
     
-    def __init__(self, path):
+    # Промежуточные результаты отправляются порциями, чтобы не перегружать интерфейс
+    PARTIAL_RESULTS_BATCH = 20
+    PARTIAL_RESULTS_INTERVAL = 0.1  # секунд
+    
+    def __init__(self, path, batch_paths=None):
         super().__init__()
         self.path = path
+        self.paths = batch_paths or [path]  # Пачка путей из контекстного меню
+        self.tree_scan = None  # Результат обхода папки, используется и при удалении
         self._is_cancelled = False
+        self._pending_results = []
+        self._last_results_emit = 0.0
+        # Порции пополняются из result_callback, а сбрасываются и из progress_callback
+        self._results_mutex = QMutex()
     
     def cancel(self):
         """Отмена операции"""
         self._is_cancelled = True
     
+    def _on_results(self, records):
+        """Накапливает найденные процессы и передает их в интерфейс порциями"""
+        with QMutexLocker(self._results_mutex):
+            self._pending_results.extend(records)
+            # Первый результат отправляется сразу, следующие - по размеру порции или по времени
+            if len(self._pending_results) >= self.PARTIAL_RESULTS_BATCH:
+                self._flush_results_locked()
+        self._flush_due_results()
+    
+    def _flush_due_results(self):
+        """Отправляет накопленные процессы, если с прошлой отправки прошло PARTIAL_RESULTS_INTERVAL"""
+        with QMutexLocker(self._results_mutex):
+            if time.monotonic() - self._last_results_emit >= self.PARTIAL_RESULTS_INTERVAL:
+                self._flush_results_locked()
+    
+    def _flush_results(self):
+        with QMutexLocker(self._results_mutex):
+            self._flush_results_locked()
+    
+    def _flush_results_locked(self):
+        if not self._pending_results:
+            return
+        if not self._is_cancelled:
+            self.partial_results.emit(self._pending_results)
+        self._pending_results = []
+        self._last_results_emit = time.monotonic()
+    
     def run(self):
         try:
             # Блокируем мьютекс, чтобы предотвратить параллельный анализ
             locker = QMutexLocker(analysis_mutex)
             
+            def progress_callback(current, total):
+                if not self._is_cancelled:
+                    self.progress.emit(current, total)
+                # Прогресс сообщается и тогда, когда новых блокировок давно нет:
+                # накопленные к этому моменту не должны ждать конца анализа
+                self._flush_due_results()
+                return not self._is_cancelled  # Возвращаем False для отмены операции
+            
             # Получаем процессы, блокирующие файл
-            if os.path.isdir(self.path):
-                # Для директорий показываем прогресс
-                total_files = sum([len(files) for _, _, files in os.walk(self.path)])
-                processed = 0
-                
-                def progress_callback(current, total):
-                    if not self._is_cancelled:
-                        self.progress.emit(current, total)
-                    return not self._is_cancelled  # Возвращаем False для отмены операции
+            if len(self.paths) > 1:
+                # Пачка путей проверяется по одному снимку блокировок
+                processes = get_blocking_processes_batch(self.paths, progress_callback, self._on_results)
+            elif os.path.isdir(self.path):
+                # Дерево обходится только при пофайловой проверке; повторный анализ
+                # отвечает из кэша, не обходя его. Обход, если он был, нужен и удалению
+                def on_tree_scan(tree_scan):
+                    self.tree_scan = tree_scan
                 
-                processes = get_blocking_processes(self.path, progress_callback)
+                processes = get_blocking_processes(self.path, progress_callback, result_callback=self._on_results,
+                                                   on_tree_scan=on_tree_scan)
             else:
-                processes = get_blocking_processes(self.path)
+                processes = get_blocking_processes(self.path, result_callback=self._on_results)
+            
+            self._flush_results()
             
             if self._is_cancelled:
                 return
@@ -135,36 +190,15 @@ class UnlockWorker(QThread):
             # чтобы избежать гонки данных, если основной список изменится
             processes_to_handle = list(self.processes)
             
-            processed_list = []
-            for i, process in enumerate(processes_to_handle):
-                if self._is_cancelled:
-                    break
-                    
-                # Обновляем прогресс
-                self.progress.emit(i, total)
-                
-                # Обрабатываем один процесс за раз
-                result = unlock_file(self.path, [process])
-                
-                # Добавляем результат в итоговый список
-                if "success" in result:
-                    if "message" in result and process.get("process_name"):
-                        process_info = {
-                            "success": True,
-                            "process_name": process.get("process_name", ""),
-                            "pid": process.get("pid", 0),
-                            "message": result["message"]
-                        }
-                        processed_list.append(process_info)
-                else:
-                    # Если ошибка, добавляем информацию об ошибке
-                    process_info = {
-                        "success": False,
-                        "process_name": process.get("process_name", ""),
-                        "pid": process.get("pid", 0),
-                        "error": result.get("error", "Неизвестная ошибка")
-                    }
-                    processed_list.append(process_info)
+            # Обновляем прогресс
+            self.progress.emit(0, total)
+            
+            # Все процессы завершаются одним пакетом с общим ожиданием выхода
+            result = unlock_file(self.path, processes_to_handle)
+            self.progress.emit(total, total)
+            
+            # Итог по каждому процессу
+            processed_list = result.get("results", [])
             
             # Формируем итоговый результат
             if self._is_cancelled:
@@ -192,77 +226,81 @@ class DeleteWorker(QThread):
     finished = pyqtSignal(dict)
     progress = pyqtSignal(int, int)  # Прогресс: текущий, всего
     
-    def __init__(self, path):
+    def __init__(self, path, tree_scan=None, instant=False, batch_paths=None):
         super().__init__()
         self.path = path
+        self.paths = batch_paths or [path]  # Пачка путей из контекстного меню
+        self.tree_scan = tree_scan
+        self.instant = instant  # Мгновенное удаление: переименование и фоновое удаление содержимого
         self._is_cancelled = False
     
     def cancel(self):
         """Отмена операции"""
         self._is_cancelled = True
     
+    def _delete_path(self, path, tree_scan):
+        """Удаляет один файл или папку; возвращает результат в формате finished"""
+        # Для директорий показываем прогресс удаления
+        if os.path.isdir(path):
+            # Папка переименовывается одним вызовом и сразу исчезает, а ее
+            # содержимое удаляется в фоне. Если переименовать не удалось
+            # (например, внутри есть открытые файлы), удаляем обычным способом
+            if self.instant:
+                clear_cache(path)
+                if "success" in get_reclaimer().stage(path):
+                    # Папка уже убрана, но ее содержимое еще удаляется
+                    return {"success": True, "deferred": True}
+            
+            # Число элементов известно из обхода, выполненного при анализе;
+            # без него прогресс показывается без общего количества
+            total_items = 0
+            if tree_scan is not None:
+                total_items = tree_scan.file_count + tree_scan.dir_count + 1  # +1 для корневой директории
+            
+            def progress_callback(current, total):
+                if not self._is_cancelled:
+                    self.progress.emit(current, total)
+                return not self._is_cancelled  # Возвращаем False для отмены операции
+            
+            # Содержимое директории изменится - результаты анализа устарели
+            clear_cache(path)
+            
+            # Независимые поддеревья удаляются параллельно, каждая папка -
+            # сразу после удаления ее содержимого
+            result = delete_tree(path, progress_callback, total_items)
+            
+            if result.get("cancelled") or self._is_cancelled:
+                return {"cancelled": True}
+            if "success" in result:
+                return {"success": True}
+            logging.error(result["error"])
+            return {"error": user_friendly_error(result["error"])}
+        
+        # Для обычных файлов просто удаляем
+        result = delete_file(path)
+        if self._is_cancelled:
+            return {"cancelled": True}
+        return result
+    
     def run(self):
         try:
-            # Для директорий показываем прогресс удаления
-            if os.path.isdir(self.path):
-                files_to_delete = []
-                total_dirs = 0
-                
-                # Сначала считаем общее количество файлов и папок
-                for root, dirs, files in os.walk(self.path, topdown=False):
-                    for file in files:
-                        files_to_delete.append(os.path.join(root, file))
-                    total_dirs += len(dirs)
-                
-                total_items = len(files_to_delete) + total_dirs + 1  # +1 для корневой директории
-                processed = 0
-                
-                # Теперь удаляем каждый файл по очереди
-                for file_path in files_to_delete:
-                    if self._is_cancelled:
-                        self.finished.emit({"cancelled": True})
-                        return
-                        
-                    try:
-                        os.remove(file_path)
-                        processed += 1
-                        self.progress.emit(processed, total_items)
-                    except Exception as e:
-                        logging.error(f"Ошибка при удалении файла {file_path}: {str(e)}")
-                
-                # Удаляем пустые директории
-                for root, dirs, files in os.walk(self.path, topdown=False):
-                    for dir_name in dirs:
-                        if self._is_cancelled:
-                            self.finished.emit({"cancelled": True})
-                            return
-                            
-                        try:
-                            dir_path = os.path.join(root, dir_name)
-                            os.rmdir(dir_path)
-                            processed += 1
-                            self.progress.emit(processed, total_items)
-                        except Exception as e:
-                            logging.error(f"Ошибка при удалении директории {dir_path}: {str(e)}")
-                
-                # Наконец, удаляем корневую директорию
-                try:
-                    os.rmdir(self.path)
-                    processed += 1
-                    self.progress.emit(processed, total_items)
-                    self.finished.emit({"success": True})
-                except Exception as e:
-                    error_msg = f"Не удалось удалить директорию {self.path}: {str(e)}"
-                    logging.error(error_msg)
-                    self.finished.emit({"error": user_friendly_error(error_msg)})
-            else:
-                # Для обычных файлов просто удаляем
-                result = delete_file(self.path)
-                
-                if self._is_cancelled:
-                    self.finished.emit({"cancelled": True})
-                else:
+            errors = []
+            deferred = False
+            for path in self.paths:
+                # Обход дерева из анализа относится только к одиночному пути
+                tree_scan = self.tree_scan if len(self.paths) == 1 else None
+                result = self._delete_path(path, tree_scan)
+                if "cancelled" in result:
                     self.finished.emit(result)
+                    return
+                if "error" in result:
+                    errors.append(result["error"] if len(self.paths) == 1 else f"{path}: {result['error']}")
+                deferred = deferred or result.get("deferred", False)
+            
+            if errors:
+                self.finished.emit({"error": "\n".join(errors)})
+            else:
+                self.finished.emit({"success": True, "deferred": deferred})
                     
         except Exception as e:
             logging.error(f"Ошибка в DeleteWorker: {str(e)}", exc_info=True)
@@ -270,6 +308,11 @@ class DeleteWorker(QThread):
 
 
 class MainWindow(QMainWindow):
+    # Пути от повторных запусков программы (single_instance); передаются из фонового потока
+    paths_received = pyqtSignal(list)
+    # Неудачное фоновое удаление (reclaimer); передается из фонового потока
+    reclaim_failed = pyqtSignal(dict)
+    
     def __init__(self):
         try:
             super().__init__()
@@ -291,7 +334,9 @@ class MainWindow(QMainWindow):
             
             # Текущий путь к файлу/папке
             self.current_path = None
+            self.current_paths = []  # Все пути текущей пачки (current_path - первый из них)
             self.blocking_processes = []
+            self.tree_scan = None  # Обход дерева из последнего анализа
             
             # Загружаем настройки
             self.settings = Settings()
@@ -329,6 +374,21 @@ class MainWindow(QMainWindow):
             
             # Центрируем окно
             self.center_window()
+            
+            # Продолжаем фоновое удаление, не завершенное при прошлом запуске.
+            # О неудачах фонового удаления сообщаем пользователю: иначе скрытая
+            # папка с его данными останется на диске незамеченной
+            try:
+                self.reclaim_failed.connect(self.on_reclaim_failed)
+                get_reclaimer().set_failure_callback(self.reclaim_failed.emit)
+                resumed = get_reclaimer().resume_pending()
+                if resumed:
+                    self.status_label.setText(f"Продолжается фоновое удаление {resumed} элементов с прошлого запуска")
+            except Exception as e:
+                logging.error(f"Ошибка при возобновлении фонового удаления: {str(e)}", exc_info=True)
+            
+            # Сигнал доставляет пачки путей в поток интерфейса
+            self.paths_received.connect(self.check_files)
 
             # Инициализируем менеджер горячих клавиш
             try:
@@ -880,7 +940,14 @@ class MainWindow(QMainWindow):
     def refresh_analysis(self):
         """Повторно анализирует текущий файл/папку"""
         try:
-            if self.current_path and os.path.exists(self.current_path):
+            if len(self.current_paths) > 1:
+                # Повторный анализ должен отражать текущее состояние, а не кэш
+                for path in self.current_paths:
+                    clear_cache(path)
+                self.check_files(self.current_paths)
+            elif self.current_path and os.path.exists(self.current_path):
+                # Повторный анализ должен отражать текущее состояние, а не кэш
+                clear_cache(self.current_path)
                 self.check_file(self.current_path)
         except Exception as e:
             logging.error(f"Ошибка при обновлении анализа: {str(e)}", exc_info=True)
@@ -917,7 +984,29 @@ class MainWindow(QMainWindow):
         except Exception as e:
             logging.error(f"Ошибка при отмене операции: {str(e)}", exc_info=True)
     
-    def check_file(self, path):
+    def check_files(self, paths):
+        """
+        Анализирует пачку путей, переданных повторными запусками программы
+        
+        Пустая пачка (запуск без аргументов) только показывает окно.
+        """
+        try:
+            if not paths:
+                self.safe_show_and_activate()
+                return
+            
+            existing = [path for path in paths if os.path.exists(path)]
+            if len(existing) < len(paths):
+                logging.warning(f"Пропущены несуществующие пути: {[p for p in paths if p not in existing]}")
+            if len(existing) > 1:
+                self.check_file(existing[0], existing)
+            else:
+                # Один путь или ни одного - check_file сообщит о несуществующем пути
+                self.check_file(existing[0] if existing else paths[0])
+        except Exception as e:
+            logging.error(f"Ошибка при анализе пачки путей: {str(e)}", exc_info=True)
+    
+    def check_file(self, path, batch_paths=None):
         try:
             if not os.path.exists(path):
                 QMessageBox.critical(self, "Ошибка", f"Путь не существует: {path}")
@@ -929,15 +1018,21 @@ class MainWindow(QMainWindow):
             self.activateWindow()
             
             self.current_path = path
+            self.current_paths = list(batch_paths or [path])
+            self.tree_scan = None
             
             # Если путь слишком длинный, сокращаем его для отображения
             display_path = path
             if len(path) > 60:
                 # Сокращаем путь, оставляя начало и конец
                 display_path = path[:30] + "..." + path[-27:]
-                
-            self.path_label.setText(f"Путь: {display_path}")
-            self.path_label.setToolTip(path)  # Показываем полный путь при наведении
+            
+            if len(self.current_paths) > 1:
+                self.path_label.setText(f"Путь: {display_path} и еще {len(self.current_paths) - 1}")
+                self.path_label.setToolTip("\n".join(self.current_paths))
+            else:
+                self.path_label.setText(f"Путь: {display_path}")
+                self.path_label.setToolTip(path)  # Показываем полный путь при наведении
             
             # Очищаем предыдущие данные
             self.process_table.setRowCount(0)
@@ -959,10 +1054,11 @@ class MainWindow(QMainWindow):
             QApplication.processEvents()
             
             # Создаем и запускаем поток для анализа файла
-            self.analysis_thread = FileAnalysisWorker(path)
+            self.analysis_thread = FileAnalysisWorker(path, self.current_paths)
             self.analysis_thread.finished.connect(self.on_analysis_complete)
             self.analysis_thread.error.connect(self.on_analysis_error)
             self.analysis_thread.progress.connect(self.update_progress)
+            self.analysis_thread.partial_results.connect(self.on_partial_results)
             self.analysis_thread.start()
         except Exception as e:
             logging.error(f"Ошибка при анализе файла: {str(e)}", exc_info=True)
@@ -979,10 +1075,51 @@ class MainWindow(QMainWindow):
             # Используем бесконечную анимацию, если total = 0
             self.progress_bar.setRange(0, 0)
     
+    def _set_process_row(self, row, process):
+        """Заполняет строку таблицы процессов"""
+        process_item = QTableWidgetItem(process["process_name"])
+        pid_item = QTableWidgetItem(str(process["pid"]))
+        handle_type = process["handle_type"]
+        if process.get("lock_type"):
+            handle_type = f"{handle_type} ({process['lock_type']})"
+        type_item = QTableWidgetItem(handle_type)
+        
+        # Настраиваем выравнивание и сортировку
+        pid_item.setTextAlignment(Qt.AlignCenter)
+        type_item.setTextAlignment(Qt.AlignCenter)
+        
+        # Добавляем всплывающие подсказки
+        process_item.setToolTip(f"Полный путь: {process.get('file_path', '')}")
+        if process.get("lock_range"):
+            start, end = process["lock_range"]
+            type_item.setToolTip(f"Заблокированный диапазон: {start}-{'конец файла' if end is None else end}")
+        
+        self.process_table.setItem(row, 0, process_item)
+        self.process_table.setItem(row, 1, pid_item)
+        self.process_table.setItem(row, 2, type_item)
+    
+    def on_partial_results(self, processes):
+        """Добавляет в таблицу процессы, найденные до завершения анализа"""
+        try:
+            # Игнорируем результаты предыдущего (уже замененного) анализа
+            if self.sender() is not self.analysis_thread:
+                return
+            
+            # При включенной сортировке строки переставляются во время заполнения
+            self.process_table.setSortingEnabled(False)
+            row = self.process_table.rowCount()
+            self.process_table.setRowCount(row + len(processes))
+            for i, process in enumerate(processes):
+                self._set_process_row(row + i, process)
+            self.process_table.setSortingEnabled(True)
+        except Exception as e:
+            logging.error(f"Ошибка при добавлении промежуточных результатов: {str(e)}", exc_info=True)
+    
     def on_analysis_complete(self, processes):
         try:
-            # Сохраняем результаты
+            # Сохраняем результаты и обход дерева для последующего удаления
             self.blocking_processes = processes
+            self.tree_scan = getattr(self.analysis_thread, "tree_scan", None)
             
             # Скрываем прогресс-бар и очищаем статус
             self.progress_bar.setVisible(False)
@@ -1004,24 +1141,13 @@ class MainWindow(QMainWindow):
                 self.unlock_btn.setEnabled(False)
                 self.unlock_delete_btn.setEnabled(True)  # Можно удалить без разблокировки
             else:
-                # Добавляем процессы в таблицу
+                # Заменяем промежуточные строки полным списком процессов
+                self.process_table.setSortingEnabled(False)
                 self.process_table.setRowCount(len(self.blocking_processes))
                 
                 for i, process in enumerate(self.blocking_processes):
-                    process_item = QTableWidgetItem(process["process_name"])
-                    pid_item = QTableWidgetItem(str(process["pid"]))
-                    type_item = QTableWidgetItem(process["handle_type"])
-                    
-                    # Настраиваем выравнивание и сортировку
-                    pid_item.setTextAlignment(Qt.AlignCenter)
-                    type_item.setTextAlignment(Qt.AlignCenter)
-                    
-                    # Добавляем всплывающие подсказки
-                    process_item.setToolTip(f"Полный путь: {process.get('file_path', '')}")
-                    
-                    self.process_table.setItem(i, 0, process_item)
-                    self.process_table.setItem(i, 1, pid_item)
-                    self.process_table.setItem(i, 2, type_item)
+                    self._set_process_row(i, process)
+                self.process_table.setSortingEnabled(True)
                 
                 # Активируем кнопки
                 self.unlock_btn.setEnabled(True)
@@ -1109,7 +1235,7 @@ class MainWindow(QMainWindow):
                 else:
                     QMessageBox.information(self, "Успех", "Файл/папка успешно разблокирован!")
                     
-                self.check_file(self.current_path)  # Обновляем информацию
+                self.check_files(self.current_paths)  # Обновляем информацию
         except Exception as e:
             logging.error(f"Ошибка при завершении разблокировки: {str(e)}", exc_info=True)
     
@@ -1120,10 +1246,14 @@ class MainWindow(QMainWindow):
             
             # Запрашиваем подтверждение, если это настроено в параметрах
             if self.settings.settings.get("confirm_delete", True):
+                if len(self.current_paths) > 1:
+                    target = f"{len(self.current_paths)} объектов"
+                else:
+                    target = f"'{os.path.basename(self.current_path)}'"
                 reply = QMessageBox.question(
                     self,
                     "Подтверждение удаления",
-                    f"Вы уверены, что хотите удалить '{os.path.basename(self.current_path)}'?",
+                    f"Вы уверены, что хотите удалить {target}?",
                     QMessageBox.Yes | QMessageBox.No,
                     QMessageBox.No
                 )
@@ -1149,10 +1279,11 @@ class MainWindow(QMainWindow):
                 finished = pyqtSignal(dict)
                 progress = pyqtSignal(int, int)
                 
-                def __init__(self, path, processes):
+                def __init__(self, paths, processes, tree_scan=None):
                     super().__init__()
-                    self.path = path
+                    self.paths = paths
                     self.processes = processes
+                    self.tree_scan = tree_scan
                     self._is_cancelled = False
                 
                 def cancel(self):
@@ -1175,8 +1306,24 @@ class MainWindow(QMainWindow):
                             self.finished.emit({"cancelled": True})
                             return
                         
-                        # Выполняем разблокировку и удаление как единый процесс
-                        result = unlock_and_delete_file(self.path, self.processes)
+                        # Выполняем разблокировку и удаление как единый процесс.
+                        # Процессы пачки завершаются при первом вызове, следующие
+                        # пути видят их уже завершенными
+                        if len(self.paths) == 1:
+                            result = unlock_and_delete_file(self.paths[0], self.processes, self.tree_scan)
+                        else:
+                            errors = []
+                            for path in self.paths:
+                                if self._is_cancelled:
+                                    self.finished.emit({"cancelled": True})
+                                    return
+                                path_result = unlock_and_delete_file(path, self.processes)
+                                if "error" in path_result:
+                                    errors.append(f"{path}: {path_result['error']}")
+                            if errors:
+                                result = {"error": "\n".join(errors)}
+                            else:
+                                result = {"success": True, "message": f"Удалено объектов: {len(self.paths)}"}
                         
                         # Завершаем прогресс
                         self.progress.emit(4, 4)  # Конец процесса
@@ -1187,7 +1334,7 @@ class MainWindow(QMainWindow):
                         self.finished.emit({"error": f"Ошибка при удалении: {str(e)}"})
             
             # Запускаем задачу в отдельном потоке
-            self.unlock_delete_thread = UnlockDeleteWorker(self.current_path, self.blocking_processes)
+            self.unlock_delete_thread = UnlockDeleteWorker(self.current_paths, self.blocking_processes, self.tree_scan)
             self.unlock_delete_thread.finished.connect(self.on_unlock_delete_complete)
             self.unlock_delete_thread.progress.connect(self.update_progress)
             self.unlock_delete_thread.start()
@@ -1219,8 +1366,8 @@ class MainWindow(QMainWindow):
             if "error" in result:
                 QMessageBox.critical(self, "Ошибка", result["error"])
                 
-                # Активируем кнопки снова и обновляем анализ
-                self.check_file(self.current_path)
+                # Активируем кнопки снова и обновляем анализ (оставшихся путей пачки)
+                self.check_files(self.current_paths)
                 return
             
             # Операция успешна
@@ -1229,6 +1376,7 @@ class MainWindow(QMainWindow):
             
             # Сбрасываем состояние
             self.current_path = None
+            self.current_paths = []
             self.blocking_processes = []
             self.path_label.setText("Перетащите файл или папку на это окно")
             
@@ -1250,7 +1398,8 @@ class MainWindow(QMainWindow):
             self.status_label.setText("Удаление файла...")
             
             # Запускаем задачу удаления в отдельном потоке
-            self.delete_thread = DeleteWorker(self.current_path)
+            instant = self.settings.settings.get("instant_delete", False)
+            self.delete_thread = DeleteWorker(self.current_path, self.tree_scan, instant, self.current_paths)
             self.delete_thread.finished.connect(self.on_delete_complete)
             self.delete_thread.progress.connect(self.update_progress)
             self.delete_thread.start()
@@ -1287,10 +1436,18 @@ class MainWindow(QMainWindow):
                 self.unlock_delete_btn.setEnabled(True)
                 self.refresh_btn.setEnabled(True)
             else:
-                QMessageBox.information(self, "Успех", f"Файл/папка {self.current_path} успешно удален!")
+                if result.get("deferred"):
+                    # Папка переименована, содержимое удаляется в фоне - об итоге сообщит on_reclaim_failed
+                    target = f"Объекты ({len(self.current_paths)})" if len(self.current_paths) > 1 else f"Файл/папка {self.current_path}"
+                    QMessageBox.information(self, "Успех", f"{target} убран(ы), содержимое удаляется в фоне")
+                elif len(self.current_paths) > 1:
+                    QMessageBox.information(self, "Успех", f"Удалено объектов: {len(self.current_paths)}")
+                else:
+                    QMessageBox.information(self, "Успех", f"Файл/папка {self.current_path} успешно удален!")
                 
                 # Сбрасываем состояние
                 self.current_path = None
+                self.current_paths = []
                 self.blocking_processes = []
                 self.path_label.setText("Перетащите файл или папку на это окно")
                 
@@ -1304,6 +1461,22 @@ class MainWindow(QMainWindow):
         except Exception as e:
             logging.error(f"Ошибка при завершении удаления: {str(e)}", exc_info=True)
     
+    def on_reclaim_failed(self, record):
+        """Сообщает, что фоновое удаление не завершилось и данные остались на диске"""
+        try:
+            pending = get_reclaimer().pending_count()
+            message = (f"Не удалось удалить в фоне {record['errors']} элементов из '{record['original_path']}'. "
+                       f"Они остались в скрытой папке {record['staged_path']}. "
+                       f"Незавершенных фоновых удалений: {pending}; повтор при следующем запуске.")
+            self.status_label.setText(f"Фоновое удаление не завершено: осталось {pending}")
+            
+            if hasattr(self, 'tray_icon') and self.tray_icon and self.tray_icon.isVisible():
+                self.tray_icon.showMessage("JL Delete Lock", message, QSystemTrayIcon.Warning, 10000)
+            else:
+                QMessageBox.warning(self, "Фоновое удаление", message)
+        except Exception as e:
+            logging.error(f"Ошибка при уведомлении о фоновом удалении: {str(e)}", exc_info=True)
+    
     def closeEvent(self, event):
         """Обрабатывает закрытие окна программы"""
         try:
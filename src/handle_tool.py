@@ -0,0 +1,402 @@
+import subprocess
+import os
+import re
+import sys
+import csv
+import time
+import locale
+import logging
+import itertools
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from lock_index import LockIndex, canonical_path
+
+# Работа с утилитой handle.exe (Sysinternals): поиск утилиты, запуск запросов
+# и разбор ее вывода. Используется через HandleExeProvider (lock_providers)
+
+def resource_path(relative_path):
+    """Получить абсолютный путь к ресурсу, работает для dev и для PyInstaller"""
+    try:
+        # PyInstaller создает временную папку и хранит путь в _MEIPASS
+        base_path = sys._MEIPASS
+    except Exception:
+        base_path = os.path.abspath(".")
+
+    return os.path.join(base_path, relative_path)
+
+def get_handle_exe_path():
+    """Находит путь к handle.exe, проверяя различные возможные местоположения"""
+    # Список мест для поиска в порядке приоритета
+    possible_handle_paths = [
+        # В директории resources в упакованном приложении
+        resource_path(os.path.join("resources", "handle64.exe")),
+        resource_path(os.path.join("resources", "handle.exe")),
+        resource_path(os.path.join("resources", "handle64a.exe")),
+        # Рядом с exe-файлом
+        os.path.join(os.path.dirname(sys.executable), "handle64.exe"),
+        os.path.join(os.path.dirname(sys.executable), "handle.exe"),
+        os.path.join(os.path.dirname(sys.executable), "handle64a.exe"),
+        # В корневой директории
+        "handle64.exe",
+        "handle.exe",
+        "handle64a.exe",
+    ]
+    
+    # Ищем первый существующий файл
+    for handle_path in possible_handle_paths:
+        if os.path.exists(handle_path):
+            logging.info(f"Найдена утилита handle: {handle_path}")
+            return handle_path
+            
+    logging.error("Не найдена утилита handle.exe")
+    return None
+
+# Предкомпилированные выражения для вывода handle.exe, работают по байтам.
+# Вывод с фильтром по имени:
+#   chrome.exe   pid: 1234   type: File   1A4: C:\path\file
+_HANDLE_FILTERED_RE = re.compile(
+    rb"^(\S+(?: +(?!pid:)\S+)*) +pid: *(\d+) +type: *File\b[^\r\n:]*\s[0-9A-Fa-f]+: *([^\r\n]*)",
+    re.MULTILINE)
+# Полный снимок, разбитый на секции по процессам:
+#   chrome.exe pid: 1234 DOMAIN\user
+#      1A4: File  (RW-)   C:\path\file
+_HANDLE_SNAPSHOT_RE = re.compile(
+    rb"^(?:(\S+(?: +(?!pid:)\S+)*) +pid: *(\d+)|[ \t]+[0-9A-Fa-f]+: +File +(?:\([^)\r\n]*\) +)?([^\r\n]*))",
+    re.MULTILINE)
+
+def decode_handle_bytes(raw, encoding=None):
+    """Декодирует фрагмент вывода handle.exe, подбирая кодировку"""
+    if raw.isascii():
+        return raw.decode("ascii")
+
+    encodings = [encoding] if encoding else []
+    encodings += [locale.getpreferredencoding(), 'utf-8', 'cp1251', 'cp866']
+    for candidate in encodings:
+        try:
+            return raw.decode(candidate)
+        except (UnicodeDecodeError, LookupError):
+            continue
+    # latin-1 декодирует любые байты, пусть и с искажениями
+    return raw.decode('latin-1')
+
+def iter_handle_records(output, default_path=None, encoding=None):
+    """
+    Разбирает байтовый вывод handle.exe и по одной возвращает записи о блокировках
+
+    Декодируются только извлеченные поля (имя процесса и путь), а не весь вывод.
+
+    Args:
+        output: Вывод handle.exe (bytes)
+        default_path: Путь, подставляемый, если в строке путь не указан
+        encoding: Кодировка вывода, если она уже известна
+
+    Yields:
+        dict: {"process_name", "pid", "handle_type", "file_path"}
+    """
+    # Имена процессов повторяются, декодируем каждое только один раз
+    names = {}
+
+    def make_record(raw_name, pid, raw_path):
+        process_name = names.get(raw_name)
+        if process_name is None:
+            process_name = names[raw_name] = decode_handle_bytes(raw_name, encoding)
+        raw_path = raw_path.rstrip()
+        return {
+            "process_name": process_name,
+            "pid": pid,
+            "handle_type": "File",
+            "file_path": decode_handle_bytes(raw_path, encoding) if raw_path else default_path
+        }
+
+    # В пути Windows не бывает "type:", поэтому по нему определяем формат вывода
+    if b" type: " in output:
+        for raw_name, raw_pid, raw_path in _HANDLE_FILTERED_RE.findall(output):
+            pid = int(raw_pid)
+            if pid > 0 and (raw_path.strip() or default_path):
+                yield make_record(raw_name, pid, raw_path)
+        return
+
+    section_name = None
+    section_pid = 0
+    for raw_name, raw_pid, raw_path in _HANDLE_SNAPSHOT_RE.findall(output):
+        if raw_pid:
+            # Заголовок секции процесса
+            section_name = raw_name
+            section_pid = int(raw_pid)
+        elif section_name is not None and section_pid > 0 and raw_path.strip():
+            yield make_record(section_name, section_pid, raw_path)
+
+# Кодировка вывода, выбранная для каждой утилиты handle (путь -> кодировка)
+_handle_encodings = {}
+
+def _iter_handle_lines(handle_exe, stream):
+    """Построчно декодирует поток вывода handle.exe, запоминая выбранную кодировку"""
+    encoding = _handle_encodings.get(handle_exe)
+
+    for raw_line in stream:
+        if raw_line.isascii():
+            yield raw_line.decode("ascii")
+            continue
+
+        if encoding:
+            try:
+                yield raw_line.decode(encoding)
+                continue
+            except UnicodeDecodeError:
+                pass
+
+        # Кодировка еще не выбрана или не подошла - подбираем один раз и кэшируем
+        for candidate in [locale.getpreferredencoding(), 'utf-8', 'cp1251', 'cp866', 'latin-1']:
+            if candidate == encoding:
+                continue
+            try:
+                line = raw_line.decode(candidate)
+            except UnicodeDecodeError:
+                continue
+            encoding = _handle_encodings[handle_exe] = candidate
+            logging.info(f"Кодировка вывода {os.path.basename(handle_exe)}: {candidate}")
+            yield line
+            break
+
+def _parse_handle_csv(lines, default_path=None):
+    """Разбирает CSV-вывод handle.exe (-v) в записи о блокировках"""
+    reader = csv.reader(lines)
+
+    # Первая строка - заголовок, столбцы ищем по именам
+    header = [cell.strip().lower() for cell in next(reader, [])]
+    if "pid" not in header or "name" not in header:
+        return
+    name_col = header.index("process") if "process" in header else 0
+    pid_col = header.index("pid")
+    type_col = header.index("type") if "type" in header else None
+    path_col = header.index("name")
+
+    for row in reader:
+        if len(row) <= max(name_col, pid_col, path_col):
+            continue
+        if type_col is not None and row[type_col].strip() != "File":
+            continue
+
+        try:
+            pid = int(row[pid_col])
+        except ValueError:
+            continue
+        file_path = row[path_col].strip() or default_path
+        if pid <= 0 or not file_path:
+            continue
+
+        yield {
+            "process_name": row[name_col].strip(),
+            "pid": pid,
+            "handle_type": "File",
+            "file_path": file_path
+        }
+
+def query_handle_tool(handle_exe, target=None):
+    """
+    Запускает handle.exe в режиме CSV (-v) и возвращает найденные блокировки
+
+    Вывод читается потоком: строки декодируются по одному разу и сразу
+    передаются в csv.reader. Без target возвращаются дескрипторы всей системы.
+
+    Returns:
+        list: Список блокировок, либо dict с ключом "error" при ошибке запуска
+    """
+    args = [handle_exe, "-accepteula", "-nobanner", "-v"]
+    if target:
+        args.append(target)
+
+    try:
+        process = subprocess.Popen(args,
+                                   stdout=subprocess.PIPE,
+                                   stderr=subprocess.PIPE,
+                                   creationflags=subprocess.CREATE_NO_WINDOW)
+    except Exception as e:
+        logging.error(f"Ошибка при выполнении handle.exe: {str(e)}")
+        return {"error": f"Не удалось выполнить проверку: {str(e)}"}
+
+    with process:
+        # Пропускаем пустые строки до заголовка CSV
+        first_line = b""
+        for first_line in process.stdout:
+            if first_line.strip():
+                break
+
+        if b"," in first_line and b"pid" in first_line.lower():
+            lines = _iter_handle_lines(handle_exe, itertools.chain([first_line], process.stdout))
+            records = list(_parse_handle_csv(lines, default_path=target))
+        else:
+            # Старые версии утилиты могут не поддерживать CSV - разбираем обычный вывод
+            records = list(iter_handle_records(first_line + process.stdout.read(),
+                                               default_path=target,
+                                               encoding=_handle_encodings.get(handle_exe)))
+
+        error_output = decode_handle_bytes(process.stderr.read())
+        process.wait()
+
+    if error_output:
+        logging.debug(f"Ошибки handle.exe: {error_output}")
+    if not records and process.returncode != 0 and error_output.strip():
+        logging.error(f"Ошибка выполнения handle.exe: {error_output}")
+        return {"error": f"Ошибка выполнения handle.exe: {error_output}"}
+
+    return records
+
+# Максимальное число одновременно запущенных процессов handle.exe
+MAX_PARALLEL_HANDLE_QUERIES = min(16, os.cpu_count() or 4)
+
+def run_handle_queries(handle_exe, targets, progress_callback=None, max_workers=None, result_callback=None):
+    """
+    Выполняет запросы к handle.exe параллельно с ограничением числа процессов
+
+    Результаты собираются в порядке завершения запросов, повторы
+    (один и тот же процесс и путь) отбрасываются.
+
+    Args:
+        handle_exe: Путь к утилите handle
+        targets: Пути (или фрагменты имен) для запросов
+        progress_callback: Функция (текущий, всего); возврат False отменяет операцию
+        max_workers: Максимум одновременных запросов
+        result_callback: Функция, получающая новые блокировки сразу после каждого запроса
+
+    Returns:
+        list: Список блокировок, либо dict с ключом "error" при отмене
+    """
+    targets = list(targets)
+    total = len(targets)
+    if not total:
+        return []
+
+    max_workers = max(1, min(max_workers or MAX_PARALLEL_HANDLE_QUERIES, total))
+    blocking_processes = []
+    seen = set()
+    completed = 0
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = {}
+        queue = iter(targets)
+
+        # Держим в работе не больше max_workers запросов, чтобы отмена
+        # не ждала завершения тысяч уже поставленных в очередь задач
+        for target in itertools.islice(queue, max_workers):
+            pending[executor.submit(query_handle_tool, handle_exe, target)] = target
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                target = pending.pop(future)
+                completed += 1
+
+                try:
+                    records = future.result()
+                except Exception as e:
+                    records = {"error": str(e)}
+
+                if isinstance(records, dict):
+                    logging.error(f"Ошибка при проверке {target}: {records['error']}")
+                else:
+                    found = []
+                    for record in records:
+                        key = (record["pid"], canonical_path(record["file_path"]))
+                        if key not in seen:
+                            seen.add(key)
+                            found.append(record)
+                    blocking_processes.extend(found)
+                    if found and result_callback:
+                        result_callback(found)
+
+            if progress_callback and not progress_callback(completed, total):
+                for future in pending:
+                    future.cancel()
+                return {"error": "Операция отменена пользователем"}
+
+            for target in itertools.islice(queue, len(done)):
+                pending[executor.submit(query_handle_tool, handle_exe, target)] = target
+
+    return blocking_processes
+
+# Максимальное число групп (запросов к handle.exe) при пакетной проверке файлов
+MAX_HANDLE_QUERY_GROUPS = 16
+
+def group_by_common_ancestor(paths, max_groups=None, root=None):
+    """
+    Группирует пути по общему предку, чтобы проверить каждую группу одним запросом
+
+    Сначала файлы группируются по родительской папке, затем самые глубокие
+    группы поднимаются на уровень выше, пока групп не станет не больше max_groups.
+
+    Returns:
+        dict: Папка-предок -> список путей группы
+    """
+    max_groups = max(1, max_groups or MAX_HANDLE_QUERY_GROUPS)
+    root_key = canonical_path(root) if root else None
+
+    groups = {}
+    for path in paths:
+        groups.setdefault(os.path.dirname(path), []).append(path)
+
+    while len(groups) > max_groups:
+        deepest = max(groups, key=lambda ancestor: ancestor.count(os.sep))
+        parent = os.path.dirname(deepest)
+        # Не поднимаемся выше корня анализа и корня диска
+        if parent == deepest or canonical_path(deepest) == root_key:
+            break
+        groups.setdefault(parent, []).extend(groups.pop(deepest))
+
+    return groups
+
+def query_handle_batched(handle_exe, file_paths, progress_callback=None, root=None, result_callback=None):
+    """
+    Проверяет файлы пакетами: один запуск handle.exe на группу с общим предком
+
+    handle.exe ищет по фрагменту имени, поэтому запрос по общей папке
+    возвращает блокировки всех файлов внутри нее. Результаты затем
+    раскладываются обратно по исходным файлам. result_callback получает
+    блокировки исходных файлов по мере завершения запросов.
+
+    Returns:
+        dict: Путь к файлу -> список блокирующих процессов,
+              либо dict с ключом "error" при отмене
+    """
+    file_paths = list(file_paths)
+    if not file_paths:
+        return {}
+
+    groups = group_by_common_ancestor(file_paths, root=root)
+    logging.info(f"Пакетная проверка {len(file_paths)} файлов: {len(groups)} запросов к handle.exe")
+
+    on_records = None
+    if result_callback:
+        # Запрос по общей папке находит и чужие файлы - передаем только запрошенные
+        wanted = {canonical_path(file_path) for file_path in file_paths}
+        def on_records(records):
+            found = [record for record in records if canonical_path(record["file_path"]) in wanted]
+            if found:
+                result_callback(found)
+
+    records = run_handle_queries(handle_exe, list(groups), progress_callback, result_callback=on_records)
+    if isinstance(records, dict):
+        return records
+
+    lock_index = LockIndex(records)
+    return {file_path: lock_index.query_path(file_path) for file_path in file_paths}
+
+def take_handle_snapshot(handle_exe):
+    """
+    Делает снимок всех открытых файловых дескрипторов системы одним запуском handle.exe
+
+    Returns:
+        LockIndex: Индекс блокировок по путям, либо None при ошибке
+    """
+    logging.info("Снимок дескрипторов системы через handle.exe")
+    started = time.monotonic()
+
+    # Без аргумента-фильтра handle.exe выводит дескрипторы всех процессов
+    records = query_handle_tool(handle_exe)
+    if isinstance(records, dict):
+        logging.error(f"Не удалось получить снимок дескрипторов: {records['error']}")
+        return None
+
+    lock_index = LockIndex(records)
+    logging.info(f"Снимок дескрипторов: {len(lock_index)} путей за {time.monotonic() - started:.2f} сек")
+    return lock_index
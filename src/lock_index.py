@@ -0,0 +1,63 @@
+import os
+from bisect import bisect_left
+
+def canonical_path(path):
+    """Приводит путь к каноническому виду для сравнения (разделители, регистр)"""
+    key = os.path.normcase(os.path.normpath(path))
+    # В Windows пути нечувствительны к регистру
+    if os.name == "nt":
+        key = key.casefold()
+    return key
+
+class LockIndex:
+    """
+    Индекс блокировок по каноническим путям
+
+    Хранит отсортированный массив путей и отвечает на запросы
+    "кто держит этот путь" и "кто держит что-либо внутри папки"
+    бинарным поиском за O(log n + k). Один индекс, построенный по снимку
+    handle.exe, можно использовать для любого количества запросов.
+    """
+
+    def __init__(self, records=()):
+        holders_by_key = {}
+        seen = set()  # (путь, pid): один процесс указывается для пути один раз
+        for record in records:
+            key = canonical_path(record["file_path"])
+            holders = holders_by_key.setdefault(key, [])
+            if (key, record["pid"]) not in seen:
+                seen.add((key, record["pid"]))
+                holders.append(record)
+
+        self._keys = sorted(holders_by_key)
+        self._holders = [holders_by_key[key] for key in self._keys]
+        self._by_key = holders_by_key
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __contains__(self, path):
+        return canonical_path(path) in self._by_key
+
+    def records(self):
+        """Возвращает все записи индекса в порядке путей"""
+        return [holder for holders in self._holders for holder in holders]
+
+    def query_path(self, path):
+        """Возвращает процессы, удерживающие ровно указанный путь"""
+        return list(self._by_key.get(canonical_path(path), ()))
+
+    def query_subtree(self, path):
+        """Возвращает процессы, удерживающие путь или что-либо внутри него"""
+        key = canonical_path(path)
+        result = list(self._by_key.get(key, ()))
+
+        # Все потомки лежат в диапазоне [key + sep, key + chr(ord(sep) + 1))
+        prefix = key if key.endswith(os.sep) else key + os.sep
+        upper = prefix[:-1] + chr(ord(os.sep) + 1)
+        start = bisect_left(self._keys, prefix)
+        end = bisect_left(self._keys, upper, start)
+
+        for holders in self._holders[start:end]:
+            result.extend(holders)
+        return result
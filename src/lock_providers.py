@@ -0,0 +1,316 @@
+import os
+import time
+import logging
+import threading
+
+from lock_index import LockIndex, canonical_path
+from handle_tool import (get_handle_exe_path, query_handle_tool, query_handle_batched,
+                         take_handle_snapshot)
+import proc_locks
+
+class LockProvider:
+    """
+    Источник сведений о том, какие процессы удерживают файлы
+
+    Анализ блокировок в file_handler работает только через эти операции,
+    поэтому его можно выполнить (и измерить) с любой реализацией:
+    handle.exe в Windows, /proc в Linux или FakeLockProvider.
+
+    Если exact = True, источник видит всех владельцев, и его ответ
+    окончательный: проверка файлов открытием и заглушки для
+    "заблокирован, но неизвестно кем" не нужны.
+    """
+
+    name = "base"
+    exact = False
+
+    def snapshot(self):
+        """
+        Возвращает индекс всех открытых файлов системы
+
+        Returns:
+            LockIndex: Индекс блокировок, либо None, если снимок недоступен
+        """
+        return None
+
+    def query_path(self, path):
+        """
+        Возвращает процессы, удерживающие путь
+
+        Returns:
+            list: Записи {"process_name", "pid", "handle_type", "file_path"}, либо dict с ключом "error"
+        """
+        lock_index = self.snapshot()
+        if lock_index is None:
+            return {"error": f"Источник блокировок {self.name} недоступен"}
+        return lock_index.query_path(path)
+
+    def query_subtree(self, path, tree_scan=None):
+        """
+        Возвращает процессы, удерживающие путь или что-либо внутри него
+
+        Args:
+            path: Папка
+            tree_scan: Готовый результат обхода папки (если источнику он нужен)
+
+        Returns:
+            list: Записи о блокировках, либо dict с ключом "error"
+        """
+        lock_index = self.snapshot()
+        if lock_index is None:
+            return {"error": f"Источник блокировок {self.name} недоступен"}
+        return lock_index.query_subtree(path)
+
+    def query_batch(self, paths):
+        """
+        Проверяет пачку файлов и папок по одному снимку
+
+        В отличие от query_paths, пути могут быть папками: для них
+        возвращаются блокировки всего содержимого.
+
+        Returns:
+            dict: Путь -> список блокирующих процессов, либо dict с ключом "error"
+        """
+        lock_index = self.snapshot()
+        if lock_index is None:
+            return {"error": f"Источник блокировок {self.name} недоступен"}
+        return {path: lock_index.query_subtree(path) if os.path.isdir(path) else lock_index.query_path(path)
+                for path in paths}
+
+    def query_paths(self, file_paths, progress_callback=None, root=None, result_callback=None):
+        """
+        Проверяет набор файлов за один запрос к источнику
+
+        Returns:
+            dict: Путь к файлу -> список блокирующих процессов,
+                  либо dict с ключом "error" при ошибке или отмене
+        """
+        file_paths = list(file_paths)
+        if not file_paths:
+            return {}
+        lock_index = self.snapshot()
+        if lock_index is None:
+            return {"error": f"Источник блокировок {self.name} недоступен"}
+
+        holders_by_file = {}
+        for file_path in file_paths:
+            holders = holders_by_file[file_path] = lock_index.query_path(file_path)
+            if holders and result_callback:
+                result_callback(holders)
+        if progress_callback and not progress_callback(len(file_paths), len(file_paths)):
+            return {"error": "Операция отменена пользователем"}
+        return holders_by_file
+
+class HandleExeProvider(LockProvider):
+    """Блокировки по данным утилиты handle.exe (Windows)"""
+
+    name = "handle.exe"
+
+    def __init__(self, handle_exe):
+        self.handle_exe = handle_exe
+
+    def snapshot(self):
+        return take_handle_snapshot(self.handle_exe)
+
+    def query_path(self, path):
+        # handle.exe ищет по фрагменту имени: запрос по папке находит и ее содержимое
+        return query_handle_tool(self.handle_exe, path)
+
+    def query_subtree(self, path, tree_scan=None):
+        lock_index = self.snapshot()
+        if lock_index is None:
+            return {"error": "Не удалось получить снимок дескрипторов через handle.exe"}
+        return lock_index.query_subtree(path)
+
+    def query_paths(self, file_paths, progress_callback=None, root=None, result_callback=None):
+        return query_handle_batched(self.handle_exe, file_paths, progress_callback, root=root,
+                                    result_callback=result_callback)
+
+class ProcLockProvider(LockProvider):
+    """
+    Блокировки по данным /proc (Linux)
+
+    Открытые дескрипторы, отображенные файлы и текущие папки процессов
+    берутся из снимка /proc, блокировки fcntl/flock - из /proc/locks.
+    Пути в /proc записаны без символических ссылок, поэтому запросы
+    выполняются по os.path.realpath.
+    """
+
+    name = "/proc"
+    exact = True
+
+    def __init__(self, proc_root=proc_locks.PROC_ROOT):
+        self.proc_root = proc_root
+
+    def snapshot(self):
+        return proc_locks.take_proc_snapshot(self.proc_root)
+
+    def query_path(self, path):
+        lock_index = self.snapshot()
+        if lock_index is None:
+            return {"error": "Не удалось получить список открытых файлов через /proc"}
+        real_path = os.path.realpath(path)
+        return proc_locks.attach_file_locks(lock_index.query_path(real_path), real_path)
+
+    def query_subtree(self, path, tree_scan=None):
+        lock_index = self.snapshot()
+        if lock_index is None:
+            return {"error": "Не удалось получить список открытых файлов через /proc"}
+        real_path = os.path.realpath(path)
+        return proc_locks.attach_file_locks(lock_index.query_subtree(real_path), real_path, tree_scan)
+
+    def query_batch(self, paths):
+        # Снимок /proc и таблица /proc/locks читаются один раз на всю пачку
+        lock_index = self.snapshot()
+        if lock_index is None:
+            return {"error": "Не удалось получить список открытых файлов через /proc"}
+
+        locks = proc_locks.read_file_locks()
+        holders_by_path = {}
+        for path in paths:
+            real_path = os.path.realpath(path)
+            if os.path.isdir(real_path):
+                records = lock_index.query_subtree(real_path)
+            else:
+                records = lock_index.query_path(real_path)
+            holders_by_path[path] = proc_locks.attach_file_locks(records, real_path, locks=locks)
+        return holders_by_path
+
+    def query_paths(self, file_paths, progress_callback=None, root=None, result_callback=None):
+        file_paths = list(file_paths)
+        if not file_paths:
+            return {}
+        lock_index = self.snapshot()
+        if lock_index is None:
+            return {"error": "Не удалось получить список открытых файлов через /proc"}
+
+        locks = proc_locks.read_file_locks()
+        holders_by_file = {}
+        for file_path in file_paths:
+            real_path = os.path.realpath(file_path)
+            holders = proc_locks.attach_file_locks(lock_index.query_path(real_path), real_path, locks=locks)
+            holders_by_file[file_path] = holders
+            if holders and result_callback:
+                result_callback(holders)
+        if progress_callback and not progress_callback(len(file_paths), len(file_paths)):
+            return {"error": "Операция отменена пользователем"}
+        return holders_by_file
+
+class FakeLockProvider(LockProvider):
+    """
+    Программируемый источник блокировок в памяти
+
+    Позволяет выполнить весь анализ блокировок без Windows и handle.exe:
+    записи задаются через add() или генерируются в любом количестве через
+    generate(), а задержки имитируют время работы настоящей утилиты.
+    Число вызовов каждой операции доступно в calls.
+
+    Args:
+        records: Начальные записи о блокировках
+        latency: Задержка каждого запроса в секундах (запуск утилиты)
+        per_handle_latency: Дополнительная задержка снимка на каждую запись
+        exact: Считать ли ответы окончательными (как у /proc) или проверять
+               файлы дополнительно (как с handle.exe)
+    """
+
+    name = "fake"
+
+    def __init__(self, records=(), latency=0.0, per_handle_latency=0.0, exact=True):
+        self.records = list(records)
+        self.latency = latency
+        self.per_handle_latency = per_handle_latency
+        self.exact = exact
+        self.calls = {"snapshot": 0, "query_path": 0, "query_subtree": 0, "query_paths": 0, "query_batch": 0}
+        self._lock = threading.Lock()
+
+    def add(self, file_path, pid, process_name="fake.exe", handle_type="File"):
+        """Добавляет блокировку пути процессом"""
+        with self._lock:
+            self.records.append({
+                "process_name": process_name,
+                "pid": pid,
+                "handle_type": handle_type,
+                "file_path": file_path
+            })
+
+    def generate(self, root, count, process_count=100, files_per_dir=1000):
+        """
+        Добавляет count блокировок файлов внутри root
+
+        Файлы распределяются по папкам root/dN по files_per_dir штук,
+        владельцы - по process_count процессам с PID от 10000.
+        """
+        records = [{
+            "process_name": f"fake{index % process_count}.exe",
+            "pid": 10000 + index % process_count,
+            "handle_type": "File",
+            "file_path": os.path.join(root, f"d{index // files_per_dir}", f"f{index}.dat")
+        } for index in range(count)]
+        with self._lock:
+            self.records.extend(records)
+
+    def clear(self):
+        with self._lock:
+            self.records = []
+
+    def _call(self, operation, handles=0):
+        with self._lock:
+            self.calls[operation] += 1
+            records = list(self.records)
+        delay = self.latency + self.per_handle_latency * handles
+        if delay > 0:
+            time.sleep(delay)
+        return records
+
+    def snapshot(self):
+        with self._lock:
+            handles = len(self.records)
+        return LockIndex(self._call("snapshot", handles))
+
+    def query_path(self, path):
+        # Как handle.exe: полный перебор дескрипторов с поиском по фрагменту пути
+        records = self._call("query_path")
+        key = canonical_path(path)
+        return [record for record in records if key in canonical_path(record["file_path"])]
+
+    def query_subtree(self, path, tree_scan=None):
+        with self._lock:
+            handles = len(self.records)
+        return LockIndex(self._call("query_subtree", handles)).query_subtree(path)
+
+    def query_batch(self, paths):
+        with self._lock:
+            handles = len(self.records)
+        lock_index = LockIndex(self._call("query_batch", handles))
+        return {path: lock_index.query_subtree(path) if os.path.isdir(path) else lock_index.query_path(path)
+                for path in paths}
+
+    def query_paths(self, file_paths, progress_callback=None, root=None, result_callback=None):
+        file_paths = list(file_paths)
+        if not file_paths:
+            return {}
+        lock_index = LockIndex(self._call("query_paths"))
+        holders_by_file = {}
+        for file_path in file_paths:
+            holders = holders_by_file[file_path] = lock_index.query_path(file_path)
+            if holders and result_callback:
+                result_callback(holders)
+        if progress_callback and not progress_callback(len(file_paths), len(file_paths)):
+            return {"error": "Операция отменена пользователем"}
+        return holders_by_file
+
+def detect_lock_provider():
+    """
+    Выбирает источник блокировок для текущей системы
+
+    Returns:
+        LockProvider: /proc в Linux, handle.exe в Windows, либо None, если handle.exe не найден
+    """
+    if proc_locks.is_available():
+        return ProcLockProvider()
+
+    handle_exe = get_handle_exe_path()
+    if handle_exe:
+        return HandleExeProvider(handle_exe)
+    logging.error("Не найдена утилита handle.exe")
+    return None
@@ -132,8 +132,25 @@ def get_handle_exe_path():
     return None
 
 def main():
+    # Если программа уже запущена (например, при выделении нескольких файлов
+    # Проводник запускает ее для каждого), передаем ей пути и сразу выходим:
+    # до создания лога, импорта PyQt и поиска handle.exe
+    instance = None
+    instance_error = None
+    try:
+        from single_instance import acquire
+        instance = acquire(sys.argv[1:])
+        if instance is None:
+            return 0
+    except Exception as e:
+        # Лог еще не настроен - ошибка записывается в него сразу после настройки
+        instance_error = e
+    
     # Настраиваем логирование с минимальной функциональностью
     log_info = setup_logging()
+    if instance_error is not None:
+        logging.error(f"Не удалось связаться с запущенным экземпляром: {instance_error}",
+                      exc_info=instance_error)
     
     try:
         # Записываем базовую системную информацию
@@ -208,17 +225,23 @@ def main():
             window = MainWindow()
             logging.info("Создано главное окно приложения")
             
-            # Если запущена с аргументом (перетаскивание на exe или из контекстного меню)
-            if len(sys.argv) > 1:
+            window.show()
+            
+            # Пути из командной строки (перетаскивание на exe или контекстное меню)
+            # и от повторных запусков приходят пачками через сигнал окна
+            if instance:
+                instance.set_handler(window.paths_received.emit)
+            elif len(sys.argv) > 1:
                 file_path = sys.argv[1]
                 logging.info(f"Получен аргумент командной строки: {file_path}")
                 window.check_file(file_path)
             
-            window.show()
             logging.info("Запуск цикла событий приложения")
             
             # Запуск цикла событий Qt
             result = app.exec_()
+            if instance:
+                instance.close()
             logging.info(f"Приложение завершило работу с кодом: {result}")
             return result
         except Exception as e:
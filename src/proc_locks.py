@@ -0,0 +1,279 @@
+import os
+import re
+import time
+import itertools
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from lock_index import LockIndex, canonical_path
+from tree_walker import iter_tree
+from process_table import get_process_table
+
+# Корень файловой системы procfs
+PROC_ROOT = "/proc"
+
+# Таблица блокировок файлов ядра (fcntl/POSIX, flock, OFD)
+PROC_LOCKS_FILE = "/proc/locks"
+
+# Число потоков для параллельного чтения каталогов процессов
+MAX_PROC_SCAN_WORKERS = min(16, (os.cpu_count() or 4) * 2)
+
+# Сколько процессов обрабатывает один поток за одно задание
+PROC_SCAN_CHUNK_SIZE = 64
+
+# Типы записей (по аналогии с типами дескрипторов handle.exe)
+HANDLE_TYPE_FILE = "File"  # Открытый файловый дескриптор
+HANDLE_TYPE_SECTION = "Section"  # Файл, отображенный в память (/proc/PID/maps)
+HANDLE_TYPE_CWD = "Cwd"  # Текущая папка процесса
+HANDLE_TYPE_LOCK = "Lock"  # Блокировка файла без известного открытого дескриптора
+
+_DELETED_SUFFIX = " (deleted)"
+
+# Строка /proc/PID/maps с файлом: адрес права смещение устройство inode (не 0) путь
+_MAPS_FILE_RE = re.compile(rb"^\S+ \S+ \S+ \S+ [1-9]\d* +(/.*)$", re.MULTILINE)
+
+def is_available(proc_root=PROC_ROOT):
+    """Проверяет, можно ли искать блокировки через /proc"""
+    return os.name != "nt" and os.path.isdir(os.path.join(proc_root, "self", "fd"))
+
+def _read_process(proc_root, pid):
+    """
+    Собирает пути, открытые одним процессом
+
+    Returns:
+        list: Записи {"process_name", "pid", "handle_type", "file_path"}; пустой список,
+              если процесс завершился или его каталог недоступен (процесс другого пользователя)
+    """
+    base = os.path.join(proc_root, str(pid))
+    try:
+        with open(os.path.join(base, "comm"), "rb") as f:
+            process_name = f.read().rstrip(b"\n").decode("utf-8", "replace")
+    except OSError:
+        return []
+
+    seen = set()
+    records = []
+
+    def add(handle_type, file_path):
+        # Сокеты, каналы и anon_inode - не пути; удаленные файлы уже не мешают удалению
+        if not file_path.startswith("/") or file_path.endswith(_DELETED_SUFFIX):
+            return
+        key = (handle_type, file_path)
+        if key in seen:
+            return
+        seen.add(key)
+        records.append({
+            "process_name": process_name,
+            "pid": pid,
+            "handle_type": handle_type,
+            "file_path": file_path
+        })
+
+    fd_dir = os.path.join(base, "fd")
+    try:
+        with os.scandir(fd_dir) as iterator:
+            for entry in iterator:
+                try:
+                    add(HANDLE_TYPE_FILE, os.readlink(entry.path))
+                except OSError:
+                    pass
+    except OSError:
+        pass
+
+    try:
+        with open(os.path.join(base, "maps"), "rb") as f:
+            # Одна библиотека занимает несколько строк - каждый путь добавляем один раз
+            for raw_path in set(_MAPS_FILE_RE.findall(f.read())):
+                add(HANDLE_TYPE_SECTION, os.fsdecode(raw_path))
+    except OSError:
+        pass
+
+    try:
+        add(HANDLE_TYPE_CWD, os.readlink(os.path.join(base, "cwd")))
+    except OSError:
+        pass
+
+    return records
+
+def _read_chunk(proc_root, pids):
+    records = []
+    for pid in pids:
+        records.extend(_read_process(proc_root, pid))
+    return records
+
+def scan_proc_locks(proc_root=PROC_ROOT, max_workers=None):
+    """
+    Перечисляет открытые файлы всех процессов через /proc
+
+    Для каждого процесса читаются /proc/PID/fd, /proc/PID/maps и ссылка cwd.
+    Каталоги процессов обрабатываются параллельно порциями. Процессы других
+    пользователей без прав root пропускаются, как и у handle.exe без прав
+    администратора.
+
+    Returns:
+        list: Записи {"process_name", "pid", "handle_type", "file_path"} в формате handle.exe
+    """
+    pids = [int(name) for name in os.listdir(proc_root) if name.isdigit()]
+    chunks = [pids[start:start + PROC_SCAN_CHUNK_SIZE] for start in range(0, len(pids), PROC_SCAN_CHUNK_SIZE)]
+
+    records = []
+    workers = min(max_workers or MAX_PROC_SCAN_WORKERS, len(chunks))
+    if workers <= 1:
+        for chunk in chunks:
+            records.extend(_read_chunk(proc_root, chunk))
+        return records
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for chunk_records in executor.map(lambda chunk: _read_chunk(proc_root, chunk), chunks):
+            records.extend(chunk_records)
+    return records
+
+def take_proc_snapshot(proc_root=PROC_ROOT, max_workers=None):
+    """
+    Делает снимок открытых файлов всех процессов через /proc
+
+    Returns:
+        LockIndex: Индекс блокировок по путям, либо None при ошибке
+    """
+    started = time.monotonic()
+    try:
+        records = scan_proc_locks(proc_root, max_workers)
+    except OSError as e:
+        logging.error(f"Не удалось получить снимок открытых файлов через /proc: {str(e)}")
+        return None
+
+    lock_index = LockIndex(records)
+    logging.info(f"Снимок /proc: {len(records)} записей, {len(lock_index)} путей "
+                 f"за {time.monotonic() - started:.3f} сек")
+    return lock_index
+
+def read_file_locks(locks_file=PROC_LOCKS_FILE):
+    """
+    Читает таблицу блокировок файлов ядра за один проход
+
+    Строка /proc/locks: "1: POSIX  ADVISORY  WRITE 1234 08:01:5678 0 EOF".
+    Строки ожидающих блокировок ("->") пропускаются: такие процессы
+    ничего не удерживают.
+
+    Returns:
+        dict: (st_dev, inode) -> список {"pid", "lock_type", "lock_range"},
+              где lock_type - например "POSIX WRITE", lock_range - (начало, конец или None для EOF)
+    """
+    locks = {}
+    try:
+        with open(locks_file, "r", encoding="ascii", errors="replace") as f:
+            lines = f.read().splitlines()
+    except OSError as e:
+        logging.debug(f"Не удалось прочитать {locks_file}: {str(e)}")
+        return locks
+
+    for line in lines:
+        fields = line.split()
+        if len(fields) < 8 or fields[1] == "->":
+            continue
+        try:
+            kind, mode, access, pid = fields[1], fields[2], fields[3], int(fields[4])
+            major, minor, inode = fields[5].split(":")
+            device = os.makedev(int(major, 16), int(minor, 16))
+            start = int(fields[6])
+            end = None if fields[7] == "EOF" else int(fields[7])
+        except ValueError:
+            continue
+        # У OFD-блокировок нет процесса-владельца (pid -1) - завершать некого
+        if pid <= 0:
+            continue
+        lock_type = f"{kind} {access}" if mode == "ADVISORY" else f"{kind} {mode} {access}"
+        locks.setdefault((device, int(inode)), []).append({
+            "pid": pid,
+            "lock_type": lock_type,
+            "lock_range": (start, end)
+        })
+    return locks
+
+def _iter_inodes(root, tree_scan=None):
+    """Выдает (путь, inode) элементов дерева: из готового обхода или потоком с диска"""
+    if tree_scan is not None:
+        entries = itertools.chain(tree_scan.iter_files(), tree_scan.iter_dirs_bottom_up())
+        scan_root = tree_scan.root
+    else:
+        entries = iter_tree(root, with_size=False)
+        scan_root = root
+    for entry in entries:
+        if entry.inode is None:
+            continue
+        path = entry.path
+        # Пути снимка /proc разрешены до конца, пути обхода могут начинаться со ссылки
+        if scan_root != root:
+            path = os.path.join(root, os.path.relpath(path, scan_root))
+        yield path, entry.inode
+
+def attach_file_locks(records, root, tree_scan=None, locks=None):
+    """
+    Добавляет к записям о владельцах блокировки файлов из /proc/locks
+
+    Таблица блокировок читается один раз; устройство и inode каждой блокировки
+    сопоставляются с элементами дерева root за один проход (используются
+    inode из tree_scan). Если блокировок на томе root нет, дерево не обходится.
+    Запись того же процесса на тот же путь получает поля "lock_type" и
+    "lock_range"; если такой записи нет, добавляется новая с типом "Lock".
+
+    Args:
+        records: Записи {"process_name", "pid", "handle_type", "file_path"} для root
+        root: Файл или папка (путь без символических ссылок)
+        tree_scan: Готовый результат обхода root
+        locks: Готовая таблица read_file_locks()
+
+    Returns:
+        list: Новый список записей (исходные словари не изменяются)
+    """
+    if locks is None:
+        locks = read_file_locks()
+    records = [dict(record) for record in records]
+    if not locks:
+        return records
+
+    try:
+        root_stat = os.stat(root)
+    except OSError:
+        return records
+    device = root_stat.st_dev
+    if not any(lock_device == device for lock_device, _ in locks):
+        return records
+
+    # Один проход по дереву: ищем только inode, для которых есть блокировки
+    locked_paths = []
+    if (device, root_stat.st_ino) in locks:
+        locked_paths.append((root, locks[(device, root_stat.st_ino)]))
+    if os.path.isdir(root):
+        for path, inode in _iter_inodes(root, tree_scan):
+            file_locks = locks.get((device, inode))
+            if file_locks:
+                locked_paths.append((path, file_locks))
+
+    by_holder = {}
+    for record in records:
+        by_holder.setdefault((canonical_path(record["file_path"]), record["pid"]), record)
+
+    table = get_process_table()
+    for path, file_locks in locked_paths:
+        key = canonical_path(path)
+        for lock in file_locks:
+            record = by_holder.get((key, lock["pid"]))
+            if record is None:
+                record = {
+                    "process_name": table.name_of(lock["pid"]) or str(lock["pid"]),
+                    "pid": lock["pid"],
+                    "handle_type": HANDLE_TYPE_LOCK,
+                    "file_path": path
+                }
+                records.append(record)
+                by_holder[(key, lock["pid"])] = record
+            elif "lock_type" in record:
+                # Процесс держит несколько диапазонов одного файла - оставляем первый
+                continue
+            record["lock_type"] = lock["lock_type"]
+            record["lock_range"] = lock["lock_range"]
+
+    if locked_paths:
+        logging.info(f"Блокировки файлов в {root}: {sum(len(l) for _, l in locked_paths)} на {len(locked_paths)} путях")
+    return records
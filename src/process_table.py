@@ -0,0 +1,202 @@
+import os
+import csv
+import time
+import logging
+import threading
+import subprocess
+
+# Время, в течение которого таблица процессов считается актуальной (секунды)
+PROCESS_TABLE_TTL = 1.0
+
+def _enumerate_windows():
+    """Перечисляет процессы Windows одним снимком Toolhelp32: {pid: имя образа}"""
+    import ctypes
+    from ctypes import wintypes
+
+    class PROCESSENTRY32W(ctypes.Structure):
+        _fields_ = [
+            ("dwSize", wintypes.DWORD),
+            ("cntUsage", wintypes.DWORD),
+            ("th32ProcessID", wintypes.DWORD),
+            ("th32DefaultHeapID", ctypes.c_size_t),
+            ("th32ModuleID", wintypes.DWORD),
+            ("cntThreads", wintypes.DWORD),
+            ("th32ParentProcessID", wintypes.DWORD),
+            ("pcPriClassBase", ctypes.c_long),
+            ("dwFlags", wintypes.DWORD),
+            ("szExeFile", ctypes.c_wchar * 260),
+        ]
+
+    TH32CS_SNAPPROCESS = 0x00000002
+    kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+    kernel32.CreateToolhelp32Snapshot.restype = wintypes.HANDLE
+    kernel32.CreateToolhelp32Snapshot.argtypes = [wintypes.DWORD, wintypes.DWORD]
+    kernel32.Process32FirstW.argtypes = [wintypes.HANDLE, ctypes.POINTER(PROCESSENTRY32W)]
+    kernel32.Process32NextW.argtypes = [wintypes.HANDLE, ctypes.POINTER(PROCESSENTRY32W)]
+    kernel32.CloseHandle.argtypes = [wintypes.HANDLE]
+
+    snapshot = kernel32.CreateToolhelp32Snapshot(TH32CS_SNAPPROCESS, 0)
+    if snapshot is None or snapshot == wintypes.HANDLE(-1).value:
+        raise ctypes.WinError(ctypes.get_last_error())
+
+    processes = {}
+    try:
+        entry = PROCESSENTRY32W()
+        entry.dwSize = ctypes.sizeof(PROCESSENTRY32W)
+        ok = kernel32.Process32FirstW(snapshot, ctypes.byref(entry))
+        while ok:
+            processes[entry.th32ProcessID] = entry.szExeFile
+            ok = kernel32.Process32NextW(snapshot, ctypes.byref(entry))
+    finally:
+        kernel32.CloseHandle(snapshot)
+    return processes
+
+def _enumerate_tasklist():
+    """Перечисляет процессы одним вызовом tasklist (запасной способ для Windows)"""
+    result = subprocess.run(
+        ["tasklist", "/fo", "csv", "/nh"],
+        capture_output=True,
+        text=True,
+        creationflags=subprocess.CREATE_NO_WINDOW
+    )
+    processes = {}
+    for row in csv.reader(result.stdout.splitlines()):
+        if len(row) >= 2 and row[1].isdigit():
+            processes[int(row[1])] = row[0]
+    return processes
+
+def _read_proc_name(pid):
+    try:
+        with open(f"/proc/{pid}/comm", "r", encoding="utf-8", errors="replace") as f:
+            return f.read().rstrip("\n")
+    except OSError:
+        return None
+
+class ProcessTable:
+    """
+    Таблица запущенных процессов с индексами по PID и имени образа
+
+    Процессы перечисляются одним системным вызовом (Toolhelp32 в Windows,
+    чтение /proc в Linux), после чего проверки существования процесса
+    и подсчет экземпляров выполняются за O(1). Таблица обновляется,
+    когда становится старше ttl секунд; в Linux при обновлении читаются
+    имена только новых PID (и PID, занятых новым процессом).
+
+    Если последнее обновление не удалось, состояние процессов неизвестно,
+    и is_running считает любой процесс запущенным.
+    """
+
+    def __init__(self, ttl=PROCESS_TABLE_TTL):
+        self.ttl = ttl
+        self._names = {}  # pid -> имя образа
+        self._counts = {}  # имя образа в нижнем регистре -> число экземпляров
+        self._inodes = {}  # pid -> inode папки /proc/<pid> (Linux)
+        self._refreshed_at = None
+        self._failed = False
+        self._lock = threading.Lock()
+
+    def _enumerate(self):
+        if os.name == "nt":
+            try:
+                return _enumerate_windows(), {}
+            except Exception as e:
+                logging.warning(f"Не удалось получить снимок процессов через Toolhelp32: {str(e)}")
+                return _enumerate_tasklist(), {}
+
+        # Linux: список PID из /proc, имена читаем только для новых процессов.
+        # Папка /proc/<pid> нового процесса получает новый inode, поэтому
+        # по нему видно, что PID занят другим процессом и имя надо перечитать
+        processes = {}
+        inodes = {}
+        with os.scandir("/proc") as entries:
+            for entry in entries:
+                if not entry.name.isdigit():
+                    continue
+                pid = int(entry.name)
+                inode = entry.inode()
+                process_name = self._names.get(pid) if self._inodes.get(pid) == inode else None
+                if process_name is None:
+                    process_name = _read_proc_name(pid)
+                    if process_name is None:
+                        continue
+                processes[pid] = process_name
+                inodes[pid] = inode
+        return processes, inodes
+
+    def refresh(self):
+        """Перечитывает список процессов"""
+        with self._lock:
+            try:
+                names, inodes = self._enumerate()
+            except Exception as e:
+                logging.error(f"Ошибка при получении списка процессов: {str(e)}")
+                # Повторная попытка - не раньше, чем через ttl
+                self._failed = True
+                self._refreshed_at = time.monotonic()
+                return False
+
+            counts = {}
+            for process_name in names.values():
+                key = process_name.lower()
+                counts[key] = counts.get(key, 0) + 1
+
+            self._names = names
+            self._counts = counts
+            self._inodes = inodes
+            self._failed = False
+            self._refreshed_at = time.monotonic()
+            return True
+
+    def _ensure_fresh(self):
+        if self._refreshed_at is None or time.monotonic() - self._refreshed_at > self.ttl:
+            self.refresh()
+
+    def is_running(self, pid):
+        """
+        Проверяет, есть ли процесс с указанным PID
+
+        Если список процессов получить не удалось, возвращает True:
+        считать живой процесс завершенным опаснее, чем подождать лишнее.
+        """
+        self._ensure_fresh()
+        if self._failed:
+            return True
+        return pid in self._names
+
+    def name_of(self, pid):
+        """Возвращает имя образа процесса или None"""
+        self._ensure_fresh()
+        return self._names.get(pid)
+
+    def instance_count(self, process_name):
+        """Возвращает число запущенных экземпляров процесса с указанным именем"""
+        self._ensure_fresh()
+        return self._counts.get(process_name.lower(), 0)
+
+    def forget(self, pid):
+        """Убирает завершенный процесс из таблицы, не дожидаясь обновления"""
+        with self._lock:
+            process_name = self._names.pop(pid, None)
+            self._inodes.pop(pid, None)
+            if process_name is not None:
+                key = process_name.lower()
+                self._counts[key] = max(0, self._counts.get(key, 1) - 1)
+
+    def invalidate(self):
+        """Помечает таблицу устаревшей: следующий запрос перечитает процессы"""
+        self._refreshed_at = None
+
+    def __len__(self):
+        self._ensure_fresh()
+        return len(self._names)
+
+_process_table = None
+_process_table_lock = threading.Lock()
+
+def get_process_table():
+    """Возвращает общую для программы таблицу процессов"""
+    global _process_table
+    with _process_table_lock:
+        if _process_table is None:
+            _process_table = ProcessTable()
+        return _process_table
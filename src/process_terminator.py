@@ -0,0 +1,531 @@
+import os
+import re
+import time
+import select
+import signal
+import logging
+import threading
+import subprocess
+from abc import ABC, abstractmethod
+
+from process_table import get_process_table
+
+# Общий срок ожидания завершения всех процессов пакета (секунды)
+PROCESS_EXIT_TIMEOUT = 5.0
+
+# Сколько ждать штатного закрытия процессов перед принудительным завершением (секунды)
+PROCESS_GRACE_PERIOD = 1.0
+
+# Интервалы повторной проверки списка процессов, если ожидание по событию недоступно
+PROCESS_EXIT_POLL_INTERVAL = 0.005
+PROCESS_EXIT_POLL_MAX_INTERVAL = 0.1
+
+# Максимум PID в одной команде taskkill (ограничение длины командной строки)
+TASKKILL_MAX_PIDS = 100
+
+# Итоги завершения процесса
+TERMINATED = "terminated"
+NOT_RUNNING = "not_running"
+FAILED = "failed"
+
+# Способ, которым процесс был завершен
+GRACEFUL = "graceful"  # Закрылся сам по запросу (WM_CLOSE / SIGTERM)
+FORCED = "forced"  # Завершен принудительно (taskkill /F / SIGKILL)
+
+# PID в строках ошибок taskkill (текст сообщения зависит от языка системы)
+_TASKKILL_PID_RE = re.compile(r"PID\D{0,3}(\d+)")
+
+def _run_taskkill(pids, force):
+    """
+    Запускает taskkill для пакета процессов
+
+    Returns:
+        dict: PID -> текст ошибки для процессов, которым не удалось отправить запрос
+    """
+    errors = {}
+    # Один запуск taskkill на пакет: taskkill [/F] /PID 1 /PID 2 ...
+    for start in range(0, len(pids), TASKKILL_MAX_PIDS):
+        chunk = pids[start:start + TASKKILL_MAX_PIDS]
+        args = ["taskkill", "/F"] if force else ["taskkill"]
+        for pid in chunk:
+            args += ["/PID", str(pid)]
+        try:
+            result = subprocess.run(
+                args,
+                capture_output=True,
+                text=True,
+                creationflags=subprocess.CREATE_NO_WINDOW
+            )
+            if result.returncode != 0:
+                error_msg = result.stderr.strip() or "Неизвестная ошибка"
+                # Ошибки taskkill перечисляют PID построчно; если разобрать их
+                # не удалось, какой именно PID не завершен, покажет ожидание
+                failed = {int(pid) for line in error_msg.splitlines()
+                          for pid in _TASKKILL_PID_RE.findall(line)} & set(chunk)
+                if force and not failed:
+                    failed = set(chunk)
+                for pid in failed:
+                    errors[pid] = error_msg
+        except Exception as e:
+            for pid in chunk:
+                errors[pid] = str(e)
+    return errors
+
+def _send_kill(pids):
+    """
+    Отправляет принудительное завершение всем процессам сразу
+
+    Returns:
+        dict: PID -> текст ошибки для процессов, которым не удалось отправить сигнал
+    """
+    if os.name == "nt":
+        return _run_taskkill(pids, force=True)
+
+    errors = {}
+    for pid in pids:
+        try:
+            os.kill(pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+        except OSError as e:
+            errors[pid] = str(e)
+    return errors
+
+def _reap(pid):
+    """Забирает код завершения дочернего процесса, чтобы он не оставался зомби"""
+    if os.name == "nt":
+        return
+    try:
+        os.waitpid(pid, os.WNOHANG)
+    except (ChildProcessError, OSError):
+        pass
+
+def _wait_windows(pids, deadline, on_exit=None):
+    """Ожидает завершения через дескрипторы процессов и WaitForMultipleObjects"""
+    import ctypes
+    from ctypes import wintypes
+
+    SYNCHRONIZE = 0x00100000
+    WAIT_OBJECT_0 = 0x00000000
+    WAIT_TIMEOUT = 0x00000102
+    MAXIMUM_WAIT_OBJECTS = 64
+    ERROR_INVALID_PARAMETER = 87  # Процесса с таким PID нет
+    ROTATE_INTERVAL = 0.05  # Если процессов больше 64, группы ожидаются по очереди
+
+    kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+    kernel32.OpenProcess.restype = wintypes.HANDLE
+    kernel32.OpenProcess.argtypes = [wintypes.DWORD, wintypes.BOOL, wintypes.DWORD]
+    kernel32.WaitForMultipleObjects.restype = wintypes.DWORD
+    kernel32.WaitForMultipleObjects.argtypes = [wintypes.DWORD, ctypes.POINTER(wintypes.HANDLE),
+                                                wintypes.BOOL, wintypes.DWORD]
+    kernel32.WaitForSingleObject.restype = wintypes.DWORD
+    kernel32.WaitForSingleObject.argtypes = [wintypes.HANDLE, wintypes.DWORD]
+    kernel32.CloseHandle.argtypes = [wintypes.HANDLE]
+
+    handles = {}
+    unopened = []  # Процессы, к которым нет доступа - их ждем опросом
+    for pid in pids:
+        handle = kernel32.OpenProcess(SYNCHRONIZE, False, pid)
+        if handle:
+            handles[pid] = handle
+        elif ctypes.get_last_error() != ERROR_INVALID_PARAMETER:
+            unopened.append(pid)
+        elif on_exit:
+            on_exit(pid)
+
+    try:
+        waiting = dict(handles)
+        while waiting:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            # Ждем любой процесс группы, затем собираем все уже завершившиеся
+            chunk = list(waiting.items())[:MAXIMUM_WAIT_OBJECTS]
+            if len(waiting) > MAXIMUM_WAIT_OBJECTS:
+                remaining = min(remaining, ROTATE_INTERVAL)
+            array = (wintypes.HANDLE * len(chunk))(*[handle for _, handle in chunk])
+            kernel32.WaitForMultipleObjects(len(chunk), array, False, max(0, int(remaining * 1000)))
+
+            for pid, handle in list(waiting.items()):
+                if kernel32.WaitForSingleObject(handle, 0) == WAIT_OBJECT_0:
+                    del waiting[pid]
+                    if on_exit:
+                        on_exit(pid)
+            if len(waiting) > MAXIMUM_WAIT_OBJECTS:
+                # Следующая группа получает свою очередь ожидания
+                rotated = list(waiting.items())
+                waiting = dict(rotated[MAXIMUM_WAIT_OBJECTS:] + rotated[:MAXIMUM_WAIT_OBJECTS])
+
+        return set(waiting) | _wait_polling(unopened, deadline, on_exit)
+    finally:
+        for handle in handles.values():
+            kernel32.CloseHandle(handle)
+
+def _wait_pidfd(pids, deadline, on_exit=None, pidfds=None):
+    """
+    Ожидает завершения через pidfd: дескриптор становится читаемым при выходе процесса
+
+    Уже открытые дескрипторы (pidfds: pid -> fd) используются повторно и не закрываются.
+    Процессы, для которых pidfd открыть не удалось (нет прав, исчерпаны дескрипторы,
+    старое ядро), ожидаются в том же цикле опросом таблицы процессов.
+    """
+    poller = select.poll()
+    fds = {}
+    owned = []
+    polled = set()
+    try:
+        for pid in pids:
+            fd = (pidfds or {}).get(pid)
+            if fd is None:
+                try:
+                    fd = os.pidfd_open(pid)
+                except ProcessLookupError:
+                    if on_exit:
+                        on_exit(pid)
+                    continue
+                except OSError as e:
+                    logging.debug(f"pidfd для процесса {pid} недоступен, используется опрос: {str(e)}")
+                    polled.add(pid)
+                    continue
+                owned.append(fd)
+            fds[fd] = pid
+            poller.register(fd, select.POLLIN)
+
+        table = get_process_table() if polled else None
+        interval = PROCESS_EXIT_POLL_INTERVAL
+        waiting = set(fds)
+        while True:
+            if polled:
+                for pid in polled:
+                    _reap(pid)
+                table.invalidate()
+                exited = {pid for pid in polled if not table.is_running(pid)}
+                polled -= exited
+                if on_exit:
+                    for pid in exited:
+                        on_exit(pid)
+            if not waiting and not polled:
+                break
+
+            remaining_ms = int((deadline - time.monotonic()) * 1000)
+            if remaining_ms <= 0:
+                break
+            if polled:
+                # Опрашиваемые процессы проверяются с нарастающим интервалом
+                remaining_ms = min(remaining_ms, max(1, int(interval * 1000)))
+                interval = min(interval * 2, PROCESS_EXIT_POLL_MAX_INTERVAL)
+            for fd, _ in poller.poll(remaining_ms):
+                waiting.discard(fd)
+                poller.unregister(fd)
+                _reap(fds[fd])
+                if on_exit:
+                    on_exit(fds[fd])
+
+        return {fds[fd] for fd in waiting} | polled
+    finally:
+        for fd in owned:
+            os.close(fd)
+
+def _wait_polling(pids, deadline, on_exit=None):
+    """Запасной способ: опрос таблицы процессов с нарастающим интервалом"""
+    table = get_process_table()
+    remaining = set(pids)
+    interval = PROCESS_EXIT_POLL_INTERVAL
+
+    while remaining:
+        for pid in remaining:
+            _reap(pid)
+        table.invalidate()
+        exited = {pid for pid in remaining if not table.is_running(pid)}
+        remaining -= exited
+        if on_exit:
+            for pid in exited:
+                on_exit(pid)
+        if not remaining or time.monotonic() >= deadline:
+            break
+        time.sleep(min(interval, max(0, deadline - time.monotonic())))
+        interval = min(interval * 2, PROCESS_EXIT_POLL_MAX_INTERVAL)
+
+    return remaining
+
+def wait_for_exit(pids, timeout=PROCESS_EXIT_TIMEOUT, on_exit=None):
+    """
+    Ожидает завершения всех процессов с одним общим сроком
+
+    Ожидание построено на событиях завершения процессов (WaitForMultipleObjects
+    в Windows, pidfd в Linux), поэтому возвращается сразу после выхода последнего
+    процесса. Если эти механизмы недоступны, используется опрос таблицы процессов.
+
+    Args:
+        pids: PID процессов
+        timeout: Общий срок ожидания в секундах
+        on_exit: Функция, вызываемая с PID каждого процесса сразу после его выхода
+
+    Returns:
+        set: PID процессов, которые так и не завершились
+    """
+    pids = list(dict.fromkeys(pids))
+    if not pids:
+        return set()
+
+    deadline = time.monotonic() + timeout
+    try:
+        if os.name == "nt":
+            return _wait_windows(pids, deadline, on_exit)
+        if hasattr(os, "pidfd_open"):
+            return _wait_pidfd(pids, deadline, on_exit)
+    except Exception as e:
+        logging.warning(f"Ожидание завершения по событию недоступно, используется опрос: {str(e)}")
+    return _wait_polling(pids, deadline, on_exit)
+
+class ProcessTerminator(ABC):
+    """
+    Завершение пакета процессов с переходом от штатного закрытия к принудительному
+
+    Сначала всем процессам сразу отправляется запрос на штатное закрытие
+    (soft_close), и в течение grace_period ожидается их выход. Процессы,
+    отказавшиеся от штатного закрытия, и те, что не успели закрыться,
+    завершаются принудительно (force_kill). Для каждого PID сообщается
+    итог, способ завершения и время до выхода. Штатно закрывшийся процесс
+    успевает освободить свои файлы, и после него не остается блокировок,
+    которые ядро снимает с задержкой.
+
+    Реализация обязана определить soft_close и force_kill: неполный
+    завершатель не создается (TypeError), а не падает посреди завершения.
+    """
+
+    name = "base"
+
+    def open(self, pids):
+        """Подготавливает процессы к завершению; возвращает pid -> дескриптор (или None)"""
+        return {pid: None for pid in pids}
+
+    def close(self, handles):
+        """Освобождает дескрипторы, полученные в open"""
+
+    @abstractmethod
+    def soft_close(self, handles):
+        """
+        Отправляет запрос на штатное закрытие
+
+        Returns:
+            dict: PID -> ошибка для процессов, которые можно завершить только принудительно
+        """
+
+    @abstractmethod
+    def force_kill(self, handles):
+        """
+        Завершает процессы принудительно
+
+        Returns:
+            dict: PID -> текст ошибки для процессов, которым не удалось отправить завершение
+        """
+
+    def wait(self, handles, timeout, on_exit=None):
+        """Ожидает выхода процессов; возвращает множество PID, которые не завершились"""
+        return wait_for_exit(list(handles), timeout, on_exit)
+
+    def terminate(self, pids, timeout=PROCESS_EXIT_TIMEOUT, grace_period=PROCESS_GRACE_PERIOD):
+        """
+        Завершает пакет запущенных процессов
+
+        Args:
+            pids: PID процессов
+            timeout: Общий срок ожидания завершения в секундах
+            grace_period: Сколько ждать штатного закрытия (0 - сразу принудительно)
+
+        Returns:
+            dict: PID -> {"status": TERMINATED | FAILED, "method": GRACEFUL | FORCED,
+                          "exit_time": секунды до выхода, "error": текст (для FAILED)}
+        """
+        started = time.monotonic()
+        deadline = started + timeout
+        outcomes = {}
+        method = {}
+
+        def on_exit(pid):
+            if pid not in outcomes:
+                outcomes[pid] = {"status": TERMINATED, "method": method.get(pid, GRACEFUL),
+                                 "exit_time": time.monotonic() - started}
+
+        handles = self.open(pids)
+        try:
+            to_force = {}
+            if grace_period > 0:
+                for pid in handles:
+                    method[pid] = GRACEFUL
+                refused = self.soft_close(handles)
+                # Процессы без окон не закрываются штатно - завершаем их сразу
+                to_force = {pid: handles[pid] for pid in refused}
+                waiting = {pid: handle for pid, handle in handles.items() if pid not in refused}
+                survivors = self.wait(waiting, min(grace_period, timeout), on_exit)
+                to_force.update({pid: handles[pid] for pid in survivors})
+            else:
+                to_force = dict(handles)
+
+            errors = {}
+            if to_force:
+                for pid in to_force:
+                    method[pid] = FORCED
+                errors = self.force_kill(to_force)
+                self.wait(to_force, max(0, deadline - time.monotonic()), on_exit)
+        finally:
+            self.close(handles)
+
+        for pid in handles:
+            if pid not in outcomes:
+                outcomes[pid] = {"status": FAILED, "method": method.get(pid, FORCED), "exit_time": None,
+                                 "error": errors.get(pid, "Процесс не завершился за отведенное время")}
+        return outcomes
+
+class PosixTerminator(ProcessTerminator):
+    """
+    Завершение процессов в Linux и других POSIX-системах: SIGTERM, затем SIGKILL
+
+    Где доступен pidfd, сигналы отправляются через дескриптор процесса
+    (pidfd_send_signal) и по нему же ожидается выход, поэтому сигнал не
+    может попасть в другой процесс, получивший освободившийся PID.
+    """
+
+    name = "posix"
+
+    # Дескриптор процесса, который завершился до начала операции
+    _EXITED = -1
+
+    def open(self, pids):
+        handles = {}
+        for pid in pids:
+            fd = None
+            if hasattr(os, "pidfd_open") and hasattr(signal, "pidfd_send_signal"):
+                try:
+                    fd = os.pidfd_open(pid)
+                except ProcessLookupError:
+                    # Процесс уже завершился: сигналы не отправляем - PID мог достаться другому
+                    fd = self._EXITED
+                except OSError:
+                    fd = None
+            handles[pid] = fd
+        return handles
+
+    def close(self, handles):
+        for fd in handles.values():
+            if fd is not None and fd != self._EXITED:
+                os.close(fd)
+
+    def _signal(self, handles, signum):
+        errors = {}
+        for pid, fd in handles.items():
+            try:
+                if fd == self._EXITED:
+                    continue
+                if fd is not None:
+                    signal.pidfd_send_signal(fd, signum)
+                else:
+                    os.kill(pid, signum)
+            except ProcessLookupError:
+                pass
+            except OSError as e:
+                errors[pid] = str(e)
+        return errors
+
+    def soft_close(self, handles):
+        # Отказ в доступе к SIGTERM означает отказ и для SIGKILL - ошибка сохранится
+        return self._signal(handles, signal.SIGTERM)
+
+    def force_kill(self, handles):
+        return self._signal(handles, signal.SIGKILL)
+
+    def wait(self, handles, timeout, on_exit=None):
+        handles = dict(handles)
+        for pid, fd in list(handles.items()):
+            if fd == self._EXITED:
+                del handles[pid]
+                if on_exit:
+                    on_exit(pid)
+
+        pidfds = {pid: fd for pid, fd in handles.items() if fd is not None}
+        if not pidfds:
+            return super().wait(handles, timeout, on_exit)
+        deadline = time.monotonic() + timeout
+        return _wait_pidfd(list(handles), deadline, on_exit, pidfds)
+
+class WindowsTerminator(ProcessTerminator):
+    """
+    Завершение процессов в Windows: taskkill (WM_CLOSE окнам процесса), затем taskkill /F
+
+    Процессы без окон taskkill без /F закрыть не может - они сразу
+    переходят к принудительному завершению без ожидания.
+    """
+
+    name = "windows"
+
+    def soft_close(self, handles):
+        return _run_taskkill(list(handles), force=False)
+
+    def force_kill(self, handles):
+        return _run_taskkill(list(handles), force=True)
+
+_terminator = None
+_terminator_lock = threading.Lock()
+
+def get_terminator():
+    """Возвращает способ завершения процессов для текущей системы"""
+    global _terminator
+    with _terminator_lock:
+        if _terminator is None:
+            _terminator = WindowsTerminator() if os.name == "nt" else PosixTerminator()
+        return _terminator
+
+def set_terminator(terminator):
+    """Заменяет способ завершения процессов (None - выбрать по системе)"""
+    global _terminator
+    with _terminator_lock:
+        _terminator = terminator
+
+def terminate_processes(pids, timeout=PROCESS_EXIT_TIMEOUT, grace_period=PROCESS_GRACE_PERIOD):
+    """
+    Завершает пакет процессов за один проход
+
+    PID дедуплицируются, всем процессам сразу отправляется запрос на штатное
+    закрытие, а не закрывшиеся за grace_period завершаются принудительно
+    (см. ProcessTerminator).
+
+    Args:
+        pids: PID процессов
+        timeout: Общий срок ожидания завершения в секундах
+        grace_period: Сколько ждать штатного закрытия (0 - сразу принудительно)
+
+    Returns:
+        dict: PID -> {"status": TERMINATED | NOT_RUNNING | FAILED, "method": GRACEFUL | FORCED,
+                      "exit_time": секунды до выхода, "error": текст (для FAILED)}
+    """
+    table = get_process_table()
+    table.invalidate()
+
+    outcomes = {}
+    to_kill = []
+    for pid in dict.fromkeys(pids):
+        if table.is_running(pid):
+            to_kill.append(pid)
+        else:
+            outcomes[pid] = {"status": NOT_RUNNING}
+
+    if not to_kill:
+        return outcomes
+
+    started = time.monotonic()
+    terminator = get_terminator()
+    outcomes.update(terminator.terminate(to_kill, timeout, grace_period))
+
+    counts = {GRACEFUL: 0, FORCED: 0, FAILED: 0}
+    for pid in to_kill:
+        outcome = outcomes[pid]
+        if outcome["status"] == FAILED:
+            counts[FAILED] += 1
+        else:
+            table.forget(pid)
+            counts[outcome["method"]] += 1
+
+    logging.info(f"Завершение {len(to_kill)} процессов ({terminator.name}): {counts[GRACEFUL]} штатно, "
+                 f"{counts[FORCED]} принудительно, {counts[FAILED]} с ошибкой за {time.monotonic() - started:.2f} сек")
+    return outcomes
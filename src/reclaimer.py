@@ -0,0 +1,279 @@
+import os
+import json
+import time
+import uuid
+import queue
+import logging
+import threading
+
+from delete_engine import delete_tree
+
+# Префикс имени, под которым удаляемый элемент ждет фонового удаления.
+# Переименование выполняется в той же папке: это гарантирует тот же том,
+# поэтому переименование атомарно и не требует копирования
+STAGING_PREFIX = ".JL_Delete_Lock-"
+STAGING_SUFFIX = ".deleting"
+
+# Файл со списком элементов, ожидающих удаления (переживает перезапуск программы)
+RECLAIM_QUEUE_FILE = os.path.join(os.path.expanduser("~"), "AppData", "Local", "JL_Delete_Lock", "reclaim_queue.json")
+
+# Сколько последних завершенных удалений хранить в статистике
+MAX_RECLAIM_HISTORY = 50
+
+def _hide(path):
+    """Делает элемент скрытым в Проводнике (в Linux скрыт уже из-за точки в имени)"""
+    if os.name != "nt":
+        return
+    try:
+        import ctypes
+        FILE_ATTRIBUTE_HIDDEN = 0x2
+        kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+        attributes = kernel32.GetFileAttributesW(path)
+        if attributes != 0xFFFFFFFF:
+            kernel32.SetFileAttributesW(path, attributes | FILE_ATTRIBUTE_HIDDEN)
+    except Exception as e:
+        logging.warning(f"Не удалось скрыть {path}: {str(e)}")
+
+def _lower_thread_priority():
+    """Понижает приоритет текущего потока (процессор и ввод-вывод)"""
+    try:
+        if os.name == "nt":
+            import ctypes
+            THREAD_MODE_BACKGROUND_BEGIN = 0x00010000
+            kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+            kernel32.GetCurrentThread.restype = ctypes.c_void_p
+            kernel32.SetThreadPriority.argtypes = [ctypes.c_void_p, ctypes.c_int]
+            kernel32.SetThreadPriority(kernel32.GetCurrentThread(), THREAD_MODE_BACKGROUND_BEGIN)
+        elif hasattr(os, "setpriority"):
+            # В Linux приоритет nice задается для отдельного потока по его TID
+            os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), 19)
+    except Exception as e:
+        logging.warning(f"Не удалось понизить приоритет фонового удаления: {str(e)}")
+
+def _remove_path(path):
+    """
+    Удаляет файл или дерево папки в потоке с пониженным приоритетом
+
+    Returns:
+        int: Число элементов, которые не удалось удалить
+    """
+    if not os.path.isdir(path) or os.path.islink(path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logging.warning(f"Не удалось удалить {path}: {str(e)}")
+            return 1
+        return 0
+
+    # Один поток пула: фоновое удаление не должно конкурировать с программами пользователя
+    result = delete_tree(path, max_workers=1, initializer=_lower_thread_priority)
+    if "success" in result:
+        return 0
+    return max(1, len(result["errors"]))
+
+class Reclaimer:
+    """
+    Фоновое удаление элементов, переименованных во временные скрытые имена
+
+    stage() переименовывает элемент одним системным вызовом, и он сразу
+    исчезает из папки пользователя. Затем поток с пониженным приоритетом
+    удаляет его содержимое. Список ожидающих элементов хранится в
+    queue_file, поэтому прерванное удаление продолжается при следующем
+    запуске (resume_pending). Для каждого элемента записывается, на сколько
+    было отложено его удаление. Если содержимое удалить не удалось,
+    вызывается обработчик set_failure_callback: скрытый элемент с данными
+    пользователя остается на диске, и пользователь должен об этом узнать.
+    """
+
+    def __init__(self, queue_file=RECLAIM_QUEUE_FILE):
+        self.queue_file = queue_file
+        self._pending = {}  # временный путь -> {"original_path", "staged_at"}
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._history = []
+        self._failure_callback = None
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.queue_file, "r", encoding="utf-8") as f:
+                entries = json.load(f)
+            for entry in entries:
+                self._pending[entry["staged_path"]] = {
+                    "original_path": entry.get("original_path"),
+                    "staged_at": entry.get("staged_at", time.time()),
+                }
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logging.error(f"Не удалось прочитать очередь фонового удаления: {str(e)}")
+
+    def _save(self):
+        """Записывает очередь атомарно: через временный файл и os.replace. Вызывается под блокировкой"""
+        entries = [{"staged_path": staged_path, **info} for staged_path, info in self._pending.items()]
+        try:
+            os.makedirs(os.path.dirname(self.queue_file), exist_ok=True)
+            temp_file = self.queue_file + ".tmp"
+            with open(temp_file, "w", encoding="utf-8") as f:
+                json.dump(entries, f, indent=4, ensure_ascii=False)
+            os.replace(temp_file, self.queue_file)
+        except Exception as e:
+            logging.error(f"Не удалось сохранить очередь фонового удаления: {str(e)}")
+
+    def stage(self, path):
+        """
+        Переименовывает элемент во временное скрытое имя и ставит его в очередь удаления
+
+        Args:
+            path: Путь к файлу или папке
+
+        Returns:
+            dict: {"success": True, "staged_path": ...} или {"error": ...}
+        """
+        path = os.path.abspath(path)
+        parent = os.path.dirname(path)
+        staged_path = os.path.join(parent, f"{STAGING_PREFIX}{uuid.uuid4().hex}{STAGING_SUFFIX}")
+        staged_at = time.time()
+
+        # Запись в очереди появляется до переименования: если программа завершится
+        # между ними, при следующем запуске элемент все равно будет найден
+        with self._lock:
+            self._pending[staged_path] = {"original_path": path, "staged_at": staged_at}
+            self._save()
+
+        try:
+            os.rename(path, staged_path)
+        except OSError as e:
+            with self._lock:
+                self._pending.pop(staged_path, None)
+                self._save()
+            logging.info(f"Не удалось переименовать {path} для фонового удаления: {str(e)}")
+            return {"error": str(e)}
+
+        _hide(staged_path)
+        logging.info(f"{path} перемещен в {staged_path} для фонового удаления")
+        self._queue.put(staged_path)
+        self._ensure_thread()
+        return {"success": True, "staged_path": staged_path}
+
+    def set_failure_callback(self, callback):
+        """
+        Задает обработчик неудачного фонового удаления
+
+        callback(record) вызывается из фонового потока с записью статистики,
+        дополненной полем "staged_path" (где остался скрытый элемент)
+        """
+        with self._lock:
+            self._failure_callback = callback
+
+    def resume_pending(self):
+        """Ставит в очередь элементы, удаление которых не завершилось при прошлом запуске"""
+        with self._lock:
+            missing = [staged_path for staged_path in self._pending if not os.path.lexists(staged_path)]
+            for staged_path in missing:
+                self._pending.pop(staged_path)
+            if missing:
+                self._save()
+            pending = list(self._pending)
+
+        for staged_path in pending:
+            self._queue.put(staged_path)
+        if pending:
+            logging.info(f"Продолжается фоновое удаление {len(pending)} элементов с прошлого запуска")
+            self._ensure_thread()
+        return len(pending)
+
+    def _ensure_thread(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="Reclaimer", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        _lower_thread_priority()
+        while True:
+            try:
+                staged_path = self._queue.get(timeout=1.0)
+            except queue.Empty:
+                # Поток завершается, когда очередь пуста; новая задача запустит его снова
+                with self._lock:
+                    if self._queue.empty():
+                        self._thread = None
+                        return
+                continue
+
+            try:
+                self._reclaim(staged_path)
+            except Exception as e:
+                logging.error(f"Ошибка фонового удаления {staged_path}: {str(e)}", exc_info=True)
+
+    def _reclaim(self, staged_path):
+        with self._lock:
+            info = self._pending.get(staged_path)
+        if info is None:
+            return
+
+        started = time.time()
+        errors = _remove_path(staged_path)
+        finished = time.time()
+        record = {
+            "original_path": info["original_path"],
+            "deferred": started - info["staged_at"],  # Сколько элемент ждал начала удаления
+            "duration": finished - started,
+            "total": finished - info["staged_at"],  # Сколько удаление было отложено всего
+            "errors": errors,
+        }
+
+        with self._lock:
+            if errors == 0:
+                # Оставшиеся элементы удалятся при следующем запуске
+                self._pending.pop(staged_path, None)
+                self._save()
+            self._history.append(record)
+            del self._history[:-MAX_RECLAIM_HISTORY]
+            failure_callback = self._failure_callback
+
+        if errors:
+            logging.warning(f"Фоновое удаление {info['original_path']}: не удалено {errors} элементов "
+                            f"(остались в {staged_path}), повтор при следующем запуске")
+            if failure_callback:
+                try:
+                    failure_callback(dict(record, staged_path=staged_path))
+                except Exception as e:
+                    logging.error(f"Ошибка в обработчике неудачного фонового удаления: {str(e)}", exc_info=True)
+        else:
+            logging.info(f"Фоновое удаление {info['original_path']} завершено: отложено на "
+                         f"{record['total']:.2f} сек (ожидание {record['deferred']:.2f} сек, "
+                         f"удаление {record['duration']:.2f} сек)")
+
+    def pending_count(self):
+        """Возвращает число элементов, ожидающих удаления"""
+        with self._lock:
+            return len(self._pending)
+
+    def get_stats(self):
+        """Возвращает записи о последних фоновых удалениях"""
+        with self._lock:
+            return [dict(record) for record in self._history]
+
+    def wait_idle(self, timeout=None):
+        """Ожидает окончания фонового удаления; возвращает True, если очередь пуста"""
+        with self._lock:
+            thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+        return self._queue.empty() and (self._thread is None or not self._thread.is_alive())
+
+_reclaimer = None
+_reclaimer_lock = threading.Lock()
+
+def get_reclaimer():
+    """Возвращает общий для программы фоновый удалитель"""
+    global _reclaimer
+    with _reclaimer_lock:
+        if _reclaimer is None:
+            _reclaimer = Reclaimer()
+        return _reclaimer
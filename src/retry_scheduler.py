@@ -0,0 +1,156 @@
+import time
+import random
+import logging
+import threading
+
+# Общий бюджет времени на все повторы одной операции (секунды)
+RETRY_BUDGET = 15.0
+
+# Начальная и максимальная пауза между попытками (секунды)
+RETRY_BASE_DELAY = 0.05
+RETRY_MAX_DELAY = 2.0
+
+# Коды ошибок Windows, при которых повтор имеет смысл: файл занят другим процессом
+_RETRYABLE_WINERRORS = {
+    32,  # ERROR_SHARING_VIOLATION
+    33,  # ERROR_LOCK_VIOLATION
+}
+
+def is_retryable(error):
+    """
+    Определяет, имеет ли смысл повторять операцию после ошибки
+
+    Отсутствующий файл и отказ в доступе повтором не исправить. Исключение -
+    PermissionError из-за того, что файл занят другим процессом (в Windows
+    это тоже PermissionError), такую ошибку стоит повторить.
+    """
+    if isinstance(error, (FileNotFoundError, NotADirectoryError)):
+        return False
+    if isinstance(error, PermissionError):
+        return getattr(error, "winerror", None) in _RETRYABLE_WINERRORS
+    return True
+
+# Статистика повторов по названиям операций
+_retry_stats = {}
+_retry_stats_lock = threading.Lock()
+
+def get_retry_stats():
+    """Возвращает копию статистики повторов по операциям"""
+    with _retry_stats_lock:
+        return {name: dict(stats) for name, stats in _retry_stats.items()}
+
+def reset_retry_stats():
+    """Сбрасывает статистику повторов"""
+    with _retry_stats_lock:
+        _retry_stats.clear()
+
+class RetryScheduler:
+    """
+    Планировщик повторов для одной операции
+
+    Паузы между попытками растут экспоненциально от base_delay до max_delay
+    со случайным разбросом, а все повторы операции укладываются в общий
+    бюджет времени. Ошибки, которые повтором не исправить, прекращают
+    повторы сразу. По завершении (finish или выход из with) статистика
+    операции добавляется в get_retry_stats().
+
+    run() можно вызывать из нескольких потоков одновременно (например, из
+    пула delete_tree): счетчики обновляются под блокировкой, бюджет общий.
+    """
+
+    def __init__(self, operation, budget=RETRY_BUDGET, base_delay=RETRY_BASE_DELAY, max_delay=RETRY_MAX_DELAY):
+        self.operation = operation
+        self.budget = budget
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.started = time.monotonic()
+        self.deadline = self.started + budget
+        self.attempts = 0
+        self.retries = 0
+        self.short_circuits = 0
+        self.last_error = None
+        self.succeeded = False
+        self._finished = False
+        self._lock = threading.Lock()
+
+    def remaining(self):
+        """Возвращает остаток бюджета времени в секундах"""
+        return max(0.0, self.deadline - time.monotonic())
+
+    def expired(self):
+        return time.monotonic() >= self.deadline
+
+    def _delay(self, attempt):
+        delay = min(self.max_delay, self.base_delay * (2 ** (attempt - 1)))
+        # Половина паузы фиксирована, половина случайна, чтобы повторы не совпадали
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    def run(self, func, max_attempts=3, label=None):
+        """
+        Выполняет func до успеха, но не больше max_attempts раз и в пределах бюджета
+
+        Args:
+            func: Функция попытки; возвращает True при успехе
+            max_attempts: Максимум попыток
+            label: Название попытки для журнала
+
+        Returns:
+            bool: True, если одна из попыток успешна
+        """
+        label = label or self.operation
+        for attempt in range(1, max_attempts + 1):
+            with self._lock:
+                self.attempts += 1
+            try:
+                if func():
+                    return True
+                logging.info(f"{label}: попытка {attempt} не удалась")
+            except Exception as e:
+                with self._lock:
+                    self.last_error = e
+                if not is_retryable(e):
+                    with self._lock:
+                        self.short_circuits += 1
+                    logging.warning(f"{label}: ошибка, которую не исправить повтором: {str(e)}")
+                    return False
+                logging.warning(f"{label}: ошибка при попытке {attempt}: {str(e)}")
+
+            if attempt == max_attempts or self.expired():
+                break
+            time.sleep(min(self._delay(attempt), self.remaining()))
+            with self._lock:
+                self.retries += 1
+        return False
+
+    def finish(self, succeeded=None):
+        """Завершает операцию и записывает ее статистику"""
+        with self._lock:
+            if self._finished:
+                return
+            self._finished = True
+            if succeeded is not None:
+                self.succeeded = succeeded
+
+        elapsed = time.monotonic() - self.started
+        with _retry_stats_lock:
+            stats = _retry_stats.setdefault(self.operation, {
+                "operations": 0, "successes": 0, "failures": 0, "attempts": 0,
+                "retries": 0, "short_circuits": 0, "total_time": 0.0, "max_time": 0.0
+            })
+            stats["operations"] += 1
+            stats["successes" if self.succeeded else "failures"] += 1
+            stats["attempts"] += self.attempts
+            stats["retries"] += self.retries
+            stats["short_circuits"] += self.short_circuits
+            stats["total_time"] += elapsed
+            stats["max_time"] = max(stats["max_time"], elapsed)
+
+        logging.info(f"{self.operation}: {self.attempts} попыток, {self.retries} повторов, "
+                     f"{elapsed:.2f} сек, {'успешно' if self.succeeded else 'неудачно'}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.finish()
+        return False
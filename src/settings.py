@@ -24,6 +24,7 @@ class Settings:
             "close_to_tray": True,  # Новая опция: закрывать в трей вместо выхода
             "show_tray_notifications": True,  # Новая опция: показывать уведомления в трее
             "confirm_delete": True,  # Новая опция: запрашивать подтверждение при удалении
+            "instant_delete": False,  # Переименовывать папку и удалять ее содержимое в фоне
             "last_update_check": None  # Дата последней проверки обновлений
         }
         
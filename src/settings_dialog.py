@@ -102,6 +102,16 @@ class SettingsDialog(QDialog):
         confirm_group.setLayout(confirm_layout)
         general_layout.addWidget(confirm_group)
         
+        # Группа удаления
+        delete_group = QGroupBox("Удаление")
+        delete_layout = QVBoxLayout()
+        
+        self.instant_delete_checkbox = QCheckBox("Мгновенно убирать папку и удалять ее содержимое в фоне")
+        delete_layout.addWidget(self.instant_delete_checkbox)
+        
+        delete_group.setLayout(delete_layout)
+        general_layout.addWidget(delete_group)
+        
         # Добавляем вкладку "Основные"
         self.tab_widget.addTab(general_tab, "Основные")
         
@@ -254,6 +264,7 @@ class SettingsDialog(QDialog):
             self.close_to_tray_checkbox.setChecked(self.settings.settings.get("close_to_tray", True))
             self.show_tray_notifications_checkbox.setChecked(self.settings.settings.get("show_tray_notifications", True))
             self.confirm_delete_checkbox.setChecked(self.settings.settings.get("confirm_delete", True))
+            self.instant_delete_checkbox.setChecked(self.settings.settings.get("instant_delete", False))
             
             # Настройки горячих клавиш
             modifier_index = self.modifier_combo.findText(self.settings.settings["hotkey_modifier"])
@@ -392,6 +403,7 @@ class SettingsDialog(QDialog):
             self.settings.settings["close_to_tray"] = self.close_to_tray_checkbox.isChecked()
             self.settings.settings["show_tray_notifications"] = self.show_tray_notifications_checkbox.isChecked()
             self.settings.settings["confirm_delete"] = self.confirm_delete_checkbox.isChecked()
+            self.settings.settings["instant_delete"] = self.instant_delete_checkbox.isChecked()
             
             # Сохраняем настройки обновлений
             self.settings.settings["auto_check_updates"] = self.auto_check_updates_checkbox.isChecked()
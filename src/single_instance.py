@@ -0,0 +1,336 @@
+import os
+import json
+import time
+import queue
+import getpass
+import logging
+import secrets
+import threading
+from multiprocessing.connection import Listener, Client, deliver_challenge, answer_challenge
+
+# Модуль импортируется до PyQt и остальных модулей программы, поэтому
+# использует только стандартную библиотеку: повторный запуск должен
+# передать аргументы и завершиться как можно быстрее
+
+# Сколько ждать следующих запусков пачки (выделение нескольких файлов
+# в Проводнике запускает программу для каждого файла отдельно), секунды
+BATCH_COALESCE_INTERVAL = 0.3
+
+# Максимальная задержка первой пачки, даже если запуски продолжают поступать
+BATCH_MAX_DELAY = 1.5
+
+# Срок ожидания ответа основного экземпляра при передаче аргументов, секунды
+FORWARD_TIMEOUT = 2.0
+
+# Папка данных программы: доступна только текущему пользователю
+APP_DATA_DIR = os.path.join(os.path.expanduser("~"), "AppData", "Local", "JL_Delete_Lock")
+
+# Общий секрет экземпляров одного пользователя. Имя канала предсказуемо, поэтому
+# обе стороны подтверждают знание секрета (challenge-response multiprocessing):
+# канал, созданный другой учетной записью, не пройдет проверку
+INSTANCE_KEY_FILE = os.path.join(APP_DATA_DIR, "instance.key")
+INSTANCE_KEY_SIZE = 32
+
+# Наибольший размер сообщения с путями, байты
+MAX_MESSAGE_SIZE = 1024 * 1024
+
+_REPLY_OK = b"ok"
+
+def _user_suffix():
+    try:
+        user = getpass.getuser()
+    except Exception:
+        user = "user"
+    return "".join(ch for ch in user if ch.isalnum()) or "user"
+
+def instance_address():
+    """Адрес канала основного экземпляра: именованный канал в Windows, Unix-сокет в остальных системах"""
+    name = f"JL_Delete_Lock-{_user_suffix()}"
+    if os.name == "nt":
+        return rf"\\.\pipe\{name}"
+    # Сокет лежит в папке данных программы: к нему есть доступ только у пользователя
+    os.makedirs(APP_DATA_DIR, exist_ok=True)
+    return os.path.join(APP_DATA_DIR, "instance.sock")
+
+def _family():
+    return "AF_PIPE" if os.name == "nt" else "AF_UNIX"
+
+def load_instance_key(key_file=INSTANCE_KEY_FILE):
+    """
+    Возвращает секрет экземпляров пользователя, создавая его при первом запуске
+
+    Файл создается атомарно (O_EXCL) с правами только для владельца; если его
+    одновременно создает другой запуск, ждем, пока тот допишет ключ.
+    """
+    os.makedirs(os.path.dirname(key_file), exist_ok=True)
+    try:
+        fd = os.open(key_file, os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, "O_BINARY", 0), 0o600)
+    except FileExistsError:
+        pass
+    else:
+        with os.fdopen(fd, "wb") as f:
+            f.write(secrets.token_bytes(INSTANCE_KEY_SIZE))
+
+    for _ in range(50):
+        with open(key_file, "rb") as f:
+            key = f.read()
+        if len(key) >= INSTANCE_KEY_SIZE:
+            return key
+        time.sleep(0.01)
+    raise OSError(f"Поврежден файл ключа экземпляра: {key_file}")
+
+def _encode_message(message):
+    return json.dumps(message, ensure_ascii=False).encode("utf-8")
+
+def _decode_message(data):
+    """Разбирает сообщение запуска; возвращает None, если оно не в ожидаемом формате"""
+    try:
+        message = json.loads(data.decode("utf-8"))
+    except (UnicodeDecodeError, ValueError):
+        return None
+    if not isinstance(message, dict):
+        return None
+    paths = message.get("paths")
+    sent_at = message.get("sent_at")
+    if not isinstance(paths, list) or not all(isinstance(path, str) for path in paths):
+        return None
+    if not isinstance(sent_at, (int, float)):
+        sent_at = time.time()
+    return {"paths": paths, "sent_at": sent_at}
+
+def _connect(address, key, timeout=FORWARD_TIMEOUT):
+    """
+    Подключается к каналу и проходит взаимную проверку ключа
+
+    Проверка выполняется в отдельном потоке с ограничением по времени: чужой
+    сервер, который принимает подключение и молчит, не должен подвесить запуск.
+
+    Returns:
+        Connection: Подключение, либо None при ошибке или истечении срока
+    """
+    result = {}
+
+    def connect():
+        try:
+            connection = Client(address, family=_family(), authkey=key)
+        except Exception as e:
+            # Чужой сервер может ответить чем угодно: ошибка рукопожатия не всегда AuthenticationError
+            result["error"] = e
+            return
+        result["connection"] = connection
+
+    thread = threading.Thread(target=connect, name="InstanceConnect", daemon=True)
+    thread.start()
+    thread.join(timeout)
+    if thread.is_alive():
+        logging.warning(f"Канал экземпляра не ответил за {timeout} сек: {address}")
+        return None
+    if not isinstance(result.get("error", OSError()), (OSError, EOFError)):
+        logging.warning(f"Канал {address} не прошел проверку ключа - он создан не этой программой")
+    return result.get("connection")
+
+def forward_to_running_instance(paths, address=None, key=None):
+    """
+    Передает пути запущенному экземпляру программы
+
+    Сообщение передается в JSON через send_bytes/recv_bytes: полученные
+    данные никогда не распаковываются pickle.
+
+    Args:
+        paths: Пути из командной строки (пустой список - только показать окно)
+        address: Адрес канала (по умолчанию instance_address())
+        key: Секрет экземпляров (по умолчанию load_instance_key())
+
+    Returns:
+        bool: True, если основной экземпляр получил пути
+    """
+    address = address or instance_address()
+    key = key or load_instance_key()
+    # Относительные пути разрешаются в папке, из которой запущена копия
+    message = {"paths": [os.path.abspath(path) for path in paths], "sent_at": time.time()}
+    connection = _connect(address, key)
+    if connection is None:
+        return False
+    try:
+        connection.send_bytes(_encode_message(message))
+        # Подтверждение гарантирует, что основной экземпляр успел принять пути
+        if not connection.poll(FORWARD_TIMEOUT):
+            return False
+        return connection.recv_bytes(len(_REPLY_OK)) == _REPLY_OK
+    except (OSError, EOFError):
+        return False
+    finally:
+        connection.close()
+
+class InstanceServer:
+    """
+    Прием путей от повторных запусков программы
+
+    Запуски, пришедшие с интервалом меньше BATCH_COALESCE_INTERVAL,
+    объединяются в одну пачку: handler получает список путей один раз
+    на всю пачку. Собственные пути основного экземпляра (submit) передаются
+    сразу, без ожидания пачки. Пачки, пришедшие до установки обработчика
+    (пока программа запускается), сохраняются и передаются при set_handler.
+
+    Каждое подключение обслуживается в своем потоке: медленный или молчащий
+    клиент не задерживает прием следующих запусков.
+    """
+
+    def __init__(self, address=None, coalesce_interval=BATCH_COALESCE_INTERVAL, max_delay=BATCH_MAX_DELAY,
+                 key=None):
+        self.address = address or instance_address()
+        self.key = key or load_instance_key()
+        self.coalesce_interval = coalesce_interval
+        self.max_delay = max_delay
+        self._listener = None
+        self._incoming = queue.Queue()
+        self._handler = None
+        self._undelivered = []
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def listen(self):
+        """
+        Начинает прием запусков
+
+        Returns:
+            bool: False, если канал уже занят другим экземпляром
+        """
+        try:
+            self._listener = self._create_listener()
+        except OSError as e:
+            if os.name == "nt" or not os.path.exists(self.address):
+                logging.info(f"Канал экземпляра уже занят: {str(e)}")
+                return False
+            # Сокет остался от завершившегося аварийно экземпляра - никто его не слушает
+            if forward_to_running_instance([], self.address, self.key):
+                return False
+            os.unlink(self.address)
+            try:
+                self._listener = self._create_listener()
+            except OSError as e:
+                logging.info(f"Канал экземпляра уже занят: {str(e)}")
+                return False
+
+        threading.Thread(target=self._accept_loop, name="InstanceAccept", daemon=True).start()
+        threading.Thread(target=self._batch_loop, name="InstanceBatch", daemon=True).start()
+        logging.info(f"Основной экземпляр принимает запуски: {self.address}")
+        return True
+
+    def _create_listener(self):
+        # Ключ проверяется не в accept(), а в потоке подключения (_serve_connection)
+        return Listener(self.address, family=_family())
+
+    def submit(self, paths):
+        """Передает собственные пути основного экземпляра обработчику сразу, без ожидания пачки"""
+        self._deliver(list(dict.fromkeys(os.path.abspath(path) for path in paths)))
+
+    def set_handler(self, handler):
+        """Задает обработчик пачек: handler(paths); вызывается из фонового потока"""
+        with self._lock:
+            self._handler = handler
+            undelivered, self._undelivered = self._undelivered, []
+        for paths in undelivered:
+            handler(paths)
+
+    def close(self):
+        self._closed = True
+        if self._listener is not None:
+            try:
+                self._listener.close()
+            except OSError:
+                pass
+
+    def _accept_loop(self):
+        while not self._closed:
+            try:
+                connection = self._listener.accept()
+            except (OSError, EOFError):
+                if self._closed:
+                    return
+                continue
+            # Проверка ключа и чтение путей - в отдельном потоке, чтобы следующий
+            # запуск принимался сразу, не дожидаясь текущего клиента
+            threading.Thread(target=self._serve_connection, args=(connection,),
+                             name="InstanceConnection", daemon=True).start()
+
+    def _serve_connection(self, connection):
+        try:
+            # Проверяем ключ клиента и подтверждаем свой (как Listener с authkey)
+            deliver_challenge(connection, self.key)
+            answer_challenge(connection, self.key)
+            if connection.poll(FORWARD_TIMEOUT):
+                message = _decode_message(connection.recv_bytes(MAX_MESSAGE_SIZE))
+                if message is not None:
+                    self._incoming.put(message)
+                    connection.send_bytes(_REPLY_OK)
+        except (OSError, EOFError) as e:
+            logging.warning(f"Ошибка при приеме запуска: {str(e)}")
+        except Exception:
+            # AuthenticationError или ответ не по протоколу посреди рукопожатия
+            logging.warning("Отклонено подключение к каналу экземпляра без верного ключа")
+        finally:
+            connection.close()
+
+    def _batch_loop(self):
+        while not self._closed:
+            message = self._incoming.get()
+            started = time.monotonic()
+            batch = [message]
+
+            # Собираем запуски, пока они идут чаще coalesce_interval
+            while time.monotonic() - started < self.max_delay:
+                try:
+                    batch.append(self._incoming.get(timeout=self.coalesce_interval))
+                except queue.Empty:
+                    break
+
+            paths = list(dict.fromkeys(path for item in batch for path in item["paths"]))
+            waited = time.time() - min(item["sent_at"] for item in batch)
+            logging.info(f"Пачка из {len(batch)} запусков, {len(paths)} путей, ожидание {waited:.2f} сек")
+            self._deliver(paths)
+
+    def _deliver(self, paths):
+        """Передает пачку обработчику или сохраняет ее до set_handler"""
+        with self._lock:
+            handler = self._handler
+            if handler is None:
+                self._undelivered.append(paths)
+                return
+        try:
+            handler(paths)
+        except Exception as e:
+            logging.error(f"Ошибка при обработке пачки запусков: {str(e)}", exc_info=True)
+
+def acquire(paths):
+    """
+    Становится основным экземпляром или передает пути уже запущенному
+
+    Args:
+        paths: Пути из командной строки
+
+    Returns:
+        InstanceServer: Сервер основного экземпляра (пути уже переданы в submit);
+                        None, если пути переданы запущенному экземпляру; False, если канал
+                        недоступен и программа работает без него
+    """
+    key = load_instance_key()
+    if forward_to_running_instance(paths, key=key):
+        return None
+
+    server = InstanceServer(key=key)
+    try:
+        listening = server.listen()
+    except Exception as e:
+        logging.error(f"Не удалось открыть канал экземпляра: {str(e)}")
+        listening = False
+
+    if not listening:
+        # Другой запуск стал основным одновременно с нами - передаем пути ему
+        if forward_to_running_instance(paths, key=key):
+            return None
+        logging.warning("Не удалось связаться с основным экземпляром, работаем отдельно")
+        return False
+
+    server.submit(paths)
+    return server
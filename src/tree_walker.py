@@ -0,0 +1,204 @@
+import os
+import time
+import logging
+import itertools
+from collections import namedtuple
+
+# Элемент дерева: путь, признак папки, размер (если известен), inode (если известен), глубина
+TreeEntry = namedtuple("TreeEntry", ["path", "is_dir", "size", "inode", "depth"])
+
+# Сколько элементов обхода хранить в памяти. Для деревьев крупнее
+# TreeScan хранит только счетчики, а элементы при необходимости читает с диска потоком
+MAX_STORED_ENTRIES = 50000
+
+# Размер буфера упреждающего чтения для потоковой обработки
+STREAM_BATCH_SIZE = 256
+
+def _make_entry(entry, depth, with_size, with_inode):
+    """Создает TreeEntry из os.DirEntry без лишних системных вызовов"""
+    try:
+        is_dir = entry.is_dir(follow_symlinks=False)
+    except OSError:
+        is_dir = False
+
+    size = None
+    inode = None
+    try:
+        if with_size and not is_dir:
+            size = entry.stat(follow_symlinks=False).st_size
+        if with_inode:
+            inode = entry.inode()
+    except OSError:
+        pass
+
+    return TreeEntry(entry.path, is_dir, size, inode, depth)
+
+def _open_directory(directory, onerror):
+    try:
+        return os.scandir(directory)
+    except OSError as e:
+        logging.warning(f"Не удалось прочитать директорию {directory}: {str(e)}")
+        if onerror:
+            onerror(directory)
+        return None
+
+def iter_tree(root, bottom_up=False, with_size=None, onerror=None):
+    """
+    Потоково обходит дерево папки через os.scandir
+
+    В памяти держится только стек папок текущего пути, поэтому потребление
+    памяти не зависит от количества файлов. Символические ссылки на папки
+    считаются файлами и не обходятся.
+
+    Args:
+        root: Корневая папка
+        bottom_up: Выдавать папку после всего ее содержимого (порядок для удаления)
+        with_size: Собирать размеры файлов (по умолчанию только там, где это бесплатно - в Windows)
+        onerror: Функция, вызываемая с путем папки, которую не удалось прочитать
+
+    Yields:
+        TreeEntry: Элементы дерева (сама корневая папка не выдается)
+    """
+    if with_size is None:
+        with_size = os.name == "nt"
+    # В Windows inode() требует отдельного системного вызова
+    with_inode = os.name != "nt"
+
+    if not bottom_up:
+        stack = [(root, 0)]
+        while stack:
+            directory, depth = stack.pop()
+            iterator = _open_directory(directory, onerror)
+            if iterator is None:
+                continue
+            with iterator:
+                for entry in iterator:
+                    item = _make_entry(entry, depth + 1, with_size, with_inode)
+                    if item.is_dir:
+                        stack.append((entry.path, depth + 1))
+                    yield item
+        return
+
+    # Обход в обратном порядке: держим открытыми итераторы папок текущего пути
+    iterator = _open_directory(root, onerror)
+    if iterator is None:
+        return
+    stack = [(iterator, None)]
+    try:
+        while stack:
+            iterator, dir_item = stack[-1]
+            for entry in iterator:
+                item = _make_entry(entry, len(stack), with_size, with_inode)
+                if item.is_dir:
+                    child = _open_directory(entry.path, onerror)
+                    if child is not None:
+                        stack.append((child, item))
+                        break
+                yield item
+            else:
+                iterator.close()
+                stack.pop()
+                if dir_item is not None:
+                    yield dir_item
+    finally:
+        for iterator, _ in stack:
+            iterator.close()
+
+def iter_batches(iterable, size=STREAM_BATCH_SIZE):
+    """Разбивает поток на списки не длиннее size (буфер упреждающего чтения)"""
+    iterator = iter(iterable)
+    while True:
+        batch = list(itertools.islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+class TreeScan:
+    """
+    Результат однократного обхода дерева папки
+
+    Один обход используется всеми этапами операции: подсчетом файлов,
+    поиском блокировок, ожиданием разблокировки и удалением. Если дерево
+    больше MAX_STORED_ENTRIES, сохраняются только счетчики, а элементы
+    читаются с диска потоком при каждом проходе.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.files = []
+        self.dirs = []
+        self.errors = []
+        self.complete = True  # Все элементы сохранены в files/dirs
+        self.file_count = 0
+        self.dir_count = 0
+        self.total_size = 0
+        self.created_at = time.monotonic()
+
+    def _add(self, item):
+        if item.is_dir:
+            self.dir_count += 1
+        else:
+            self.file_count += 1
+            if item.size:
+                self.total_size += item.size
+
+        if not self.complete:
+            return
+        if self.file_count + self.dir_count > MAX_STORED_ENTRIES:
+            logging.info(f"Дерево {self.root} слишком велико, элементы будут читаться потоком")
+            self.complete = False
+            self.files = []
+            self.dirs = []
+            return
+        (self.dirs if item.is_dir else self.files).append(item)
+
+    def iter_files(self):
+        """Выдает файлы дерева: из памяти или потоком с диска"""
+        if self.complete:
+            return iter(self.files)
+        return (item for item in iter_tree(self.root) if not item.is_dir)
+
+    def iter_dirs_bottom_up(self):
+        """Выдает вложенные папки так, что каждая идет раньше своего родителя"""
+        if self.complete:
+            return iter(sorted(self.dirs, key=lambda entry: entry.depth, reverse=True))
+        return (item for item in iter_tree(self.root, bottom_up=True) if item.is_dir)
+
+    def file_paths(self):
+        """Выдает пути всех файлов дерева"""
+        return (entry.path for entry in self.iter_files())
+
+    def dirs_bottom_up(self):
+        """Возвращает вложенные папки так, что каждая идет раньше своего родителя"""
+        return list(self.iter_dirs_bottom_up())
+
+    def age(self):
+        """Возвращает возраст результата обхода в секундах"""
+        return time.monotonic() - self.created_at
+
+def scan_tree(root, progress_callback=None, with_size=None):
+    """
+    Обходит дерево папки за один проход через os.scandir
+
+    Тип элемента берется из d_type (а в Windows и размер - из данных FindFirstFile),
+    поэтому отдельные вызовы stat не нужны. Символические ссылки на папки
+    считаются файлами и не обходятся.
+
+    Args:
+        root: Корневая папка
+        progress_callback: Функция (найдено файлов, 0); возврат False отменяет обход
+        with_size: Собирать размеры файлов (по умолчанию только там, где это бесплатно - в Windows)
+
+    Returns:
+        TreeScan: Результат обхода, либо dict с ключом "error" при отмене
+    """
+    scan = TreeScan(root)
+
+    for item in iter_tree(root, with_size=with_size, onerror=scan.errors.append):
+        scan._add(item)
+        if progress_callback and not item.is_dir and scan.file_count % 1000 == 0:
+            if not progress_callback(scan.file_count, 0):
+                return {"error": "Операция отменена пользователем"}
+
+    logging.info(f"Обход {root}: {scan.file_count} файлов, {scan.dir_count} папок")
+    return scan
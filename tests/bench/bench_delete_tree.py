@@ -0,0 +1,95 @@
+"""
+Бенчмарк удаления дерева папок
+
+Сравниваются на синтетическом дереве (по умолчанию 500 000 файлов):
+- legacy:      удаление как в DeleteWorker до delete_tree: os.walk(topdown=False),
+               затем os.remove каждого файла и os.rmdir каждой папки по очереди;
+- delete_tree: параллельное удаление снизу вверх (delete_engine.delete_tree).
+
+Для каждого прогона дерево создается заново, создание в замер не входит.
+
+Запуск:
+    python tests/bench/bench_delete_tree.py [--files 500000] [--files-per-dir 1000] [--path DIR]
+"""
+import os
+import shutil
+import argparse
+import tempfile
+
+from common import timed, format_times, print_table
+
+from delete_engine import delete_tree, MAX_DELETE_WORKERS
+
+def create_tree(root, files, files_per_dir, fanout=20):
+    """Создает дерево из files пустых файлов: папки по files_per_dir файлов, по fanout папок в родителе"""
+    dir_count = max(1, -(-files // files_per_dir))
+    created = 0
+    for index in range(dir_count):
+        directory = os.path.join(root, f"group{index // fanout}", f"dir{index}")
+        os.makedirs(directory, exist_ok=True)
+        for _ in range(min(files_per_dir, files - created)):
+            open(os.path.join(directory, f"file{created}.dat"), "wb").close()
+            created += 1
+    return created
+
+def legacy_delete(path, progress_callback):
+    """Удаление до delete_tree (логика DeleteWorker.run, сигналы заменены колбэком)"""
+    files_to_delete = []
+    total_dirs = 0
+    for root, dirs, files in os.walk(path, topdown=False):
+        for file in files:
+            files_to_delete.append(os.path.join(root, file))
+        total_dirs += len(dirs)
+
+    total_items = len(files_to_delete) + total_dirs + 1
+    processed = 0
+    for file_path in files_to_delete:
+        os.remove(file_path)
+        processed += 1
+        progress_callback(processed, total_items)
+
+    for root, dirs, files in os.walk(path, topdown=False):
+        for dir_name in dirs:
+            os.rmdir(os.path.join(root, dir_name))
+            processed += 1
+            progress_callback(processed, total_items)
+
+    os.rmdir(path)
+    return {"success": True, "deleted_files": len(files_to_delete), "deleted_dirs": total_dirs + 1}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--files", type=int, default=500_000, help="Файлов в дереве")
+    parser.add_argument("--files-per-dir", type=int, default=1000, help="Файлов в каждой папке")
+    parser.add_argument("--workers", type=int, default=MAX_DELETE_WORKERS, help="Потоков delete_tree")
+    parser.add_argument("--repeat", type=int, default=1, help="Число повторов")
+    parser.add_argument("--path", help="Где создавать дерево (например, на другом диске)")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="bench_delete_", dir=args.path)
+    root = os.path.join(work_dir, "tree")
+    try:
+        def setup():
+            create_tree(root, args.files, args.files_per_dir)
+
+        def progress(done, total):
+            return True
+
+        print(f"Дерево: {args.files} файлов по {args.files_per_dir} в папке, {os.cpu_count()} CPU, "
+              f"потоков delete_tree: {args.workers}")
+        rows = []
+        cases = [
+            ("legacy", lambda: legacy_delete(root, progress)),
+            ("delete_tree", lambda: delete_tree(root, progress, max_workers=args.workers)),
+        ]
+        for name, func in cases:
+            result, times = timed(func, args.repeat, setup)
+            assert result.get("success") and not os.path.exists(root), (name, result)
+            rows.append([name, result["deleted_files"], format_times(times),
+                         f"{result['deleted_files'] / min(times):,.0f}"])
+        print_table(["method", "files", "time", "files/s"], rows)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
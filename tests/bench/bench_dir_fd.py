@@ -0,0 +1,164 @@
+"""
+Бенчмарк удаления относительно дескриптора папки (dir_fd) и по полным путям
+
+Дерево похоже на node_modules: цепочки вложенных пакетов глубиной --depth,
+в каждом пакете --files файлов. Сравниваются два режима delete_tree:
+- path:   os.scandir(путь) и os.remove(полный путь) для каждого файла;
+- dir_fd: папка открывается один раз относительно родительской, файлы и
+          вложенные папки удаляются по имени: os.unlink/os.rmdir(имя, dir_fd=fd).
+
+Число системных вызовов считается по событиям аудита Python (sys.addaudithook):
+каждый вызов os.remove/os.unlink/os.rmdir/os.scandir/open - это один вызов ядра
+(unlink/unlinkat, rmdir, openat). Вместе с вызовами считается, сколько
+компонентов пути ядру пришлось разобрать. Если установлен strace, каждый
+режим дополнительно запускается под strace -c -f и печатаются счетчики ядра.
+
+Запуск (Linux):
+    python tests/bench/bench_dir_fd.py [--packages 200] [--depth 12] [--files 10] [--repeat 4]
+"""
+import os
+import re
+import sys
+import shutil
+import argparse
+import tempfile
+import subprocess
+from collections import Counter
+
+from common import timed, format_times, print_table
+
+import delete_engine
+from delete_engine import delete_tree
+
+MODES = {
+    # Своя функция удаления отключает режим dir_fd
+    "path": lambda root: delete_tree(root, remove_file=os.remove),
+    "dir_fd": lambda root: delete_tree(root),
+}
+
+# Вызовы ядра, которые считаются под strace
+STRACE_CALLS = "unlink,unlinkat,rmdir,openat,open,getdents64,close,newfstatat,statx,lstat,stat"
+
+def create_tree(root, packages, depth, files):
+    """Создает цепочки node_modules/pkgN/node_modules/pkgN/... с files файлами на каждом уровне"""
+    file_count = 0
+    for package in range(packages):
+        directory = root
+        for level in range(depth):
+            directory = os.path.join(directory, "node_modules", f"pkg{package}_{level}")
+            os.makedirs(directory, exist_ok=True)
+            for index in range(files):
+                open(os.path.join(directory, f"module{index}.js"), "wb").close()
+                file_count += 1
+    return file_count
+
+class SyscallCounter:
+    """Считает файловые вызовы os по событиям аудита и разобранные компоненты путей"""
+
+    EVENTS = {"os.remove": "unlink", "os.rmdir": "rmdir", "os.scandir": "scandir", "open": "open"}
+
+    def __init__(self):
+        self.calls = Counter()
+        self.components = 0
+        self.active = False
+        sys.addaudithook(self._hook)
+
+    def _hook(self, event, args):
+        if not self.active or event not in self.EVENTS:
+            return
+        name = self.EVENTS[event]
+        path = args[0]
+        if event == "os.remove" and args[1] not in (None, -1):
+            name = "unlinkat"
+        elif event == "os.rmdir" and args[1] not in (None, -1):
+            name = "rmdirat"  # unlinkat(..., AT_REMOVEDIR)
+        elif event == "open" and isinstance(path, (str, bytes)) and not os.path.isabs(path):
+            name = "openat"
+        self.calls[name] += 1
+        if isinstance(path, (str, bytes)):
+            # Относительно дескриптора разбирается только имя; от корня - весь путь
+            self.components += len([part for part in os.fsdecode(path).split(os.sep) if part])
+
+    def measure(self, func):
+        self.calls.clear()
+        self.components = 0
+        self.active = True
+        try:
+            func()
+        finally:
+            self.active = False
+        return dict(self.calls), self.components
+
+def strace_counts(mode, root):
+    """Запускает режим под strace -c -f и возвращает {вызов: число}"""
+    summary_file = root + ".strace"
+    subprocess.run(["strace", "-f", "-c", "-o", summary_file, "-e", f"trace={STRACE_CALLS}",
+                    sys.executable, os.path.abspath(__file__), "--worker", mode, root], check=True)
+    counts = {}
+    with open(summary_file, encoding="utf-8") as f:
+        for line in f:
+            # % time  seconds  usecs/call  calls  [errors]  syscall
+            match = re.match(r"\s*[\d.]+\s+[\d.]+\s+\d+\s+(\d+)\s+(?:\d+\s+)?(\w+)\s*$", line)
+            if match:
+                counts[match.group(2)] = int(match.group(1))
+    os.remove(summary_file)
+    return counts
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--packages", type=int, default=200, help="Цепочек пакетов")
+    parser.add_argument("--depth", type=int, default=12, help="Глубина вложенности node_modules")
+    parser.add_argument("--files", type=int, default=10, help="Файлов в каждом пакете")
+    parser.add_argument("--repeat", type=int, default=4, help="Число повторов замера времени")
+    parser.add_argument("--path", help="Где создавать дерево (например, на другом диске)")
+    parser.add_argument("--worker", nargs=2, metavar=("MODE", "ROOT"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        # Запуск под strace: только удаление уже созданного дерева
+        mode, root = args.worker
+        sys.exit(0 if MODES[mode](root).get("success") else 1)
+
+    if not delete_engine.DIR_FD_SUPPORTED:
+        print("dir_fd не поддерживается в этой системе, сравнивать нечего")
+        return
+
+    work_dir = tempfile.mkdtemp(prefix="bench_dir_fd_", dir=args.path)
+    root = os.path.join(work_dir, "project")
+    try:
+        def setup():
+            return create_tree(root, args.packages, args.depth, args.files)
+
+        file_count = setup()
+        shutil.rmtree(root)
+        sample = os.path.join(root, *["node_modules", "pkg0_0"] * args.depth, "module0.js")
+        print(f"Дерево: {file_count} файлов, {args.packages * args.depth} папок пакетов, "
+              f"{len(sample.split(os.sep)) - 1} компонентов в пути самого глубокого файла")
+
+        rows = []
+        for mode, func in MODES.items():
+            _, times = timed(lambda: func(root), args.repeat, setup)
+            rows.append([mode, format_times(times)])
+
+        counter = SyscallCounter()
+        for row, (mode, func) in zip(rows, MODES.items()):
+            setup()
+            calls, components = counter.measure(lambda: func(root))
+            row[1:1] = [", ".join(f"{name} {count}" for name, count in sorted(calls.items())),
+                        f"{components:,}"]
+
+        strace = shutil.which("strace")
+        if strace:
+            for row, mode in zip(rows, MODES):
+                setup()
+                counts = strace_counts(mode, root)
+                row.append(", ".join(f"{name} {count}" for name, count in sorted(counts.items())))
+        print_table(["mode", "os calls", "path components", "time"]
+                    + (["strace -c"] if strace else []), rows)
+        if not strace:
+            print("strace не найден: счетчики вызовов получены по событиям аудита Python")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
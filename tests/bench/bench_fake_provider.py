@@ -0,0 +1,99 @@
+"""
+Бенчмарк анализа и ожидания освобождения через FakeLockProvider
+
+Источник блокировок в памяти содержит --handles дескрипторов (по умолчанию
+два миллиона), из них --locked - файлы анализируемой папки, и отвечает
+с задержкой --latency на каждый запрос (как запуск handle.exe).
+Замеряются:
+- get_blocking_processes для папки в режимах exact (как /proc) и snapshot
+  (как handle.exe: один снимок на всю систему);
+- get_blocking_processes для одного файла;
+- wait_for_unlock, когда владелец файла завершается через --exit-delay секунд.
+
+Запуск:
+    python tests/bench/bench_fake_provider.py [--handles 2000000] [--locked 1000] [--latency 0.5]
+"""
+import os
+import time
+import shutil
+import argparse
+import tempfile
+import threading
+import subprocess
+
+from common import timed, format_times, print_table
+
+import file_handler
+from lock_providers import FakeLockProvider
+
+def make_provider(root, args, exact):
+    provider = FakeLockProvider(latency=args.latency, exact=exact)
+    provider.generate(os.path.join(os.path.dirname(root), "other"), args.handles - args.locked)
+    provider.generate(root, args.locked)
+    return provider
+
+def measure_wait(root, provider, args):
+    """wait_for_unlock для файла, который держит процесс, завершающийся через exit_delay"""
+    path = os.path.join(root, "held.db")
+    open(path, "wb").close()
+    holder = subprocess.Popen(["sleep", "60"])
+    provider.add(path, holder.pid, "sleep")
+    check = file_handler.check_file_locked_windows_api
+    # В Linux открытие файла не показывает блокировку - она длится, пока жив владелец
+    file_handler.check_file_locked_windows_api = lambda file_path: holder.poll() is None
+    killer = threading.Timer(args.exit_delay, holder.kill)
+    try:
+        started = time.perf_counter()
+        killer.start()
+        released = file_handler.wait_for_unlock(root, locked_paths={path}, timeout=30)
+        return released, time.perf_counter() - started
+    finally:
+        killer.cancel()
+        holder.kill()
+        holder.wait()
+        file_handler.check_file_locked_windows_api = check
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--handles", type=int, default=2_000_000, help="Дескрипторов в источнике")
+    parser.add_argument("--locked", type=int, default=1000, help="Из них - файлов анализируемой папки")
+    parser.add_argument("--latency", type=float, default=0.5, help="Задержка запроса к источнику, сек")
+    parser.add_argument("--exit-delay", type=float, default=1.0, help="Через сколько завершается владелец")
+    parser.add_argument("--repeat", type=int, default=3, help="Число повторов")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="bench_fake_provider_")
+    root = os.path.join(work_dir, "project")
+    os.mkdir(root)
+    try:
+        rows = []
+        for mode, exact in (("exact", True), ("snapshot", False)):
+            provider = make_provider(root, args, exact)
+            file_handler.set_lock_provider(provider)
+            result, times = timed(lambda: file_handler.get_blocking_processes(root, use_cache=False),
+                                  args.repeat)
+            rows.append([f"folder ({mode})", len(result), sum(provider.calls.values()) // args.repeat,
+                         format_times(times)])
+
+        single = os.path.join(root, "single.db")
+        open(single, "wb").close()
+        provider.add(single, 4242, "app.exe")
+        result, times = timed(lambda: file_handler.get_blocking_processes(single, use_cache=False),
+                              args.repeat)
+        rows.append(["file", len(result), 1, format_times(times)])
+        print(f"Источник: {len(provider.records):,} дескрипторов, задержка запроса {args.latency} s")
+        print_table(["query", "found", "provider calls", "time"], rows)
+
+        if shutil.which("sleep"):
+            provider.calls = dict.fromkeys(provider.calls, 0)
+            file_handler.try_alternative_unlock = lambda file_path: False
+            released, elapsed = measure_wait(root, provider, args)
+            print(f"\nwait_for_unlock: {'освобожден' if released else 'не освобожден'} за {elapsed:.3f} s "
+                  f"(владелец завершен через {args.exit_delay} s, "
+                  f"запросов к источнику: {provider.calls['query_paths']})")
+    finally:
+        file_handler.set_lock_provider(None)
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
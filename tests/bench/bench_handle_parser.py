@@ -0,0 +1,135 @@
+"""
+Микро-бенчмарк разбора вывода handle.exe
+
+На синтетическом выводе в несколько мегабайт сравниваются:
+- legacy:   декодирование всего вывода с перебором кодировок и разбор строк
+            через split("pid:") / split("type:"), как было до iter_handle_records;
+- filtered: iter_handle_records на выводе с фильтром (строка на дескриптор);
+- snapshot: iter_handle_records на полном снимке (секции по процессам);
+- csv:      потоковый разбор CSV-вывода (-v), которым пользуется query_handle_tool.
+
+Часть путей содержит кириллицу в cp1251, поэтому legacy-разбор, как и
+на русской Windows, перебирает кодировки.
+
+Запуск:
+    python tests/bench/bench_handle_parser.py [--handles 100000] [--repeat 5]
+"""
+import locale
+import argparse
+
+from common import timed, format_times, print_table
+
+import handle_tool
+from handle_tool import iter_handle_records
+
+def make_filtered_output(handles, non_ascii_every, process_count=100):
+    """Вывод handle.exe с фильтром: chrome.exe   pid: 1234   type: File   1A4: C:\\path"""
+    lines = []
+    for index in range(handles):
+        pid = 1000 + index % process_count
+        folder = "Документы" if non_ascii_every and index % non_ascii_every == 0 else "Documents"
+        lines.append(f"proc{pid}.exe        pid: {pid}   type: File          {index:X}: "
+                     f"C:\\Users\\user\\{folder}\\project{index % 50}\\file{index}.dat")
+    return "\r\n".join(lines).encode("cp1251") + b"\r\n"
+
+def make_snapshot_output(handles, non_ascii_every, process_count=100):
+    """Полный снимок handle.exe: заголовок секции процесса и строки дескрипторов"""
+    per_process = max(1, handles // process_count)
+    lines = []
+    for index in range(handles):
+        if index % per_process == 0:
+            lines.append("-" * 78)
+            pid = 1000 + index // per_process
+            lines.append(f"proc{pid}.exe pid: {pid} HOST\\user")
+        folder = "Документы" if non_ascii_every and index % non_ascii_every == 0 else "Documents"
+        lines.append(f"  {index:X}: File  (RW-)   C:\\Users\\user\\{folder}\\project{index % 50}\\file{index}.dat")
+    return "\r\n".join(lines).encode("cp1251") + b"\r\n"
+
+def make_csv_output(handles, non_ascii_every, process_count=100):
+    """CSV-вывод handle.exe -v с теми же дескрипторами"""
+    lines = ["Process,PID,User,Handle,Type,Share Flags,Name,Access"]
+    for index in range(handles):
+        pid = 1000 + index % process_count
+        folder = "Документы" if non_ascii_every and index % non_ascii_every == 0 else "Documents"
+        lines.append(f"proc{pid}.exe,{pid},HOST\\user,0x{index:08X},File,RW-,"
+                     f"C:\\Users\\user\\{folder}\\project{index % 50}\\file{index}.dat,0x0012019F")
+    return "\r\n".join(lines).encode("cp1251") + b"\r\n"
+
+def parse_csv(output):
+    """Разбор CSV так же, как в query_handle_tool: построчное декодирование и csv.reader"""
+    handle_tool._handle_encodings.pop("bench", None)
+    lines = handle_tool._iter_handle_lines("bench", output.splitlines(keepends=True))
+    return list(handle_tool._parse_handle_csv(lines))
+
+def legacy_parse(raw, path="C:\\Users\\user"):
+    """Разбор вывода до iter_handle_records (перенесен без изменений логики)"""
+    for encoding in [locale.getpreferredencoding(), 'utf-8', 'cp1251', 'cp866', 'latin-1']:
+        try:
+            output = raw.decode(encoding)
+            break
+        except UnicodeDecodeError:
+            continue
+    else:
+        output = raw.decode('latin-1')
+
+    blocking_processes = []
+    for line in output.splitlines():
+        if "pid:" in line and "type:" in line and "File" in line:
+            parts = line.split("pid:")
+            if len(parts) < 2:
+                continue
+            process_name = parts[0].strip()
+            pid_parts = parts[1].split("type:")
+            if len(pid_parts) < 2:
+                continue
+            try:
+                pid = int(pid_parts[0].strip())
+            except ValueError:
+                continue
+            colon_index = parts[1].find(":", parts[1].find("type:"))
+            if colon_index != -1:
+                file_path = parts[1][colon_index + 1:].strip()
+            else:
+                file_path = path
+            if pid > 0:
+                blocking_processes.append({
+                    "process_name": process_name,
+                    "pid": pid,
+                    "handle_type": "File",
+                    "file_path": file_path
+                })
+    return blocking_processes
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--handles", type=int, default=100_000, help="Дескрипторов в выводе")
+    parser.add_argument("--non-ascii-every", type=int, default=10,
+                        help="Каждый N-й путь с кириллицей (0 - только ASCII)")
+    parser.add_argument("--repeat", type=int, default=5, help="Число повторов")
+    args = parser.parse_args()
+
+    filtered = make_filtered_output(args.handles, args.non_ascii_every)
+    snapshot = make_snapshot_output(args.handles, args.non_ascii_every)
+    csv_output = make_csv_output(args.handles, args.non_ascii_every)
+
+    cases = [
+        ("legacy (filtered)", filtered, lambda: legacy_parse(filtered)),
+        ("filtered", filtered, lambda: list(iter_handle_records(filtered))),
+        ("snapshot", snapshot, lambda: list(iter_handle_records(snapshot))),
+        ("csv", csv_output, lambda: parse_csv(csv_output)),
+    ]
+    rows = []
+    for name, output, func in cases:
+        records, times = timed(func, args.repeat)
+        assert len(records) == args.handles, (name, len(records))
+        rows.append([name, f"{len(output) / 1024 / 1024:.1f} MB", len(records), format_times(times)])
+
+    # Legacy-разбор оставлял в пути тип и номер дескриптора ("File  1A4: C:\\..."),
+    # новый извлекает только сам путь
+    legacy_paths = [record["file_path"].split(": ", 1)[1] for record in legacy_parse(filtered)[:100]]
+    assert legacy_paths == [record["file_path"] for record in list(iter_handle_records(filtered))[:100]]
+
+    print_table(["parser", "output", "records", "time"], rows)
+
+if __name__ == "__main__":
+    main()
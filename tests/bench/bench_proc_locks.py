@@ -0,0 +1,101 @@
+"""
+Бенчмарк снимка открытых файлов через /proc (proc_locks)
+
+Строит синтетическое дерево в формате /proc: --processes каталогов процессов,
+в каждом comm, fd/ с --fds символическими ссылками, maps с --libs
+отображенными библиотеками (по 5 строк на библиотеку, как у настоящих
+процессов) и ссылка cwd. Несколько процессов держат файлы анализируемой папки.
+Замеряются take_proc_snapshot и ProcLockProvider.query_subtree по этому дереву
+и сравниваются с целью --target (по умолчанию 200 мс для 2k процессов).
+С --live дополнительно замеряется снимок настоящего /proc.
+
+Запуск (Linux):
+    python tests/bench/bench_proc_locks.py [--processes 2000] [--fds 24] [--libs 40] [--repeat 7]
+"""
+import os
+import shutil
+import argparse
+import tempfile
+
+from common import timed, format_times, print_table
+
+import proc_locks
+from lock_providers import ProcLockProvider
+
+# Строки одной библиотеки в maps: сегменты кода, данных и т.д.
+MAPS_SEGMENTS = ("r--p", "r-xp", "r--p", "r--p", "rw-p")
+
+def create_proc_tree(proc_root, target_dir, processes, fds, libs, holders):
+    """Создает каталоги процессов; первые holders процессов держат файлы target_dir"""
+    os.makedirs(os.path.join(proc_root, "self", "fd"))
+    maps_lines = []
+    address = 0x7f0000000000
+    for lib in range(libs):
+        lib_path = f"/usr/lib/x86_64-linux-gnu/libbench{lib}.so.1"
+        for offset, perms in enumerate(MAPS_SEGMENTS):
+            maps_lines.append(f"{address:012x}-{address + 0x1000:012x} {perms} {offset * 0x1000:08x} "
+                              f"08:01 {100000 + lib} {' ' * 24}{lib_path}")
+            address += 0x1000
+    maps_lines.append(f"{address:012x}-{address + 0x21000:012x} rw-p 00000000 00:00 0 {' ' * 24}[heap]")
+    maps = ("\n".join(maps_lines) + "\n").encode()
+
+    for pid in range(1000, 1000 + processes):
+        base = os.path.join(proc_root, str(pid))
+        os.makedirs(os.path.join(base, "fd"))
+        with open(os.path.join(base, "comm"), "w", encoding="utf-8") as f:
+            f.write(f"worker{pid % 50}\n")
+        with open(os.path.join(base, "maps"), "wb") as f:
+            f.write(maps)
+        for fd in range(fds):
+            if fd < 3:
+                target = "/dev/null"
+            elif fd % 4 == 0:
+                target = f"socket:[{pid * 100 + fd}]"
+            else:
+                target = f"/var/lib/service{pid % 10}/data{fd}.db"
+            os.symlink(target, os.path.join(base, "fd", str(fd)))
+        if pid - 1000 < holders:
+            os.symlink(os.path.join(target_dir, f"held{pid}.dat"), os.path.join(base, "fd", str(fds)))
+        os.symlink(target_dir if pid - 1000 < holders else "/", os.path.join(base, "cwd"))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--processes", type=int, default=2000, help="Процессов в синтетическом /proc")
+    parser.add_argument("--fds", type=int, default=24, help="Открытых дескрипторов у процесса")
+    parser.add_argument("--libs", type=int, default=40, help="Отображенных библиотек у процесса")
+    parser.add_argument("--holders", type=int, default=5, help="Процессов, держащих файлы папки")
+    parser.add_argument("--target", type=float, default=0.2, help="Цель по времени, секунды")
+    parser.add_argument("--repeat", type=int, default=7, help="Число повторов")
+    parser.add_argument("--live", action="store_true", help="Замерить и настоящий /proc")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="bench_proc_locks_")
+    proc_root = os.path.join(work_dir, "proc")
+    target_dir = os.path.realpath(os.path.join(work_dir, "project"))
+    os.makedirs(target_dir)
+    try:
+        create_proc_tree(proc_root, target_dir, args.processes, args.fds, args.libs, args.holders)
+        provider = ProcLockProvider(proc_root)
+
+        rows = []
+        lock_index, times = timed(lambda: proc_locks.take_proc_snapshot(proc_root), args.repeat)
+        rows.append(["snapshot (synthetic)", args.processes, len(lock_index), "",
+                     format_times(times), "да" if min(times) <= args.target else "нет"])
+        found, times = timed(lambda: provider.query_subtree(target_dir), args.repeat)
+        rows.append(["query_subtree (synthetic)", args.processes, "", len(found),
+                     format_times(times), "да" if min(times) <= args.target else "нет"])
+
+        if args.live and proc_locks.is_available():
+            live_count = sum(1 for name in os.listdir(proc_locks.PROC_ROOT) if name.isdigit())
+            lock_index, times = timed(proc_locks.take_proc_snapshot, args.repeat)
+            rows.append(["snapshot (/proc)", live_count, len(lock_index), "",
+                         format_times(times), "да" if min(times) <= args.target else "нет"])
+
+        print(f"Синтетический /proc: {args.fds} дескрипторов и {args.libs} библиотек на процесс, "
+              f"цель {args.target * 1000:.0f} мс")
+        print_table(["query", "processes", "paths", "found", "time", "в пределах цели"], rows)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
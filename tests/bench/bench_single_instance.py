@@ -0,0 +1,121 @@
+"""
+Бенчмарк задержки повторного запуска программы (single_instance)
+
+Основной экземпляр (InstanceServer) работает в этом процессе, повторные
+запуски - отдельные процессы Python, которые импортируют single_instance,
+передают путь и завершаются, как main.py до импорта PyQt. Замеряются:
+- launch: время жизни повторного запуска от старта процесса до выхода;
+- batch:  время от старта первого запуска пачки до передачи пачки обработчику;
+- own:    передача собственных путей основного экземпляра (submit) обработчику.
+Замер повторяется с --silent клиентами, которые подключились и молчат
+посреди рукопожатия: они не должны задерживать следующие запуски.
+
+Запуск (канал - Unix-сокет, в Windows именованный канал):
+    python tests/bench/bench_single_instance.py [--launches 8] [--silent 3] [--repeat 5]
+"""
+import os
+import sys
+import time
+import shutil
+import socket
+import argparse
+import tempfile
+import threading
+import statistics
+import subprocess
+
+from common import SRC_DIR, print_table
+
+from single_instance import InstanceServer, forward_to_running_instance
+
+LAUNCH_CODE = """
+import sys
+sys.path.insert(0, sys.argv[1])
+from single_instance import forward_to_running_instance
+sys.exit(0 if forward_to_running_instance([sys.argv[4]], sys.argv[2], bytes.fromhex(sys.argv[3])) else 1)
+"""
+
+KEY = os.urandom(32)
+
+def run_launches(server, batches, count, work_dir):
+    """Запускает count повторных запусков одновременно; возвращает их времена и задержку пачки"""
+    batches.clear()
+    received = threading.Event()
+    server.set_handler(lambda paths: (batches.append((time.perf_counter(), paths)), received.set()))
+    started = time.perf_counter()
+    processes = []
+    for index in range(count):
+        processes.append((time.perf_counter(), subprocess.Popen(
+            [sys.executable, "-c", LAUNCH_CODE, SRC_DIR, server.address, KEY.hex(),
+             os.path.join(work_dir, f"file{index}.txt")])))
+    launch_times = []
+    for launched_at, process in processes:
+        if process.wait() != 0:
+            raise RuntimeError("Повторный запуск не передал путь")
+        launch_times.append(time.perf_counter() - launched_at)
+    # Ждем, пока все пути дойдут до обработчика
+    while sum(len(paths) for _, paths in batches) < count:
+        received.wait(5)
+        received.clear()
+    return launch_times, batches[-1][0] - started, len(batches)
+
+def measure_own(server, repeat):
+    times = []
+    for index in range(repeat):
+        delivered = []
+        server.set_handler(lambda paths: delivered.append(time.perf_counter()))
+        started = time.perf_counter()
+        server.submit([f"own{index}.txt"])
+        times.append(delivered[0] - started)
+    return times
+
+def format_ms(times):
+    return f"min {min(times) * 1000:.1f} ms, median {statistics.median(times) * 1000:.1f} ms"
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--launches", type=int, default=8, help="Одновременных повторных запусков")
+    parser.add_argument("--silent", type=int, default=3, help="Молчащих клиентов во втором замере")
+    parser.add_argument("--repeat", type=int, default=5, help="Число повторов")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="bench_single_instance_")
+    address = (rf"\\.\pipe\bench_single_instance_{os.getpid()}" if os.name == "nt"
+               else os.path.join(work_dir, "instance.sock"))
+    server = InstanceServer(address=address, key=KEY)
+    silent = []
+    try:
+        if not server.listen():
+            print(f"Не удалось открыть канал {address}")
+            return
+        batches = []
+        # Прогрев: первый запуск интерпретатора читает модули с диска
+        run_launches(server, batches, 1, work_dir)
+
+        rows = []
+        for label, silent_count in (("no silent clients", 0), (f"{args.silent} silent clients", args.silent)):
+            for _ in range(silent_count - len(silent)):
+                if os.name == "nt":
+                    break
+                client = socket.socket(socket.AF_UNIX)
+                client.connect(address)
+                silent.append(client)
+            launch_times, batch_times, batch_counts = [], [], []
+            for _ in range(args.repeat):
+                times, batch_time, batch_count = run_launches(server, batches, args.launches, work_dir)
+                launch_times.extend(times)
+                batch_times.append(batch_time)
+                batch_counts.append(batch_count)
+            rows.append([label, format_ms(launch_times), format_ms(batch_times), max(batch_counts)])
+        print(f"{args.launches} одновременных запусков, окно объединения {server.coalesce_interval} s")
+        print_table(["channel", "launch", "batch delivered", "batches"], rows)
+
+        print(f"\nown (submit -> обработчик): {format_ms(measure_own(server, args.repeat))}")
+    finally:
+        for client in silent:
+            client.close()
+        server.close()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Бенчмарк режима снимка дескрипторов (один запуск handle.exe на всю папку)
+
+Заглушка handle.exe выводит сгенерированный CSV на --lines строк: дескрипторы
+посторонних файлов и --files заблокированных файлов анализируемой папки.
+Сравниваются:
+- snapshot: один запуск без фильтра и ответ по индексу (take_handle_snapshot);
+- batched:  запросы по общим папкам (query_handle_batched, не больше 16 запусков);
+- per-file: запуск на каждый заблокированный файл (run_handle_queries),
+            как до появления режима снимка.
+
+Запуск:
+    python tests/bench/bench_snapshot.py [--lines 100000] [--files 200]
+"""
+import os
+import shutil
+import argparse
+import tempfile
+
+from common import timed, format_times, print_table
+
+import handle_stub
+from handle_tool import take_handle_snapshot, query_handle_batched, run_handle_queries
+from file_handler import check_directory_snapshot
+
+CSV_HEADER = "Process,PID,User,Handle,Type,Share Flags,Name,Access"
+
+def write_snapshot(output_file, root, lines, locked_files, process_count=100):
+    """Записывает вывод handle.exe -v: сначала файлы папки, затем посторонние дескрипторы"""
+    with open(output_file, "w", encoding="utf-8", newline="") as f:
+        f.write(CSV_HEADER + "\r\n")
+        for index, file_path in enumerate(locked_files):
+            f.write(f"app{index % 7}.exe,{2000 + index % 7},HOST\\user,0x{index:08X},File,RW-,"
+                    f"{file_path},0x0012019F\r\n")
+        for index in range(lines - len(locked_files)):
+            pid = 4000 + index % process_count
+            handle_type = "File" if index % 4 else "Key"
+            f.write(f"svc{pid}.exe,{pid},HOST\\user,0x{index:08X},{handle_type},RW-,"
+                    f"/var/lib/service{pid % 10}/data/segment{index}.db,0x0012019F\r\n")
+
+def create_tree(root, locked_count, files_per_dir=50):
+    """Создает папку с locked_count файлами, разложенными по подпапкам"""
+    files = []
+    for index in range(locked_count):
+        directory = os.path.join(root, f"dir{index // files_per_dir}")
+        os.makedirs(directory, exist_ok=True)
+        file_path = os.path.join(directory, f"file{index}.dat")
+        open(file_path, "wb").close()
+        files.append(file_path)
+    return files
+
+def count_calls(log_file):
+    if not os.path.exists(log_file):
+        return 0
+    with open(log_file, encoding="utf-8") as f:
+        return sum(1 for _ in f)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--lines", type=int, default=100_000, help="Строк в выводе handle.exe")
+    parser.add_argument("--files", type=int, default=200, help="Заблокированных файлов в папке")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="bench_snapshot_")
+    try:
+        root = os.path.join(work_dir, "tree")
+        locked_files = create_tree(root, args.files)
+        output_file = os.path.join(work_dir, "handle_v.csv")
+        write_snapshot(output_file, root, args.lines, locked_files)
+        size_mb = os.path.getsize(output_file) / 1024 / 1024
+
+        handle_exe = handle_stub.install(work_dir)
+        log_file = os.path.join(work_dir, "calls.log")
+        os.environ["HANDLE_STUB_FIXTURE"] = output_file
+        os.environ["HANDLE_STUB_LOG"] = log_file
+
+        def snapshot():
+            return check_directory_snapshot(root, take_handle_snapshot(handle_exe))
+
+        def batched():
+            holders = query_handle_batched(handle_exe, locked_files, root=root)
+            return [record for records in holders.values() for record in records]
+
+        def per_file():
+            return run_handle_queries(handle_exe, locked_files)
+
+        print(f"Вывод handle.exe: {args.lines} строк ({size_mb:.1f} MB), "
+              f"заблокировано файлов в папке: {args.files}")
+        rows = []
+        for name, func in [("snapshot", snapshot), ("batched", batched), ("per-file", per_file)]:
+            if os.path.exists(log_file):
+                os.remove(log_file)
+            records, times = timed(func)
+            found = len({record["file_path"] for record in records})
+            rows.append([name, count_calls(log_file), format_times(times), found])
+        print_table(["mode", "processes", "time", "files found"], rows)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
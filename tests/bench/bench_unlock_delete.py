@@ -0,0 +1,73 @@
+"""
+Бенчмарк ожидания освобождения перед удалением в unlock_and_delete_file
+
+Папка из --files файлов, по результатам анализа заблокированы --locked из них
+(удерживавшие их процессы уже завершены). Сравнивается шаг 2 unlock_and_delete_file:
+- scan:        обход всего дерева (scan_tree) и затем wait_for_unlock по известным
+               файлам - как было, когда дерево обходилось в любом случае;
+- locked only: wait_for_unlock только по известным заблокированным файлам, без обхода.
+Отдельно замеряется unlock_and_delete_file целиком (с удалением папки).
+
+Запуск:
+    python tests/bench/bench_unlock_delete.py [--files 100000] [--locked 3] [--repeat 3]
+"""
+import os
+import shutil
+import argparse
+import tempfile
+
+from common import timed, format_times, print_table
+
+from tree_walker import scan_tree
+from file_handler import wait_for_unlock, unlock_and_delete_file
+
+def create_tree(root, files, files_per_dir=1000):
+    """Создает files пустых файлов по files_per_dir в папке и возвращает их пути"""
+    paths = []
+    for index in range(files):
+        directory = os.path.join(root, f"dir{index // files_per_dir}")
+        if index % files_per_dir == 0:
+            os.makedirs(directory, exist_ok=True)
+        file_path = os.path.join(directory, f"file{index}.dat")
+        open(file_path, "wb").close()
+        paths.append(file_path)
+    return paths
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--files", type=int, default=100_000, help="Файлов в папке")
+    parser.add_argument("--locked", type=int, default=3, help="Заблокированных файлов по анализу")
+    parser.add_argument("--repeat", type=int, default=3, help="Число повторов")
+    parser.add_argument("--path", help="Где создавать дерево (например, на другом диске)")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="bench_unlock_delete_", dir=args.path)
+    root = os.path.join(work_dir, "project")
+    try:
+        paths = create_tree(root, args.files)
+        step = max(1, len(paths) // args.locked)
+        locked_paths = set(paths[::step][:args.locked])
+        print(f"Папка: {len(paths)} файлов, заблокировано по анализу: {len(locked_paths)}")
+
+        modes = {
+            "scan": lambda: wait_for_unlock(root, scan_tree(root), locked_paths=locked_paths),
+            "locked only": lambda: wait_for_unlock(root, None, locked_paths=locked_paths),
+        }
+        rows = []
+        for mode, func in modes.items():
+            released, times = timed(func, args.repeat)
+            rows.append([mode, released, format_times(times)])
+        print_table(["step 2", "released", "time"], rows)
+
+        # Процессы из анализа; PID заведомо не существует - процесс уже завершен
+        processes = [{"process_name": "app.exe", "pid": 999999999, "handle_type": "File",
+                      "file_path": file_path} for file_path in sorted(locked_paths)]
+        result, times = timed(lambda: unlock_and_delete_file(root, processes), args.repeat,
+                              lambda: os.path.isdir(root) or create_tree(root, args.files))
+        print(f"\nunlock_and_delete_file целиком (с удалением): {format_times(times)}, "
+              f"{'успешно' if 'success' in result else result.get('error')}")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
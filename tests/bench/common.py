@@ -0,0 +1,62 @@
+"""
+Общие функции бенчмарков
+
+Бенчмарки запускаются отдельно от тестов, например:
+    python tests/bench/bench_snapshot.py
+"""
+import os
+import sys
+import time
+import statistics
+import subprocess
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+TESTS_DIR = os.path.dirname(BENCH_DIR)
+SRC_DIR = os.path.join(os.path.dirname(TESTS_DIR), "src")
+FIXTURES_DIR = os.path.join(TESTS_DIR, "fixtures")
+
+# Модули программы и заглушка handle.exe импортируются по именам, как в тестах
+for path in (SRC_DIR, FIXTURES_DIR, TESTS_DIR):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+# Флаг запуска без окна есть только в Windows; в остальных системах он не нужен
+if not hasattr(subprocess, "CREATE_NO_WINDOW"):
+    subprocess.CREATE_NO_WINDOW = 0
+
+def timed(func, repeat=1, setup=None):
+    """
+    Замеряет время выполнения func
+
+    Args:
+        func: Замеряемая функция
+        repeat: Число повторов
+        setup: Функция, вызываемая перед каждым повтором (не входит в замер)
+
+    Returns:
+        tuple: (результат последнего вызова, список времен в секундах)
+    """
+    times = []
+    result = None
+    for _ in range(repeat):
+        if setup:
+            setup()
+        started = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - started)
+    return result, times
+
+def format_times(times):
+    """Минимум и медиана замеров"""
+    if len(times) == 1:
+        return f"{times[0]:.3f} s"
+    return f"min {min(times):.3f} s, median {statistics.median(times):.3f} s"
+
+def print_table(header, rows):
+    """Печатает результаты таблицей с выровненными столбцами"""
+    rows = [[str(cell) for cell in row] for row in [header] + rows]
+    widths = [max(len(row[col]) for row in rows) for col in range(len(header))]
+    for index, row in enumerate(rows):
+        print("  ".join(cell.ljust(width) for cell, width in zip(row, widths)).rstrip())
+        if index == 0:
+            print("  ".join("-" * width for width in widths))
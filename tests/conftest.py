@@ -0,0 +1,68 @@
+import os
+import sys
+import subprocess
+
+import pytest
+
+# Модули программы лежат в src и импортируются по именам, как в PyInstaller-сборке
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+if SRC_DIR not in sys.path:
+    sys.path.insert(0, SRC_DIR)
+
+# Флаг запуска без окна есть только в Windows; в остальных системах он не нужен
+if not hasattr(subprocess, "CREATE_NO_WINDOW"):
+    subprocess.CREATE_NO_WINDOW = 0
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+if FIXTURES_DIR not in sys.path:
+    sys.path.insert(0, FIXTURES_DIR)
+
+import handle_stub as handle_stub_script
+
+def make_tree(root, dirs, files_per_dir, depth=1):
+    """Создает дерево: dirs папок на каждом из depth уровней, в каждой files_per_dir пустых файлов"""
+    paths = [root]
+    for level in range(depth):
+        paths = [os.path.join(parent, f"d{level}_{index}") for parent in paths for index in range(dirs)]
+        for directory in paths:
+            os.makedirs(directory, exist_ok=True)
+            for index in range(files_per_dir):
+                open(os.path.join(directory, f"f{index}.dat"), "wb").close()
+    return root
+
+@pytest.fixture(autouse=True)
+def clean_analysis_state():
+    """Сбрасывает кэш анализа и источник блокировок между тестами"""
+    import file_handler
+    file_handler.clear_cache()
+    yield
+    file_handler.set_lock_provider(None)
+
+class HandleStub:
+    """Исполняемая заглушка handle.exe, выводящая записанный вывод из tests/fixtures/handle"""
+
+    def __init__(self, path, log_file, monkeypatch):
+        self.path = path
+        self.log_file = log_file
+        self._monkeypatch = monkeypatch
+        monkeypatch.setenv("HANDLE_STUB_LOG", log_file)
+
+    def serve(self, fixture, filter_output=True):
+        """Задает файл с выводом для следующих запусков"""
+        self._monkeypatch.setenv("HANDLE_STUB_FIXTURE", fixture)
+        self._monkeypatch.setenv("HANDLE_STUB_FILTER", "1" if filter_output else "0")
+
+    def calls(self):
+        """Аргументы всех запусков заглушки (без пути к утилите)"""
+        if not os.path.exists(self.log_file):
+            return []
+        with open(self.log_file, encoding="utf-8") as f:
+            return [line.rstrip("\n").split("\t") for line in f]
+
+@pytest.fixture
+def handle_stub(tmp_path, monkeypatch):
+    """Создает исполняемую обертку над handle_stub.py, запускаемую через Popen как handle.exe"""
+    path = handle_stub_script.install(str(tmp_path))
+    import handle_tool
+    monkeypatch.setattr(handle_tool, "_handle_encodings", {})
+    return HandleStub(path, str(tmp_path / "handle_calls.log"), monkeypatch)
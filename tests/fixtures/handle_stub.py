@@ -0,0 +1,81 @@
+"""
+Заглушка утилиты handle.exe для тестов
+
+Выводит записанный заранее вывод утилиты из tests/fixtures/handle:
+- HANDLE_STUB_FIXTURE - имя файла с выводом (например, handle_v_files.csv)
+  или абсолютный путь к сгенерированному выводу;
+  имя "error" означает ошибку запуска: текст в stderr и код возврата 1;
+- HANDLE_STUB_LOG - файл, в который дописывается по строке на каждый запуск
+  (аргументы через табуляцию), чтобы тесты могли считать запуски;
+- HANDLE_STUB_FILTER=0 - выводить файл целиком, не применяя фильтр.
+
+Как и настоящая утилита, при заданном фильтре выводит только строки,
+в которых встречается фильтр (без учета регистра), и заголовок CSV.
+"""
+import os
+import sys
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "handle")
+
+# Кодировки консоли, в которых записаны файлы с выводом
+ENCODINGS = ["utf-8", "cp1251", "cp866"]
+
+def install(directory):
+    """
+    Создает в directory исполняемую обертку над заглушкой
+
+    Обертку можно передавать в query_handle_tool как путь к handle.exe:
+    она запускается через Popen так же, как настоящая утилита.
+
+    Returns:
+        str: Путь к обертке
+    """
+    script = os.path.abspath(__file__)
+    if os.name == "nt":
+        path = os.path.join(directory, "handle.cmd")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(f'@"{sys.executable}" "{script}" %*\n')
+    else:
+        path = os.path.join(directory, "handle")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(f'#!/bin/sh\nexec "{sys.executable}" "{script}" "$@"\n')
+        os.chmod(path, 0o755)
+    return path
+
+def main(args):
+    log_file = os.environ.get("HANDLE_STUB_LOG")
+    if log_file:
+        with open(log_file, "a", encoding="utf-8") as f:
+            f.write("\t".join(args) + "\n")
+
+    fixture = os.environ.get("HANDLE_STUB_FIXTURE", "handle_v_files.csv")
+    if fixture == "error":
+        sys.stderr.write("Initialization error: make sure that you are an administrator.\n")
+        return 1
+
+    with open(os.path.join(FIXTURES_DIR, fixture), "rb") as f:
+        lines = f.read().splitlines(keepends=True)
+
+    options = {"-accepteula", "-nobanner", "-v"}
+    targets = [arg for arg in args if arg not in options]
+    if targets and lines and os.environ.get("HANDLE_STUB_FILTER") != "0":
+        # Утилита получает фильтр в Unicode, а вывод записан в кодировке консоли
+        needles = {targets[0].encode(encoding, "ignore").lower() for encoding in ENCODINGS}
+
+        def matches(line):
+            line = line.lower()
+            return any(needle in line for needle in needles)
+
+        if fixture.endswith(".csv"):
+            lines = lines[:1] + [row for row in lines[1:] if matches(row)]
+        else:
+            lines = [line for line in lines if matches(line)]
+
+    out = sys.stdout.buffer
+    for line in lines:
+        out.write(line)
+    out.flush()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,68 @@
+import os
+import shutil
+import tracemalloc
+
+import pytest
+
+import file_handler
+
+# Размер разреженного файла: место на диске он занимает только после копирования
+SPARSE_SIZE = 2 * 1024 * 1024 * 1024
+
+# Допустимый пик памяти Python при копировании (буферы блочного копирования)
+MAX_COPY_PEAK = 64 * 1024 * 1024
+
+def _peak(func):
+    """Возвращает результат func и пик памяти Python (tracemalloc) во время вызова"""
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0]
+        result = func()
+        return result, tracemalloc.get_traced_memory()[1] - baseline
+    finally:
+        tracemalloc.stop()
+
+@pytest.fixture
+def sparse_file(tmp_path):
+    path = str(tmp_path / "disk.vhdx")
+    with open(path, "wb") as f:
+        f.truncate(SPARSE_SIZE)
+    return path
+
+def test_copy_is_skipped_above_ceiling(sparse_file, monkeypatch):
+    copies = []
+    monkeypatch.setattr(shutil, "copyfile", lambda *args, **kwargs: copies.append(args))
+    monkeypatch.setattr(shutil, "copy2", lambda *args, **kwargs: copies.append(args))
+
+    result, peak = _peak(lambda: file_handler.try_alternative_unlock(sparse_file))
+
+    # Файл больше ALTERNATIVE_UNLOCK_MAX_COPY_SIZE - срабатывает переименование
+    assert result is True
+    assert copies == []
+    assert os.path.getsize(sparse_file) == SPARSE_SIZE
+    assert not os.path.exists(sparse_file + ".temp")
+    assert peak < MAX_COPY_PEAK
+
+@pytest.mark.parametrize("use_sendfile", [True, False], ids=["sendfile", "blocks"])
+def test_copy_streams_large_file(sparse_file, monkeypatch, use_sendfile):
+    # Копия уже не разреженная: нужен запас места под оба файла
+    if shutil.disk_usage(os.path.dirname(sparse_file)).free < 3 * SPARSE_SIZE:
+        pytest.skip("Недостаточно места на диске для копии 2 ГБ")
+
+    monkeypatch.setattr(file_handler, "ALTERNATIVE_UNLOCK_MAX_COPY_SIZE", 2 * SPARSE_SIZE)
+    if not use_sendfile:
+        # Блочное копирование, как в Windows
+        monkeypatch.setattr(shutil, "_USE_CP_SENDFILE", False, raising=False)
+        monkeypatch.setattr(shutil, "_HAS_FCOPYFILE", False, raising=False)
+    copies = []
+    copyfile = shutil.copyfile
+    monkeypatch.setattr(shutil, "copyfile", lambda *args, **kwargs: copies.append(args) or copyfile(*args, **kwargs))
+
+    result, peak = _peak(lambda: file_handler.try_alternative_unlock(sparse_file))
+
+    assert result is True
+    assert len(copies) == 1
+    assert os.path.getsize(sparse_file) == SPARSE_SIZE
+    assert not os.path.exists(sparse_file + ".temp")
+    assert peak < MAX_COPY_PEAK, peak
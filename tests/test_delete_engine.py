@@ -0,0 +1,219 @@
+import os
+import threading
+
+import pytest
+
+import delete_engine
+from conftest import make_tree
+from delete_engine import delete_tree
+
+# dir_fd - удаление относительно дескриптора папки, path - своей функцией по полному пути
+REMOVE_MODES = {"dir_fd": None, "path": os.remove}
+
+@pytest.fixture(params=list(REMOVE_MODES))
+def remove_file(request):
+    return REMOVE_MODES[request.param]
+
+def test_removes_whole_tree(tmp_path, remove_file):
+    root = make_tree(str(tmp_path / "tree"), dirs=3, files_per_dir=5, depth=3)
+    progress = []
+    total = 39 * 5 + 39 + 1  # файлы, папки и сам корень
+
+    result = delete_tree(root, lambda done, count: progress.append((done, count)) or True,
+                         total=total, remove_file=remove_file, max_workers=4)
+
+    assert result["success"] is True
+    assert result["deleted_files"] == 39 * 5
+    assert result["deleted_dirs"] == 39 + 1
+    assert result["errors"] == []
+    assert not os.path.exists(root)
+    # Последний вызов прогресса - все элементы удалены
+    assert progress[-1] == (total, total)
+
+def test_keeps_root_when_asked(tmp_path, remove_file):
+    root = make_tree(str(tmp_path / "tree"), dirs=2, files_per_dir=3, depth=2)
+    open(os.path.join(root, "top.dat"), "wb").close()
+
+    result = delete_tree(root, remove_root=False, remove_file=remove_file)
+
+    assert result["success"] is True
+    assert os.listdir(root) == []
+
+def test_failed_file_reports_one_error(tmp_path):
+    root = make_tree(str(tmp_path / "tree"), dirs=2, files_per_dir=3, depth=3)
+    locked = os.path.join(root, "d0_0", "d1_0", "d2_0", "f1.dat")
+
+    def remove_file(path):
+        if path == locked:
+            raise PermissionError(13, "Процесс не может получить доступ к файлу", path)
+        os.remove(path)
+
+    result = delete_tree(root, remove_file=remove_file, max_workers=4)
+
+    # Предки заблокированного файла не удаляются и не дают лишних ошибок
+    assert "error" in result
+    assert [path for path, _ in result["errors"]] == [locked]
+    assert result["deleted_files"] == 14 * 3 - 1
+    assert os.path.exists(locked)
+    assert sorted(os.listdir(root)) == ["d0_0"]
+
+def test_cancel_stops_deletion(tmp_path):
+    root = make_tree(str(tmp_path / "tree"), dirs=10, files_per_dir=20, depth=2)
+    first_file = threading.Event()
+    cancelled = threading.Event()
+
+    def remove_file(path):
+        os.remove(path)
+        first_file.set()
+        # Удаление ждет решения об отмене, чтобы не успеть закончиться раньше
+        cancelled.wait(5)
+
+    def progress(done, total):
+        if first_file.is_set():
+            cancelled.set()
+            return False
+        return True
+
+    result = delete_tree(root, progress, remove_file=remove_file, max_workers=2)
+
+    assert result.get("cancelled") is True
+    assert "success" not in result
+    assert result["deleted_files"] < 10 * 20 + 100 * 20
+    assert os.path.exists(root)
+
+def test_volume_limit_caps_concurrency(tmp_path):
+    root = make_tree(str(tmp_path / "tree"), dirs=8, files_per_dir=2, depth=2)
+    lock = threading.Lock()
+    active = [0, 0]  # сейчас, максимум
+
+    def remove_file(path):
+        with lock:
+            active[0] += 1
+            active[1] = max(active[1], active[0])
+        try:
+            threading.Event().wait(0.002)
+            os.remove(path)
+        finally:
+            with lock:
+                active[0] -= 1
+
+    result = delete_tree(root, remove_file=remove_file, max_workers=8,
+                         volume_limits={os.stat(root).st_dev: 2})
+
+    assert result["success"] is True
+    assert active[1] <= 2
+
+@pytest.mark.skipif(not delete_engine.DIR_FD_SUPPORTED, reason="dir_fd не поддерживается")
+def test_dir_fd_mode_unlinks_by_name(tmp_path, monkeypatch):
+    root = make_tree(str(tmp_path / "tree"), dirs=2, files_per_dir=4, depth=2)
+    names = []
+    unlink = os.unlink
+
+    def counting_unlink(path, *, dir_fd=None):
+        names.append((path, dir_fd is not None))
+        return unlink(path, dir_fd=dir_fd)
+
+    monkeypatch.setattr(os, "unlink", counting_unlink)
+    result = delete_tree(root)
+
+    assert result["success"] is True
+    assert len(names) == 6 * 4
+    # Ядру передается только имя файла, а не полный путь
+    assert all(os.sep not in path and relative for path, relative in names)
+
+def _fail_first_unlink(monkeypatch, name):
+    """Первое удаление файлов с именем name завершается ошибкой, как у занятого файла"""
+    unlink = os.unlink
+    remove = os.remove
+
+    def failing_unlink(path, *, dir_fd=None):
+        if os.path.basename(path) == name:
+            raise PermissionError(13, "Процесс не может получить доступ к файлу", path)
+        return unlink(path, dir_fd=dir_fd)
+
+    monkeypatch.setattr(os, "unlink", failing_unlink)
+    monkeypatch.setattr(os, "remove", failing_unlink)
+    return remove
+
+def test_retry_file_only_for_failed_files(tmp_path, monkeypatch):
+    root = make_tree(str(tmp_path / "tree"), dirs=2, files_per_dir=3, depth=2)
+    remove = _fail_first_unlink(monkeypatch, "f2.dat")
+    retried = []
+
+    def retry_file(path):
+        retried.append(path)
+        remove(path)
+
+    result = delete_tree(root, retry_file=retry_file, max_workers=2)
+
+    assert result["success"] is True
+    assert result["deleted_files"] == 6 * 3
+    # Повтор вызывается по полному пути и только для файлов, не удалившихся сразу
+    assert sorted(retried) == sorted(os.path.join(root, *parts, "f2.dat") for parts in
+                                     [("d0_0",), ("d0_1",), ("d0_0", "d1_0"), ("d0_0", "d1_1"),
+                                      ("d0_1", "d1_0"), ("d0_1", "d1_1")])
+    assert not os.path.exists(root)
+
+def test_failed_retry_is_reported(tmp_path, monkeypatch):
+    root = make_tree(str(tmp_path / "tree"), dirs=1, files_per_dir=2, depth=1)
+    _fail_first_unlink(monkeypatch, "f0.dat")
+
+    def retry_file(path):
+        raise PermissionError(13, "Файл занят", path)
+
+    result = delete_tree(root, retry_file=retry_file)
+
+    assert "error" in result
+    assert [path for path, _ in result["errors"]] == [os.path.join(root, "d0_0", "f0.dat")]
+    assert result["deleted_files"] == 1
+
+@pytest.mark.skipif(not delete_engine.DIR_FD_SUPPORTED, reason="dir_fd не поддерживается")
+def test_dir_fd_mode_removes_dirs_by_name(tmp_path, monkeypatch):
+    root = make_tree(str(tmp_path / "tree"), dirs=2, files_per_dir=1, depth=2)
+    rmdirs = []
+    opens = []
+    rmdir = os.rmdir
+    open_ = os.open
+
+    def counting_rmdir(path, *, dir_fd=None):
+        rmdirs.append((path, dir_fd is not None))
+        return rmdir(path, dir_fd=dir_fd)
+
+    def counting_open(path, flags, mode=0o777, *, dir_fd=None):
+        opens.append((path, flags, dir_fd is not None))
+        return open_(path, flags, mode, dir_fd=dir_fd)
+
+    monkeypatch.setattr(os, "rmdir", counting_rmdir)
+    monkeypatch.setattr(os, "open", counting_open)
+    result = delete_tree(root)
+
+    assert result["success"] is True
+    # Вложенные папки открываются и удаляются по имени относительно родителя, корень - по пути
+    assert sorted(rmdirs) == sorted([(root, False)] + [(name, True) for name in
+                                    ["d0_0", "d0_1", "d1_0", "d1_1", "d1_0", "d1_1"]])
+    assert opens[0] == (root, opens[0][1], False)
+    assert all(os.sep not in path and relative and flags & os.O_NOFOLLOW
+               for path, flags, relative in opens[1:])
+    assert len(opens) == 7
+
+@pytest.mark.skipif(not delete_engine.DIR_FD_SUPPORTED, reason="dir_fd не поддерживается")
+def test_symlink_swapped_in_is_not_followed(tmp_path, monkeypatch):
+    root = make_tree(str(tmp_path / "tree"), dirs=1, files_per_dir=1, depth=2)
+    outside = tmp_path / "outside"
+    outside.mkdir()
+    (outside / "keep.dat").write_bytes(b"x")
+    child = os.path.join(root, "d0_0")
+    open_ = os.open
+
+    def swapping_open(path, flags, mode=0o777, *, dir_fd=None):
+        # Папку подменяют ссылкой на чужую папку между чтением родителя и ее открытием
+        if path == "d0_0" and not os.path.islink(child):
+            os.rename(child, os.path.join(root, "moved"))
+            os.symlink(str(outside), child)
+        return open_(path, flags, mode, dir_fd=dir_fd)
+
+    monkeypatch.setattr(os, "open", swapping_open)
+    result = delete_tree(root)
+
+    assert "error" in result
+    assert (outside / "keep.dat").exists()
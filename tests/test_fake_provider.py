@@ -0,0 +1,121 @@
+import os
+import time
+import threading
+import subprocess
+
+import pytest
+
+import file_handler
+from lock_providers import FakeLockProvider
+
+# Задержка одного запроса к источнику (как у запуска handle.exe)
+LATENCY = 0.2
+HANDLE_COUNT = 200_000
+
+# Владелец файла - дочерний процесс sleep
+needs_sleep = pytest.mark.skipif(os.name == "nt", reason="нужна команда sleep")
+
+def _install(provider):
+    file_handler.set_lock_provider(provider)
+    return provider
+
+@pytest.fixture
+def holder():
+    """Процесс, который держит файл, пока его не завершат"""
+    process = subprocess.Popen(["sleep", "30"])
+    yield process
+    process.kill()
+    process.wait()
+
+@pytest.mark.parametrize("exact", [True, False], ids=["exact", "snapshot"])
+def test_directory_analysis_with_many_handles(tmp_path, exact):
+    root = str(tmp_path / "project")
+    os.mkdir(root)
+    provider = _install(FakeLockProvider(latency=LATENCY, exact=exact))
+    provider.generate(root, HANDLE_COUNT)
+    # Посторонние дескрипторы вне папки не попадают в ответ
+    provider.generate(str(tmp_path / "other"), 1000)
+
+    started = time.monotonic()
+    processes = file_handler.get_blocking_processes(root)
+    elapsed = time.monotonic() - started
+
+    assert len(processes) == HANDLE_COUNT
+    assert {process["pid"] for process in processes} == set(range(10000, 10100))
+    # Один запрос к источнику на всю папку, а не на каждый файл
+    assert sum(provider.calls.values()) == 1
+    assert LATENCY <= elapsed < LATENCY + 5
+
+    # Повторный анализ отвечает из кэша, источник не вызывается
+    started = time.monotonic()
+    assert len(file_handler.get_blocking_processes(root)) == HANDLE_COUNT
+    assert time.monotonic() - started < LATENCY
+    assert sum(provider.calls.values()) == 1
+
+def test_single_file_query_pays_latency_once(tmp_path):
+    path = tmp_path / "data.db"
+    path.write_bytes(b"x")
+    provider = _install(FakeLockProvider(latency=LATENCY))
+    provider.generate(str(tmp_path / "other"), 10_000)
+    provider.add(str(path), 4242, "app.exe")
+
+    started = time.monotonic()
+    processes = file_handler.get_blocking_processes(str(path))
+
+    assert [(process["pid"], process["process_name"]) for process in processes] == [(4242, "app.exe")]
+    assert provider.calls["query_path"] == 1
+    assert LATENCY <= time.monotonic() - started < LATENCY + 1
+
+def _lock_until_exit(monkeypatch, path, process):
+    """Файл считается заблокированным, пока процесс-владелец не завершится"""
+    check = file_handler.check_file_locked_windows_api
+
+    def locked(file_path):
+        if file_path == path:
+            return process.poll() is None
+        return check(file_path)
+
+    monkeypatch.setattr(file_handler, "check_file_locked_windows_api", locked)
+    # Разблокировка копированием к Windows-блокировкам не относится и только тратит время
+    monkeypatch.setattr(file_handler, "try_alternative_unlock", lambda file_path: False)
+
+@needs_sleep
+def test_wait_for_unlock_waits_for_holder_exit(tmp_path, monkeypatch, holder):
+    path = str(tmp_path / "data.db")
+    open(path, "wb").close()
+    provider = _install(FakeLockProvider(latency=LATENCY))
+    provider.generate(str(tmp_path / "other"), HANDLE_COUNT)
+    provider.add(path, holder.pid, "sleep")
+    _lock_until_exit(monkeypatch, path, holder)
+    exit_delay = 0.5
+    killer = threading.Timer(exit_delay, holder.kill)
+
+    started = time.monotonic()
+    killer.start()
+    try:
+        released = file_handler.wait_for_unlock(str(tmp_path), locked_paths={path}, timeout=10)
+    finally:
+        killer.cancel()
+    elapsed = time.monotonic() - started
+
+    assert released is True
+    # Владельцы оставшихся файлов запрашиваются один раз, дальше ожидается их выход
+    assert provider.calls["query_paths"] == 1
+    assert exit_delay <= elapsed < exit_delay + LATENCY + 1
+
+@needs_sleep
+def test_wait_for_unlock_times_out(tmp_path, monkeypatch, holder):
+    path = str(tmp_path / "data.db")
+    open(path, "wb").close()
+    provider = _install(FakeLockProvider(latency=LATENCY))
+    provider.add(path, holder.pid, "sleep")
+    _lock_until_exit(monkeypatch, path, holder)
+    timeout = 0.6
+
+    started = time.monotonic()
+    released = file_handler.wait_for_unlock(str(tmp_path), locked_paths={path}, timeout=timeout)
+    elapsed = time.monotonic() - started
+
+    assert released is False
+    assert provider.calls["query_paths"] == 1
+    assert timeout <= elapsed < timeout + 1
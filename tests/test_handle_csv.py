@@ -0,0 +1,74 @@
+import handle_tool
+
+DOCUMENTS = "C:\\Users\\user\\Documents"
+REPORT = DOCUMENTS + "\\report.docx"
+
+def _by_pid(records):
+    return sorted((r["pid"], r["process_name"], r["file_path"]) for r in records)
+
+def test_csv_records_are_parsed(handle_stub):
+    handle_stub.serve("handle_v_files.csv")
+    records = handle_tool.query_handle_tool(handle_stub.path, DOCUMENTS)
+
+    # Ключи реестра, PID 0 и строки без пути (при фильтре-папке) отбрасываются,
+    # запятая в пути в кавычках не разбивает столбец
+    assert _by_pid(records) == [
+        (5120, "explorer.exe", REPORT),
+        (7744, "WINWORD.EXE", REPORT),
+        (9012, "chrome.exe", DOCUMENTS + "\\Budget, 2024.xlsx"),
+    ]
+    assert all(r["handle_type"] == "File" for r in records)
+    assert handle_stub.calls() == [["-accepteula", "-nobanner", "-v", DOCUMENTS]]
+
+def test_empty_name_takes_target_path(handle_stub):
+    handle_stub.serve("handle_v_files.csv", filter_output=False)
+    records = handle_tool.query_handle_tool(handle_stub.path, REPORT)
+
+    assert (3300, "notepad.exe", REPORT) in _by_pid(records)
+
+def test_snapshot_without_target_lists_all_files(handle_stub):
+    handle_stub.serve("handle_v_files.csv")
+    records = handle_tool.query_handle_tool(handle_stub.path)
+
+    # Без фильтра строке без пути подставлять нечего
+    assert {r["pid"] for r in records} == {4, 5120, 7744, 9012}
+    assert handle_stub.calls() == [["-accepteula", "-nobanner", "-v"]]
+
+def test_non_ascii_codec_is_detected_and_cached(handle_stub):
+    handle_stub.serve("handle_v_cp1251.csv")
+    target = "C:\\Users\\Пользователь\\Документы"
+    records = handle_tool.query_handle_tool(handle_stub.path, target)
+
+    assert _by_pid(records) == [
+        (5120, "explorer.exe", target + "\\отчет.docx"),
+        (6408, "1cv8.exe", target + "\\База\\1Cv8.1CD"),
+        (6408, "1cv8.exe", target + "\\База\\1Cv8.1CL"),
+    ]
+    assert handle_tool._handle_encodings[handle_stub.path] == "cp1251"
+
+    # Повторный запуск сразу декодирует выбранной кодировкой
+    assert handle_tool.query_handle_tool(handle_stub.path, target) == records
+
+def test_plain_text_output_falls_back_to_text_parser(handle_stub):
+    handle_stub.serve("handle_filtered.txt")
+    records = handle_tool.query_handle_tool(handle_stub.path, REPORT)
+
+    assert _by_pid(records) == [
+        (5120, "explorer.exe", REPORT),
+        (7744, "WINWORD.EXE", REPORT),
+    ]
+
+def test_no_matching_handles(handle_stub):
+    handle_stub.serve("handle_no_matches.txt", filter_output=False)
+    assert handle_tool.query_handle_tool(handle_stub.path, REPORT) == []
+
+def test_tool_error_is_reported(handle_stub):
+    handle_stub.serve("error")
+    result = handle_tool.query_handle_tool(handle_stub.path, REPORT)
+
+    assert "administrator" in result["error"]
+
+def test_missing_tool_is_reported(tmp_path):
+    result = handle_tool.query_handle_tool(str(tmp_path / "missing.exe"), REPORT)
+
+    assert "error" in result
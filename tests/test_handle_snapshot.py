@@ -0,0 +1,41 @@
+import os
+
+import file_handler
+from conftest import make_tree
+from lock_providers import HandleExeProvider
+
+def _write_snapshot(output_file, locked_files, other_count=1000):
+    with open(output_file, "w", encoding="utf-8", newline="") as f:
+        f.write("Process,PID,User,Handle,Type,Share Flags,Name,Access\r\n")
+        for index, file_path in enumerate(locked_files):
+            f.write(f"app.exe,{100 + index % 3},HOST\\user,0x{index:X},File,RW-,{file_path},0x0\r\n")
+        for index in range(other_count):
+            f.write(f"svc.exe,200,HOST\\user,0x{index:X},File,RW-,/var/lib/svc/seg{index}.db,0x0\r\n")
+
+def test_directory_analysis_runs_tool_once(tmp_path, handle_stub):
+    root = make_tree(str(tmp_path / "tree"), dirs=5, files_per_dir=40)
+    locked_files = [os.path.join(root, f"d0_{index}", "f0.dat") for index in range(5)]
+    output_file = str(tmp_path / "snapshot.csv")
+    _write_snapshot(output_file, locked_files)
+    handle_stub.serve(output_file)
+    file_handler.set_lock_provider(HandleExeProvider(handle_stub.path))
+
+    processes = file_handler.get_blocking_processes(root, use_cache=False)
+
+    assert sorted(p["file_path"] for p in processes) == sorted(locked_files)
+    assert {p["pid"] for p in processes} == {100, 101, 102}
+    # Один запуск без фильтра на всю папку, а не запуск на каждый файл
+    assert handle_stub.calls() == [["-accepteula", "-nobanner", "-v"]]
+
+def test_per_file_mode_runs_tool_per_group(tmp_path, handle_stub):
+    root = make_tree(str(tmp_path / "tree"), dirs=5, files_per_dir=2)
+    locked_files = [os.path.join(root, f"d0_{index}", "f0.dat") for index in range(5)]
+    output_file = str(tmp_path / "snapshot.csv")
+    _write_snapshot(output_file, locked_files)
+    handle_stub.serve(output_file)
+    provider = HandleExeProvider(handle_stub.path)
+
+    holders = provider.query_paths(locked_files, root=root)
+
+    assert all(len(holders[file_path]) == 1 for file_path in locked_files)
+    assert 1 < len(handle_stub.calls()) <= len(locked_files)
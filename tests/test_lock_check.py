@@ -0,0 +1,48 @@
+import os
+import stat
+import builtins
+
+import pytest
+
+import file_handler
+from file_handler import check_file_locked_windows_api
+
+def _deny_write(monkeypatch, winerror=None):
+    """Открытие на запись завершается отказом, как в Windows"""
+    real_open = builtins.open
+
+    def fake_open(file, mode="r", *args, **kwargs):
+        if "a" in mode or "w" in mode:
+            error = PermissionError(13, "Permission denied", file)
+            error.winerror = winerror
+            raise error
+        return real_open(file, mode, *args, **kwargs)
+
+    monkeypatch.setattr(file_handler, "open", fake_open, raising=False)
+
+@pytest.fixture
+def data_file(tmp_path):
+    path = tmp_path / "data.db"
+    path.write_bytes(b"x")
+    yield str(path)
+    os.chmod(path, stat.S_IREAD | stat.S_IWRITE)
+
+def test_free_file_is_not_locked(data_file):
+    assert check_file_locked_windows_api(data_file) is False
+
+def test_read_only_file_is_not_locked(data_file, monkeypatch):
+    os.chmod(data_file, stat.S_IREAD)
+    _deny_write(monkeypatch)
+
+    assert check_file_locked_windows_api(data_file) is False
+
+def test_read_only_file_with_sharing_violation_is_locked(data_file, monkeypatch):
+    os.chmod(data_file, stat.S_IREAD)
+    _deny_write(monkeypatch, winerror=32)
+
+    assert check_file_locked_windows_api(data_file) is True
+
+def test_writable_file_denied_for_write_is_locked(data_file, monkeypatch):
+    _deny_write(monkeypatch)
+
+    assert check_file_locked_windows_api(data_file) is True
@@ -0,0 +1,90 @@
+import os
+import time
+import subprocess
+
+import pytest
+
+import process_table
+import file_handler
+from process_table import ProcessTable
+
+pytestmark = pytest.mark.skipif(not os.path.isdir("/proc"), reason="нужен /proc")
+
+def _failing_table(monkeypatch):
+    table = ProcessTable()
+
+    def fail():
+        raise OSError(24, "Too many open files")
+
+    monkeypatch.setattr(table, "_enumerate", fail)
+    monkeypatch.setattr(process_table, "_process_table", table)
+    return table
+
+@pytest.fixture
+def child():
+    process = subprocess.Popen(["sleep", "30"])
+    # Ждем exec, чтобы в /proc было уже имя sleep, а не python
+    deadline = time.monotonic() + 5
+    while process_table._read_proc_name(process.pid) != "sleep" and time.monotonic() < deadline:
+        time.sleep(0.01)
+    yield process
+    process.kill()
+    process.wait()
+
+def test_lists_running_processes(child):
+    table = ProcessTable()
+
+    assert table.is_running(os.getpid())
+    assert table.is_running(child.pid)
+    assert table.name_of(child.pid) == "sleep"
+    assert table.instance_count("SLEEP") >= 1
+
+def test_failed_refresh_treats_processes_as_running(monkeypatch):
+    table = _failing_table(monkeypatch)
+
+    assert table.refresh() is False
+    # Состояние неизвестно - процесс не считается завершенным
+    assert table.is_running(999999999)
+    assert file_handler.is_process_running(999999999)
+
+def test_unlock_with_failed_table_still_terminates(monkeypatch, child, tmp_path):
+    _failing_table(monkeypatch)
+    path = str(tmp_path / "data.db")
+
+    result = file_handler.unlock_file(path, [{"process_name": "sleep", "pid": child.pid,
+                                              "handle_type": "File", "file_path": path}])
+
+    assert result["success"] is True
+    assert result["results"][0]["message"] != "Процесс уже не запущен"
+    assert child.wait(timeout=5) is not None
+
+def test_reused_pid_rereads_name(monkeypatch):
+    table = ProcessTable()
+    pid = os.getpid()
+    real_name = table.name_of(pid)
+
+    # Тот же процесс (inode не изменился) - имя не перечитывается
+    table._names[pid] = "stale"
+    table.refresh()
+    assert table.name_of(pid) == "stale"
+
+    # PID занят другим процессом (другой inode папки /proc/<pid>) - имя перечитывается
+    table._names[pid] = "stale"
+    table._inodes[pid] = -1
+    table.refresh()
+    assert table.name_of(pid) == real_name
+
+def test_unlock_sees_process_started_after_refresh(tmp_path):
+    table = process_table.get_process_table()
+    table.refresh()
+    # Процесс запущен после обновления таблицы, но до истечения ее ttl
+    late = subprocess.Popen(["sleep", "30"])
+    path = str(tmp_path / "data.db")
+    try:
+        result = file_handler.unlock_file(path, [{"process_name": "sleep", "pid": late.pid,
+                                                  "handle_type": "File", "file_path": path}])
+        assert result["results"][0]["message"] != "Процесс уже не запущен"
+        assert late.wait(timeout=5) is not None
+    finally:
+        late.kill()
+        late.wait()
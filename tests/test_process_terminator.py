@@ -0,0 +1,161 @@
+import os
+import sys
+import errno
+import signal
+import subprocess
+
+import pytest
+
+import file_handler
+from process_terminator import (PosixTerminator, terminate_processes, set_terminator,
+                                TERMINATED, NOT_RUNNING, GRACEFUL, FORCED)
+
+pytestmark = pytest.mark.skipif(os.name == "nt", reason="завершение через сигналы POSIX")
+
+GRACE_PERIOD = 0.3
+
+# Дочерний процесс сообщает о готовности, когда обработчик SIGTERM уже установлен
+CHILD_CODE = """
+import signal, sys, time
+if sys.argv[1] == "ignore":
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+print("ready", flush=True)
+time.sleep(60)
+"""
+
+def _spawn(mode):
+    process = subprocess.Popen([sys.executable, "-c", CHILD_CODE, mode], stdout=subprocess.PIPE)
+    assert process.stdout.readline().strip() == b"ready"
+    return process
+
+@pytest.fixture
+def children():
+    processes = []
+
+    def spawn(mode):
+        process = _spawn(mode)
+        processes.append(process)
+        return process
+
+    yield spawn
+    for process in processes:
+        process.kill()
+        process.wait()
+        process.stdout.close()
+
+@pytest.fixture(autouse=True)
+def posix_terminator():
+    set_terminator(PosixTerminator())
+    yield
+    set_terminator(None)
+
+def _check_escalation(outcomes, stubborn, polite):
+    assert outcomes[polite.pid]["status"] == TERMINATED
+    assert outcomes[polite.pid]["method"] == GRACEFUL
+    assert outcomes[polite.pid]["exit_time"] < GRACE_PERIOD
+
+    assert outcomes[stubborn.pid]["status"] == TERMINATED
+    assert outcomes[stubborn.pid]["method"] == FORCED
+    assert outcomes[stubborn.pid]["exit_time"] >= GRACE_PERIOD
+
+    # Код завершения забирает сам завершатель (_reap), Popen видит только выход
+    polite.wait(timeout=5)
+    stubborn.wait(timeout=5)
+
+def test_graceful_then_forced(children):
+    stubborn = children("ignore")
+    polite = children("exit")
+
+    outcomes = PosixTerminator().terminate([stubborn.pid, polite.pid], timeout=5,
+                                           grace_period=GRACE_PERIOD)
+
+    _check_escalation(outcomes, stubborn, polite)
+
+def test_zero_grace_period_kills_at_once(children):
+    polite = children("exit")
+
+    outcomes = PosixTerminator().terminate([polite.pid], timeout=5, grace_period=0)
+
+    assert outcomes[polite.pid]["status"] == TERMINATED
+    assert outcomes[polite.pid]["method"] == FORCED
+
+def test_pidfd_errors_fall_back_to_polling(children, monkeypatch):
+    stubborn = children("ignore")
+    polite = children("exit")
+
+    def pidfd_open(pid, flags=0):
+        raise OSError(errno.EMFILE, "Too many open files")
+
+    # Без pidfd сигналы идут через os.kill, а выход ожидается опросом
+    monkeypatch.setattr(os, "pidfd_open", pidfd_open, raising=False)
+    outcomes = PosixTerminator().terminate([stubborn.pid, polite.pid], timeout=5,
+                                           grace_period=GRACE_PERIOD)
+
+    _check_escalation(outcomes, stubborn, polite)
+
+def test_pidfd_error_for_one_pid(children, monkeypatch):
+    if not hasattr(os, "pidfd_open"):
+        pytest.skip("pidfd недоступен")
+    stubborn = children("ignore")
+    polite = children("exit")
+    real_pidfd_open = os.pidfd_open
+
+    def pidfd_open(pid, flags=0):
+        if pid == polite.pid:
+            raise PermissionError(errno.EPERM, "Operation not permitted")
+        return real_pidfd_open(pid, flags)
+
+    monkeypatch.setattr(os, "pidfd_open", pidfd_open)
+    outcomes = PosixTerminator().terminate([stubborn.pid, polite.pid], timeout=5,
+                                           grace_period=GRACE_PERIOD)
+
+    _check_escalation(outcomes, stubborn, polite)
+
+def test_wait_falls_back_per_pid(children, monkeypatch):
+    if not hasattr(os, "pidfd_open"):
+        pytest.skip("pidfd недоступен")
+    polite = children("exit")
+    other = children("exit")
+    real_pidfd_open = os.pidfd_open
+    exited = []
+
+    def pidfd_open(pid, flags=0):
+        if pid == polite.pid:
+            raise OSError(errno.ENOSYS, "Function not implemented")
+        return real_pidfd_open(pid, flags)
+
+    monkeypatch.setattr(os, "pidfd_open", pidfd_open)
+    # Для other дескриптор уже открыт, для polite _wait_pidfd пробует открыть его сам
+    other_fd = real_pidfd_open(other.pid)
+    handles = {polite.pid: None, other.pid: other_fd}
+    os.kill(polite.pid, signal.SIGTERM)
+    os.kill(other.pid, signal.SIGTERM)
+    try:
+        survivors = PosixTerminator().wait(handles, 5, exited.append)
+    finally:
+        os.close(other_fd)
+
+    assert survivors == set()
+    assert sorted(exited) == sorted(handles)
+
+def test_unlock_file_reports_each_pid(children, tmp_path):
+    stubborn = children("ignore")
+    polite = children("exit")
+    path = str(tmp_path / "data.db")
+    processes = [{"process_name": "python", "pid": pid, "handle_type": "File", "file_path": path}
+                 for pid in (stubborn.pid, polite.pid)]
+
+    result = file_handler.unlock_file(path, processes)
+
+    assert result["success"] is True
+    methods = {item["pid"]: item["method"] for item in result["results"]}
+    assert methods == {stubborn.pid: FORCED, polite.pid: GRACEFUL}
+
+def test_exited_pid_is_not_running(children):
+    polite = children("exit")
+    polite.kill()
+    polite.wait()
+
+    outcomes = terminate_processes([polite.pid], timeout=1)
+
+    assert outcomes == {polite.pid: {"status": NOT_RUNNING}}
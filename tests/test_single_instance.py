@@ -0,0 +1,67 @@
+import os
+import time
+import socket
+import threading
+
+import pytest
+
+from single_instance import InstanceServer, forward_to_running_instance
+
+pytestmark = pytest.mark.skipif(os.name == "nt", reason="канал экземпляра - Unix-сокет")
+
+KEY = b"k" * 32
+
+@pytest.fixture
+def server(tmp_path):
+    instance = InstanceServer(address=str(tmp_path / "instance.sock"), key=KEY, coalesce_interval=0.3)
+    assert instance.listen()
+    yield instance
+    instance.close()
+
+def _collect(server):
+    batches = []
+    received = threading.Event()
+
+    def handler(paths):
+        batches.append((time.monotonic(), paths))
+        received.set()
+
+    server.set_handler(handler)
+    return batches, received
+
+def test_own_paths_are_dispatched_at_once(server, tmp_path):
+    batches, _ = _collect(server)
+
+    started = time.monotonic()
+    server.submit([str(tmp_path / "a.txt")])
+
+    # Собственные пути не ждут окна объединения запусков
+    assert [paths for _, paths in batches] == [[str(tmp_path / "a.txt")]]
+    assert batches[0][0] - started < server.coalesce_interval
+
+def test_own_paths_wait_for_handler(server, tmp_path):
+    server.submit([str(tmp_path / "a.txt")])
+    batches, _ = _collect(server)
+
+    assert [paths for _, paths in batches] == [[str(tmp_path / "a.txt")]]
+
+def test_silent_client_does_not_block_launches(server, tmp_path):
+    batches, received = _collect(server)
+    # Клиент подключается и молчит посреди рукопожатия
+    silent = socket.socket(socket.AF_UNIX)
+    silent.connect(server.address)
+    try:
+        started = time.monotonic()
+        assert forward_to_running_instance([str(tmp_path / "b.txt")], server.address, KEY) is True
+        assert time.monotonic() - started < 1.0
+        assert received.wait(5)
+    finally:
+        silent.close()
+
+    assert batches[-1][1] == [str(tmp_path / "b.txt")]
+
+def test_wrong_key_is_rejected(server, tmp_path):
+    batches, _ = _collect(server)
+
+    assert forward_to_running_instance([str(tmp_path / "c.txt")], server.address, b"x" * 32) is False
+    assert batches == []
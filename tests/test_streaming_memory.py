@@ -0,0 +1,79 @@
+import os
+import tracemalloc
+
+import pytest
+
+import tree_walker
+import file_handler
+from conftest import make_tree
+from delete_engine import delete_tree
+
+# Во сколько раз больше второе дерево
+GROWTH = 4
+
+# Допустимый прирост пика памяти на большом дереве (пулы потоков, кэши интерпретатора)
+PEAK_SLACK = 256 * 1024
+
+def _peak(func):
+    """Возвращает пик памяти Python (tracemalloc) во время вызова func"""
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0]
+        func()
+        return tracemalloc.get_traced_memory()[1] - baseline
+    finally:
+        tracemalloc.stop()
+
+@pytest.fixture
+def trees(tmp_path, monkeypatch):
+    # Деревья крупнее MAX_STORED_ENTRIES читаются потоком - как деревья из миллионов файлов
+    monkeypatch.setattr(tree_walker, "MAX_STORED_ENTRIES", 100)
+    small = make_tree(str(tmp_path / "small"), dirs=10, files_per_dir=100)
+    large = make_tree(str(tmp_path / "large"), dirs=10 * GROWTH, files_per_dir=100)
+    return small, large
+
+def _assert_flat(small_peak, large_peak):
+    assert large_peak <= small_peak * 1.5 + PEAK_SLACK, (small_peak, large_peak)
+
+def test_materialized_walk_grows_with_tree(trees):
+    # Контроль чувствительности: список всех путей растет вместе с деревом
+    small, large = trees
+    small_peak = _peak(lambda: list(tree_walker.iter_tree(small)))
+    large_peak = _peak(lambda: list(tree_walker.iter_tree(large)))
+    assert large_peak > small_peak * 2
+
+@pytest.mark.parametrize("bottom_up", [False, True])
+def test_iter_tree_memory_is_flat(trees, bottom_up):
+    small, large = trees
+
+    def walk(root):
+        return lambda: sum(1 for _ in tree_walker.iter_tree(root, bottom_up=bottom_up))
+
+    _assert_flat(_peak(walk(small)), _peak(walk(large)))
+
+def test_scan_and_probe_memory_is_flat(trees):
+    small, large = trees
+
+    def scan_and_probe(root):
+        def run():
+            scan = tree_walker.scan_tree(root)
+            assert not scan.complete
+            assert file_handler.probe_locked_files(scan.file_paths(), total=scan.file_count) == []
+        return run
+
+    _assert_flat(_peak(scan_and_probe(small)), _peak(scan_and_probe(large)))
+
+def test_delete_tree_memory_is_flat(trees):
+    small, large = trees
+
+    def delete(root):
+        def run():
+            result = delete_tree(root, max_workers=4)
+            assert "success" in result
+        return run
+
+    small_peak = _peak(delete(small))
+    large_peak = _peak(delete(large))
+    assert not os.path.exists(small) and not os.path.exists(large)
+    _assert_flat(small_peak, large_peak)
@@ -0,0 +1,57 @@
+import os
+
+import pytest
+
+import file_handler
+from conftest import make_tree
+from retry_scheduler import RetryScheduler, get_retry_stats, reset_retry_stats
+
+# PID заведомо не существует: блокировавший процесс уже завершен
+GONE_PID = 999999999
+
+def _processes(paths):
+    return [{"process_name": "app.exe", "pid": GONE_PID, "handle_type": "File", "file_path": path}
+            for path in paths]
+
+@pytest.fixture(autouse=True)
+def clean_retry_stats():
+    reset_retry_stats()
+    yield
+    reset_retry_stats()
+
+def test_known_locked_files_skip_tree_scan(tmp_path, monkeypatch):
+    root = make_tree(str(tmp_path / "tree"), dirs=2, files_per_dir=3, depth=2)
+    locked = os.path.join(root, "d0_1", "d1_0", "f2.dat")
+
+    def fail_scan(*args, **kwargs):
+        raise AssertionError("обход дерева не нужен: заблокированные файлы известны")
+
+    monkeypatch.setattr(file_handler, "scan_tree", fail_scan)
+    result = file_handler.unlock_and_delete_file(root, _processes([locked]))
+
+    assert "success" in result
+    assert not os.path.exists(root)
+
+def test_records_retry_stats(tmp_path):
+    root = make_tree(str(tmp_path / "tree"), dirs=1, files_per_dir=2, depth=1)
+
+    result = file_handler.unlock_and_delete_file(root, [])
+
+    assert "success" in result
+    stats = get_retry_stats()["unlock_and_delete_file"]
+    assert (stats["operations"], stats["successes"]) == (1, 1)
+
+def test_records_retry_stats_on_exception(tmp_path, monkeypatch):
+    path = tmp_path / "data.db"
+    path.write_bytes(b"x")
+
+    def broken_run(self, *args, **kwargs):
+        raise RuntimeError("сбой метода удаления")
+
+    monkeypatch.setattr(RetryScheduler, "run", broken_run)
+    with pytest.raises(RuntimeError):
+        file_handler.unlock_and_delete_file(str(path), [])
+
+    # Операция завершена и учтена как неудачная, несмотря на исключение
+    stats = get_retry_stats()["unlock_and_delete_file"]
+    assert (stats["operations"], stats["failures"]) == (1, 1)